@@ -0,0 +1 @@
+"""Shared infrastructure for the IVSurface, YieldCurve and OrderFlowCanyon pipelines."""
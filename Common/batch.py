@@ -0,0 +1,158 @@
+"""
+Headless batch renders of the three views to image or HTML files.
+
+    python -m Common.batch iv_surface NVDA AAPL MSFT --out renders
+    python -m Common.batch orderflow_canyon SPY QQQ --days 3 --format html
+    python -m Common.batch yield_curve 2024-01-01:2024-07-01 2024-07-01:2025-01-01
+    python -m Common.batch iv_surface NVDA AAPL --source synthetic --workers 4
+
+Targets are tickers, or start:end date ranges for yield_curve. Every job runs
+in this process (or, with --workers, in a pool whose processes each take many
+jobs), so imports, the market data cache and fitted surfaces are paid for
+once per process instead of once per plot. Nothing opens a window: surfaces
+are drawn on matplotlib Figures without pyplot, canyons and curves are
+plotly figures written as HTML (or images, with kaleido installed). A failed
+job is reported and the rest of the batch carries on.
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import NamedTuple
+
+from . import metrics
+
+KINDS = ("iv_surface", "orderflow_canyon", "yield_curve")
+DEFAULT_FORMATS = {"iv_surface": "png", "orderflow_canyon": "html", "yield_curve": "html"}
+
+
+class Job(NamedTuple):
+    kind: str
+    target: str
+    path: str
+
+
+class Outcome(NamedTuple):
+    job: Job
+    seconds: float
+    error: str = None
+
+
+def _iv_surface(target, path, options):
+    from IVSurface.IVmap import surface_figure, surface_grid
+    side = options.get("side") or "both"
+    grid = surface_grid(target, options.get("method") or "svi", options.get("points", 100), side=side)
+    fig = surface_figure(target, *grid, side=side)
+    with metrics.span("batch.write"):
+        fig.savefig(path)
+
+
+def _write_plotly(fig, path):
+    with metrics.span("batch.write"):
+        if path.endswith(".html"):
+            # The plotly.js bundle comes from its CDN instead of a copy per file
+            fig.write_html(path, include_plotlyjs="cdn")
+        else:
+            fig.write_image(path)
+
+
+def _orderflow_canyon(target, path, options):
+    from OrderFlowCanyon.main import canyon_figure, load_canyon
+    days = options.get("days", 3)
+    apx, bpx, avc, bvc, _ = load_canyon(target, days, options.get("rows", 1000))
+    _write_plotly(canyon_figure(target, apx, bpx, avc, bvc, days=days), path)
+
+
+def _yield_curve(target, path, options):
+    from YieldCurve.main import curve_figure, load_curve
+    start, sep, end = target.partition(":")
+    if not sep:
+        raise ValueError(f"Expected a start:end date range, got '{target}'.")
+    _write_plotly(curve_figure(*load_curve(start, end, options.get("method") or "spline")), path)
+
+
+RENDERERS = {"iv_surface": _iv_surface, "orderflow_canyon": _orderflow_canyon, "yield_curve": _yield_curve}
+
+
+def plan(kind, targets, out, fmt=None):
+    """One Job per target, writing <out>/<kind>_<target>.<fmt>."""
+    if kind not in RENDERERS:
+        raise ValueError(f"Unknown view '{kind}'; choose from {list(KINDS)}.")
+    fmt = fmt or DEFAULT_FORMATS[kind]
+    return [Job(kind, t, os.path.join(out, f"{kind}_{t.replace(':', '_').replace('/', '-')}.{fmt}")) for t in targets]
+
+
+def render(job, options=None):
+    """Renders one job; returns an Outcome instead of raising."""
+    start = time.perf_counter()
+    try:
+        os.makedirs(os.path.dirname(job.path) or ".", exist_ok=True)
+        with metrics.span(f"batch.{job.kind}"):
+            RENDERERS[job.kind](job.target, job.path, options or {})
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return Outcome(job, time.perf_counter() - start, error)
+
+
+def _use_source(source):
+    if source is not None:
+        from .providers import provider_from_name, set_provider
+        set_provider(provider_from_name(source))
+
+
+def run(jobs, options=None, workers=1, source=None):
+    """
+    Renders every job, in this process or on `workers` processes; yields
+    Outcomes as they finish. source: data provider name for every job
+    (default: the process default, see Common.providers).
+    """
+    if workers <= 1:
+        _use_source(source)
+        for job in jobs:
+            yield render(job, options)
+        return
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_use_source, initargs=(source,)) as pool:
+        futures = [pool.submit(render, job, options) for job in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render many surfaces, canyons or yield curves to files.")
+    parser.add_argument("kind", choices=KINDS)
+    parser.add_argument("targets", nargs="+", help="tickers, or start:end date ranges for yield_curve")
+    parser.add_argument("--out", default="renders")
+    parser.add_argument("--format", help="png, svg or pdf for iv_surface; html (or an image format, with kaleido) "
+                                         "for the others")
+    parser.add_argument("--source", help="data provider: live, synthetic or replay")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--method", help="svi/spline (iv_surface) or spline/nelson_siegel (yield_curve)")
+    parser.add_argument("--points", type=int, default=100, help="surface grid points per axis")
+    parser.add_argument("--side", choices=["both", "otm"], help="iv_surface quotes: both sides of every strike "
+                                                                 "(default) or only the OTM side")
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--rows", type=int, default=1000, help="canyon rows drawn")
+    args = parser.parse_args(argv)
+
+    jobs = plan(args.kind, args.targets, args.out, args.format)
+    options = {"method": args.method, "points": args.points, "side": args.side, "days": args.days, "rows": args.rows}
+    start = time.perf_counter()
+    failed = 0
+    for outcome in run(jobs, options, args.workers, args.source):
+        if outcome.error:
+            failed += 1
+            print(f"{outcome.job.target}: FAILED {outcome.error}")
+        else:
+            print(f"{outcome.job.target}: {outcome.job.path} ({outcome.seconds:.2f}s)")
+    elapsed = time.perf_counter() - start
+    print(f"{len(jobs) - failed}/{len(jobs)} rendered in {elapsed:.2f}s")
+    if metrics.enabled() and args.workers <= 1:
+        print(metrics.summary())
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,283 @@
+"""
+On-disk TTL cache for market data shared by IVSurface and YieldCurve.
+
+Entries are keyed by schema (e.g. "spot", "option_chain", "yield_history")
+plus keyword parameters (ticker, expiry, start, end, ...). Each entry is one
+uncompressed .npz file holding every DataFrame column as its own array, so a
+hit is a handful of contiguous reads and no pickling.
+
+Freshness is the file's mtime (when it was written); recency for LRU eviction
+is its atime, which the cache sets explicitly on every hit.
+
+Fetchers are plain functions called with the key parameters on a miss.
+Data modules register their vendor fetchers with register_fetcher(); a cache
+built with fetchers={...} uses those instead, which is how tests and offline
+runs stand in for the network.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from . import metrics
+
+DEFAULT_DIRECTORY = os.environ.get(
+    "STREETVIEW_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "thestreetview"),
+)
+
+# Seconds an entry stays fresh, per schema
+DEFAULT_TTLS = {
+    "spot": 60,
+    "rates": 3600,
+    "expirations": 3600,
+    "option_chain": 300,
+    "yield_history": 6 * 3600,
+    "surface_fit": 300,
+}
+
+_DEFAULT_FETCHERS = {}
+
+
+def register_fetcher(schema, fetcher):
+    """
+    Registers the default fetcher for a schema, used by every cache that was
+    not given its own fetcher for it.
+    """
+    _DEFAULT_FETCHERS[schema] = fetcher
+
+
+#Encoding of values into flat, pickle-free npz arrays
+def _pack_series(values, key, arrays):
+    """Column or index -> array; tz-aware datetimes are stored as naive UTC."""
+    tz = None
+    if isinstance(values.dtype, pd.DatetimeTZDtype):
+        tz = str(values.dtype.tz)
+        values = pd.Series(values).dt.tz_convert("UTC").dt.tz_localize(None)
+    values = np.asarray(values)
+    if values.dtype == object:
+        values = values.astype(str)
+    arrays[key] = values
+    return tz
+
+
+def _unpack_series(values, tz):
+    if tz is None:
+        return values
+    return pd.DatetimeIndex(values).tz_localize("UTC").tz_convert(tz)
+
+
+def _pack(value, prefix, arrays):
+    """Returns a JSON spec describing value; array data is added to arrays."""
+    if value is None:
+        return {"kind": "none"}
+    if isinstance(value, pd.Series):
+        value = value.to_frame()
+    if isinstance(value, pd.DataFrame):
+        columns = []
+        for i, name in enumerate(value.columns):
+            key = f"{prefix}c{i}"
+            tz = _pack_series(value.iloc[:, i], key, arrays)
+            columns.append({"name": name, "key": key, "tz": tz})
+        index_key = f"{prefix}index"
+        index_tz = _pack_series(value.index, index_key, arrays)
+        return {
+            "kind": "frame",
+            "columns": columns,
+            "index": {"key": index_key, "name": value.index.name, "tz": index_tz},
+        }
+    if isinstance(value, dict):
+        return {
+            "kind": "dict",
+            "items": {name: _pack(item, f"{prefix}{i}.", arrays) for i, (name, item) in enumerate(value.items())},
+        }
+    if isinstance(value, (list, tuple)) and any(isinstance(v, (pd.DataFrame, pd.Series, dict)) for v in value):
+        return {"kind": "list", "items": [_pack(item, f"{prefix}{i}.", arrays) for i, item in enumerate(value)]}
+    key = f"{prefix}v"
+    arrays[key] = np.asarray(value)
+    if arrays[key].dtype == object:
+        arrays[key] = arrays[key].astype(str)
+    return {"kind": "scalar" if np.ndim(value) == 0 else "array", "key": key}
+
+
+def _unpack(spec, arrays):
+    kind = spec["kind"]
+    if kind == "none":
+        return None
+    if kind == "frame":
+        index = spec["index"]
+        data = {}
+        names = []
+        for column in spec["columns"]:
+            name = column["name"]
+            name = tuple(name) if isinstance(name, list) else name
+            names.append(name)
+            data[name] = _unpack_series(arrays[column["key"]], column["tz"])
+        frame = pd.DataFrame(
+            data,
+            index=pd.Index(_unpack_series(arrays[index["key"]], index["tz"]), name=index["name"]),
+            columns=pd.MultiIndex.from_tuples(names) if names and isinstance(names[0], tuple) else names,
+        )
+        return frame
+    if kind == "dict":
+        return {name: _unpack(item, arrays) for name, item in spec["items"].items()}
+    if kind == "list":
+        return [_unpack(item, arrays) for item in spec["items"]]
+    values = arrays[spec["key"]]
+    return values.item() if kind == "scalar" else values
+
+
+class MarketDataCache:
+    """
+    directory: Where entries are written (created on first store)
+    ttls: Per-schema TTL overrides in seconds, merged over DEFAULT_TTLS
+    default_ttl: TTL for schemas with no entry in ttls
+    max_entries, max_bytes: LRU limits, enforced after every store
+    fetchers: Per-schema fetcher overrides (take precedence over registered ones)
+    enabled: When False every get() goes straight to the fetcher
+    """
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, ttls=None, default_ttl=300,
+                 max_entries=512, max_bytes=512 * 2**20, fetchers=None, enabled=True):
+        self.directory = directory
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.fetchers = dict(fetchers or {})
+        self.enabled = enabled
+        self._lock = threading.Lock()
+
+    def key(self, schema, **params):
+        """Canonical entry name: schema plus a hash of the sorted parameters."""
+        canonical = json.dumps(params, sort_keys=True, default=str)
+        digest = hashlib.sha1(canonical.encode()).hexdigest()[:24]
+        return f"{schema}-{digest}"
+
+    def _path(self, schema, params):
+        return os.path.join(self.directory, self.key(schema, **params) + ".npz")
+
+    def ttl(self, schema):
+        return self.ttls.get(schema, self.default_ttl)
+
+    def load(self, schema, ttl=None, **params):
+        """Returns the cached value if present and fresh, else None."""
+        if not self.enabled:
+            return None
+        path = self._path(schema, params)
+        ttl = self.ttl(schema) if ttl is None else ttl
+        try:
+            written = os.stat(path).st_mtime
+            now = time.time()
+            if now - written > ttl:
+                return None
+            with np.load(path, allow_pickle=False) as npz:
+                arrays = {name: npz[name] for name in npz.files}
+            # Record the hit for LRU eviction without touching the write time
+            os.utime(path, (now, written))
+        except (OSError, ValueError, KeyError):
+            return None
+        spec = json.loads(str(arrays.pop("__spec__")))
+        return _unpack(spec, arrays)
+
+    def store(self, schema, value, **params):
+        """Writes value under (schema, params) and enforces the LRU limits."""
+        if not self.enabled or value is None:
+            return
+        arrays = {}
+        spec = _pack(value, "", arrays)
+        arrays["__spec__"] = np.array(json.dumps(spec))
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(schema, params)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+        self._evict()
+
+    def get(self, schema, ttl=None, **params):
+        """
+        Cached value for (schema, params), fetching and storing it on a miss.
+        Fetchers that return None are not cached.
+        """
+        value = self.load(schema, ttl=ttl, **params)
+        if value is not None:
+            metrics.count(f"cache.{schema}.hit")
+            return value
+
+        fetcher = self.fetchers.get(schema) or _DEFAULT_FETCHERS.get(schema)
+        if fetcher is None:
+            raise KeyError(f"No fetcher registered for schema '{schema}'.")
+        metrics.count(f"cache.{schema}.miss")
+        with metrics.span(f"fetch.{schema}"):
+            value = fetcher(**params)
+        self.store(schema, value, **params)
+        return value
+
+    def invalidate(self, schema, **params):
+        try:
+            os.remove(self._path(schema, params))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        for entry in self._entries():
+            try:
+                os.remove(entry[0])
+            except FileNotFoundError:
+                pass
+
+    def _entries(self):
+        """(path, last_access, size) for every entry on disk."""
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return entries
+        for name in names:
+            if not name.endswith(".npz"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((path, max(st.st_atime, st.st_mtime), st.st_size))
+        return entries
+
+    def _evict(self):
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda e: e[1])
+            total = sum(size for _, _, size in entries)
+            while entries and (len(entries) > self.max_entries or total > self.max_bytes):
+                path, _, size = entries.pop(0)
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+
+_default_cache = None
+
+
+def get_cache():
+    """
+    The process-wide cache used by the data modules. Set STREETVIEW_CACHE=0
+    to disable it.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = MarketDataCache(enabled=os.environ.get("STREETVIEW_CACHE", "1") != "0")
+    return _default_cache
+
+
+def set_cache(cache):
+    """Replaces the process-wide cache, e.g. with one using stand-in fetchers."""
+    global _default_cache
+    _default_cache = cache
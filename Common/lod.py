@@ -0,0 +1,184 @@
+"""
+Level-of-detail pyramids for large grids (order-flow canyons, yield matrices).
+
+A Pyramid is built once from full-resolution arrays whose leading axes are
+indexed by sorted coordinates (time, maturity, ...). Level l reduces every
+coordinate axis by up to factor**l, keeping the block mean, min and max of each
+field; an axis stops shrinking once it is down to min_size. window() picks the
+finest level that fits a point budget for the requested coordinate range and
+slices it, so a zoom costs O(output) whatever the size of the underlying data.
+
+    pyramid = Pyramid((times,), {"avc": avc, "apx": apx})
+    view = pyramid.window(t0, t1, budget=2000, reduction={"avc": "max"})
+"""
+import math
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+import numpy as np
+
+from . import metrics
+
+REDUCTIONS = ("mean", "min", "max")
+FACTOR = 2
+# Levels stop once every coordinate axis is this short
+MIN_SIZE = 16
+DEFAULT_BUDGET = 1000
+# Pyramids kept per process by cached_pyramid(), and for how long (seconds)
+CACHE_SIZE = 8
+CACHE_TTL = 300
+
+
+class Window(NamedTuple):
+    coords: tuple   # one coordinate array per axis (block midpoints above level 0)
+    values: dict    # field -> sliced array at the chosen reduction
+    level: int      # pyramid level served
+    step: tuple     # source points per output point, per axis
+
+
+def _reduce_block(block, how):
+    """Reduces axis 1 of a (blocks, factor, ...) array, slice by slice (NaNs ignored)."""
+    parts = [block[:, j] for j in range(block.shape[1])]
+    if how == "min":
+        out = parts[0].copy()
+        for part in parts[1:]:
+            np.fmin(out, part, out=out)
+        return out
+    if how == "max":
+        out = parts[0].copy()
+        for part in parts[1:]:
+            np.fmax(out, part, out=out)
+        return out
+    total = parts[0].copy()
+    for part in parts[1:]:
+        total += part
+    if not np.isnan(total).any():
+        return total / len(parts)
+    finite = ~np.isnan(block)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(finite, block, 0.0).sum(axis=1) / finite.sum(axis=1)
+
+
+def _reduce_axis(values, axis, factor):
+    """{reduction: array} -> same, with `axis` reduced by factor (a short last block is kept)."""
+    out = {}
+    n = next(iter(values.values())).shape[axis]
+    full = n - n % factor
+    for how, a in values.items():
+        a = np.moveaxis(a, axis, 0)
+        reduced = [_reduce_block(a[:full].reshape(full // factor, factor, *a.shape[1:]), how)]
+        if full < n:
+            reduced.append(_reduce_block(a[full:][None], how))
+        out[how] = np.moveaxis(np.concatenate(reduced), 0, axis)
+    return out
+
+
+def _reduce_coords(coords, factor):
+    """Block midpoints: exact for int64 (ns timestamps) as well as floats."""
+    first = coords[::factor]
+    last = coords[factor - 1::factor]
+    if last.size < first.size:
+        last = np.r_[last, coords[-1:]]
+    if coords.dtype.kind in "iu":
+        return first + (last - first) // 2
+    return first + (last - first) / 2
+
+
+class Pyramid:
+    """
+    coords: tuple of sorted 1-D coordinate arrays, one per leading axis of
+            every field (e.g. (times,) for canyon rows, (dates, maturities)
+            for the yield matrix)
+    values: dict field -> array; trailing axes (e.g. book levels) are kept whole
+    reductions: block statistics kept per level, any of REDUCTIONS
+    """
+
+    def __init__(self, coords, values, factor=FACTOR, reductions=REDUCTIONS, min_size=MIN_SIZE):
+        self.factor = factor
+        self.reductions = tuple(reductions)
+        coords = tuple(np.asarray(c) for c in coords)
+        fields = {name: np.asarray(v, dtype=np.float64) for name, v in values.items()}
+        for name, v in fields.items():
+            if v.shape[:len(coords)] != tuple(c.size for c in coords):
+                raise ValueError(f"Field '{name}' of shape {v.shape} does not match its coordinates.")
+
+        self.coords = [coords]
+        self.steps = [(1,) * len(coords)]
+        level = {name: {r: v for r in self.reductions} for name, v in fields.items()}
+        self.levels = [level]
+        # Min of mins, max of maxes and mean of means, one axis at a time
+        while any(c.size > min_size for c in coords):
+            shrink = [c.size > min_size for c in coords]
+            for axis in np.flatnonzero(shrink):
+                level = {name: _reduce_axis(stats, axis, factor) for name, stats in level.items()}
+            coords = tuple(_reduce_coords(c, factor) if s else c for c, s in zip(coords, shrink))
+            self.coords.append(coords)
+            self.steps.append(tuple(step * factor if s else step for step, s in zip(self.steps[-1], shrink)))
+            self.levels.append(level)
+
+    @property
+    def shape(self):
+        return tuple(c.size for c in self.coords[0])
+
+    def _bounds(self, lo, hi):
+        """Full-resolution [start, stop) index range per axis for coordinate bounds."""
+        ndim = len(self.shape)
+        lo = (lo,) * ndim if lo is None or np.ndim(lo) == 0 and ndim == 1 else tuple(lo)
+        hi = (hi,) * ndim if hi is None or np.ndim(hi) == 0 and ndim == 1 else tuple(hi)
+        bounds = []
+        for c, a, b in zip(self.coords[0], lo, hi):
+            start = 0 if a is None else int(np.searchsorted(c, a, side="left"))
+            stop = c.size if b is None else int(np.searchsorted(c, b, side="right"))
+            bounds.append((start, max(start, stop)))
+        return bounds
+
+    def window(self, lo=None, hi=None, budget=DEFAULT_BUDGET, reduction="mean", level=None):
+        """
+        lo, hi: coordinate bounds, inclusive; a tuple with one entry per axis
+                (None for open) or a scalar for single-axis pyramids
+        budget: most points per axis, an int or one per axis
+        reduction: one of self.reductions, or a dict field -> reduction
+                   (fields not named get "mean")
+        level: serve this level instead of choosing one by budget
+        Returns a Window from the finest level that fits the budget.
+        """
+        bounds = self._bounds(lo, hi)
+        budget = (budget,) * len(bounds) if np.ndim(budget) == 0 else tuple(budget)
+        if level is None:
+            level = 0
+            while level + 1 < len(self.levels) and any(
+                    math.ceil((stop - start) / step) > max(1, b)
+                    for (start, stop), step, b in zip(bounds, self.steps[level], budget)):
+                level += 1
+        level = min(level, len(self.levels) - 1)
+
+        steps = self.steps[level]
+        index = tuple(slice(start // step, -(-stop // step)) for (start, stop), step in zip(bounds, steps))
+        coords = tuple(c[i] for c, i in zip(self.coords[level], index))
+        values = {}
+        for name, stats in self.levels[level].items():
+            how = reduction.get(name, "mean") if isinstance(reduction, dict) else reduction
+            values[name] = stats[how][index]
+        return Window(coords, values, level, steps)
+
+
+_pyramids = OrderedDict()
+
+
+def cached_pyramid(key, build, ttl=CACHE_TTL):
+    """
+    The pyramid for `key` (any hashable), calling build() on a miss. The last
+    CACHE_SIZE pyramids stay in memory for up to ttl seconds, so repeated
+    zooms into the same data skip the rebuild.
+    """
+    entry = _pyramids.pop(key, None)
+    if entry is None or time.monotonic() - entry[0] > ttl:
+        metrics.count("lod.miss")
+        entry = (time.monotonic(), build())
+    else:
+        metrics.count("lod.hit")
+    _pyramids[key] = entry
+    while len(_pyramids) > CACHE_SIZE:
+        _pyramids.popitem(last=False)
+    return entry[1]
@@ -0,0 +1,272 @@
+"""
+Lightweight instrumentation: timing spans, counters and peak memory per stage.
+
+    with metrics.span("iv.solve"):
+        ...
+    metrics.count("iv.contracts", n)
+
+Off unless STREETVIEW_METRICS=1 or enable() is called. Disabled, span()
+returns a shared no-op context manager and count() returns after one flag
+check, so instrumented code costs next to nothing. STREETVIEW_METRICS=memory
+(or enable(memory=True)) also traces Python/NumPy allocations with
+tracemalloc and records each span's peak above its starting point; that
+roughly doubles allocation cost, so it is for profiling runs only.
+
+Everything recorded adds to process-wide totals (snapshot(), prometheus()).
+collect() also gathers a per-request breakdown: while open it sees every span
+and counter in the process, including those from worker threads, so open
+one per request only where requests run one at a time (a pool worker, a
+batch job).
+"""
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+_enabled = False
+_memory = False
+_lock = threading.Lock()
+_local = threading.local()
+_reports = []
+
+
+def _empty():
+    return {"spans": {}, "counters": {}}
+
+
+_totals = _empty()
+
+
+def enable(memory=False):
+    global _enabled, _memory
+    _enabled = True
+    _memory = bool(memory)
+    if _memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    global _enabled, _memory
+    _enabled = _memory = False
+
+
+def enabled():
+    return _enabled
+
+
+def tracing_memory():
+    return _memory
+
+
+def _add(report, name, seconds, peak):
+    stats = report["spans"].get(name)
+    if stats is None:
+        stats = report["spans"][name] = {"calls": 0, "seconds": 0.0, "max_seconds": 0.0}
+    stats["calls"] += 1
+    stats["seconds"] += seconds
+    stats["max_seconds"] = max(stats["max_seconds"], seconds)
+    if peak is not None:
+        stats["peak_bytes"] = max(stats.get("peak_bytes", 0), peak)
+
+
+def _record(name, seconds, peak=None):
+    with _lock:
+        _add(_totals, name, seconds, peak)
+        for report in _reports:
+            _add(report, name, seconds, peak)
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    __slots__ = ("name", "start", "base", "peak")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        if _memory and tracemalloc.is_tracing():
+            # tracemalloc has one peak; spans nest by resetting it and
+            # folding each child's peak back into its parent
+            stack = getattr(_local, "stack", None)
+            if stack is None:
+                stack = _local.stack = []
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, peak)
+            self.base, self.peak = current, current
+            stack.append(self)
+            tracemalloc.reset_peak()
+        else:
+            self.base = None
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        peak = None
+        if self.base is not None:
+            stack = _local.stack
+            stack.pop()
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, self.peak)
+            peak = self.peak - self.base
+        _record(self.name, seconds, peak)
+        return False
+
+
+def span(name):
+    """Context manager timing a stage under `name` (e.g. "iv.solve")."""
+    return _Span(name) if _enabled else _NO_SPAN
+
+
+def count(name, value=1):
+    """Adds value to the counter `name` (contracts solved, rows ingested, ...)."""
+    if not _enabled:
+        return
+    with _lock:
+        _totals["counters"][name] = _totals["counters"].get(name, 0) + value
+        for report in _reports:
+            report["counters"][name] = report["counters"].get(name, 0) + value
+
+
+def timed(name, iterable):
+    """
+    Yields from iterable, timing each next() under `name`: the time spent
+    producing items (downloads, decoding) apart from the time spent on them.
+    """
+    if not _enabled:
+        yield from iterable
+        return
+    it = iter(iterable)
+    while True:
+        with span(name):
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+        yield item
+
+
+@contextmanager
+def collect():
+    """
+    Gathers the spans and counters recorded while open into a report dict,
+    {"spans": {name: {calls, seconds, max_seconds[, peak_bytes]}},
+    "counters": {name: value}}, filled in place. Yields None when disabled.
+    """
+    if not _enabled:
+        yield None
+        return
+    report = _empty()
+    with _lock:
+        _reports.append(report)
+    try:
+        yield report
+    finally:
+        with _lock:
+            _reports.remove(report)
+
+
+def merge(report):
+    """Adds a report gathered elsewhere (e.g. in a pool worker) to this process's totals."""
+    if not report:
+        return
+    with _lock:
+        for name, stats in report["spans"].items():
+            total = _totals["spans"].get(name)
+            if total is None:
+                _totals["spans"][name] = dict(stats)
+                continue
+            total["calls"] += stats["calls"]
+            total["seconds"] += stats["seconds"]
+            total["max_seconds"] = max(total["max_seconds"], stats["max_seconds"])
+            if "peak_bytes" in stats:
+                total["peak_bytes"] = max(total.get("peak_bytes", 0), stats["peak_bytes"])
+        for name, value in report["counters"].items():
+            _totals["counters"][name] = _totals["counters"].get(name, 0) + value
+
+
+def max_rss():
+    """Peak resident set size of this process in bytes, or None where unavailable."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def snapshot():
+    """Copy of the process-wide totals, plus max_rss_bytes."""
+    with _lock:
+        out = {"spans": {name: dict(stats) for name, stats in _totals["spans"].items()},
+               "counters": dict(_totals["counters"])}
+    out["enabled"] = _enabled
+    out["max_rss_bytes"] = max_rss()
+    return out
+
+
+def reset():
+    global _totals
+    with _lock:
+        _totals = _empty()
+
+
+def summary(report=None):
+    """Readable table of a report (default: the process totals), slowest stage first."""
+    report = snapshot() if report is None else report
+    lines = [f"{'stage':<28}{'calls':>8}{'total ms':>12}{'max ms':>10}{'peak MB':>10}"]
+    for name, stats in sorted(report["spans"].items(), key=lambda item: -item[1]["seconds"]):
+        peak = f"{stats['peak_bytes'] / 1e6:.1f}" if "peak_bytes" in stats else "-"
+        lines.append(f"{name:<28}{stats['calls']:>8}{stats['seconds'] * 1000:>12.1f}"
+                     f"{stats['max_seconds'] * 1000:>10.1f}{peak:>10}")
+    for name, value in sorted(report["counters"].items()):
+        lines.append(f"{name:<28}{value:>8}")
+    return "\n".join(lines)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def prometheus(prefix="streetview"):
+    """The totals in the Prometheus text exposition format."""
+    snap = snapshot()
+    spans = sorted(snap["spans"].items())
+    families = [
+        ("span_seconds_total", "counter", "span", [(n, f"{s['seconds']:.6f}") for n, s in spans]),
+        ("span_calls_total", "counter", "span", [(n, s["calls"]) for n, s in spans]),
+        ("span_max_seconds", "gauge", "span", [(n, f"{s['max_seconds']:.6f}") for n, s in spans]),
+        ("span_peak_bytes", "gauge", "span", [(n, s["peak_bytes"]) for n, s in spans if "peak_bytes" in s]),
+        ("events_total", "counter", "name", sorted(snap["counters"].items())),
+    ]
+    lines = []
+    for family, kind, label, samples in families:
+        lines.append(f"# TYPE {prefix}_{family} {kind}")
+        lines.extend(f'{prefix}_{family}{{{label}="{_label(name)}"}} {value}' for name, value in samples)
+    if snap["max_rss_bytes"] is not None:
+        lines.append(f"# TYPE {prefix}_max_rss_bytes gauge")
+        lines.append(f"{prefix}_max_rss_bytes {snap['max_rss_bytes']}")
+    return "\n".join(lines) + "\n"
+
+
+_setting = os.environ.get("STREETVIEW_METRICS", "0").lower()
+if _setting not in ("", "0", "false", "no", "off"):
+    enable(memory=_setting == "memory")
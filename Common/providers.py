@@ -0,0 +1,555 @@
+"""
+Market data providers behind the cache schemas.
+
+A provider answers every schema the data modules read: spot, rates (index
+closes such as ^IRX), expirations, option_chain, yield_history, plus MBP-10
+order book frames for OrderFlowCanyon. Three ship here:
+  - LiveProvider: yfinance and Databento (key from DATABENTO_API_KEY)
+  - ReplayProvider: a recorded session on local disk; MBP-10 books are raw
+    fixed-width records opened with np.memmap, so a multi-GB session opens
+    instantly and only the pages actually replayed are read
+  - SyntheticProvider: deterministic generated data for offline runs and
+    benchmarks
+
+The cache's default fetchers dispatch to the current provider (get_provider),
+chosen by STREETVIEW_PROVIDER ("live", "replay" with STREETVIEW_REPLAY_DIR,
+or "synthetic"). set_provider / use_provider switch it at runtime together
+with a cache of its own, so recorded or generated data never lands in the
+live cache. RecordingProvider wraps another provider and writes everything
+it serves into a replay directory.
+"""
+import json
+import os
+import tempfile
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from .cache import DEFAULT_DIRECTORY, DEFAULT_TTLS, MarketDataCache, get_cache, register_fetcher, set_cache
+
+SCHEMAS = ("spot", "rates", "expirations", "option_chain", "yield_history")
+MBP_CHUNK_SIZE = 100_000
+
+
+class Provider:
+    """
+    Interface shared by every provider; subclasses implement the schemas.
+    cacheable: whether results should go through the on-disk cache
+    """
+
+    name = "provider"
+    cacheable = False
+
+    def spot(self, ticker):
+        """Last close of ticker, or None."""
+        raise NotImplementedError
+
+    def rates(self, ticker):
+        """Last close of a rate index such as ^IRX (percent), or None."""
+        raise NotImplementedError
+
+    def expirations(self, ticker):
+        """Option expiration dates as 'YYYY-MM-DD' strings, nearest first."""
+        raise NotImplementedError
+
+    def option_chain(self, ticker, expiry):
+        """{"calls": DataFrame, "puts": DataFrame} with strike, bid, ask, lastPrice."""
+        raise NotImplementedError
+
+    def yield_history(self, tickers, start, end):
+        """Daily closes between start and end, one column per ticker."""
+        raise NotImplementedError
+
+    def mbp10(self, ticker, start=None, end=None, limit=None, chunk_size=MBP_CHUNK_SIZE):
+        """MBP-10 records in Databento's to_df() layout, as DataFrames of at most chunk_size rows."""
+        raise NotImplementedError
+
+    def version(self, schemas=SCHEMAS):
+        """
+        Token that changes whenever data served for these schemas (plus
+        "mbp10") may have changed; results computed under the same token
+        are interchangeable.
+        """
+        return self.name
+
+    def fetchers(self):
+        """Cache fetchers for every schema, bound to this provider."""
+        return {schema: getattr(self, schema) for schema in SCHEMAS}
+
+    def cache(self):
+        """A MarketDataCache serving this provider, in a directory of its own."""
+        enabled = self.cacheable and os.environ.get("STREETVIEW_CACHE", "1") != "0"
+        directory = DEFAULT_DIRECTORY if self.name == "live" else os.path.join(DEFAULT_DIRECTORY, self.name)
+        return MarketDataCache(directory=directory, fetchers=self.fetchers(), enabled=enabled)
+
+
+#Live vendors
+class LiveProvider(Provider):
+    """yfinance for quotes and yields, Databento XNAS.ITCH for MBP-10."""
+
+    name = "live"
+    cacheable = True
+
+    def __init__(self, databento_key=None, dataset="XNAS.ITCH"):
+        self.databento_key = databento_key
+        self.dataset = dataset
+
+    def version(self, schemas=SCHEMAS):
+        # Vendor data can change at any time; treat it as fresh for the
+        # shortest cache TTL among the schemas used
+        ttl = min((DEFAULT_TTLS[s] for s in schemas), default=DEFAULT_TTLS["spot"])
+        return f"live:{int(time.time() // ttl)}"
+
+    def _last_close(self, ticker):
+        import yfinance as yf
+        hist = yf.Ticker(ticker).history(period="1d")
+        if hist.empty:
+            return None
+        return float(hist["Close"].iloc[-1])
+
+    def spot(self, ticker):
+        return self._last_close(ticker)
+
+    def rates(self, ticker):
+        return self._last_close(ticker)
+
+    def expirations(self, ticker):
+        import yfinance as yf
+        return list(yf.Ticker(ticker).options)
+
+    def option_chain(self, ticker, expiry):
+        import yfinance as yf
+        # Each call builds its own Ticker so pooled threads share no state
+        chain = yf.Ticker(ticker).option_chain(expiry)
+        return {"calls": chain.calls, "puts": chain.puts}
+
+    def yield_history(self, tickers, start, end):
+        import yfinance as yf
+        # One batched request for every index
+        df = yf.download(list(tickers), start=start, end=end, progress=False)
+        if df.empty:
+            return None
+        close = df["Close"]
+        if isinstance(close, pd.Series):
+            close = close.to_frame(tickers[0])
+        close.columns = [str(c) for c in close.columns]
+        return close
+
+    def _client(self):
+        import databento as db
+        key = self.databento_key or os.environ.get("DATABENTO_API_KEY")
+        if not key:
+            raise RuntimeError("Set DATABENTO_API_KEY to stream MBP-10 data from Databento.")
+        return db.Historical(key)
+
+    def mbp10(self, ticker, start=None, end=None, limit=None, chunk_size=MBP_CHUNK_SIZE):
+        import databento as db
+        # Streamed to a temporary file, then decoded chunk by chunk
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, f"{ticker}.mbp-10.dbn.zst")
+            self._client().timeseries.get_range(
+                dataset=self.dataset,
+                schema="mbp-10",
+                symbols=[ticker],
+                start=start,
+                end=end,
+                limit=limit,
+                path=path,
+            )
+            yield from db.DBNStore.from_file(path).to_df(count=chunk_size)
+
+
+#Recorded sessions
+def _snapshot_cache(root):
+    # Snapshots never expire and are never evicted
+    return MarketDataCache(directory=os.path.join(root, "snapshots"), default_ttl=float("inf"),
+                           ttls={schema: float("inf") for schema in SCHEMAS},
+                           max_entries=2**62, max_bytes=2**62)
+
+
+def _mbp_paths(root, ticker):
+    base = os.path.join(root, "mbp10", ticker)
+    return base + ".bin", base + ".json"
+
+
+def _frame_records(df):
+    """MBP DataFrame -> structured array of ts_recv, ts_event and every numeric column."""
+    fields = [("ts_recv", "<i8"), ("ts_event", "<i8")]
+    columns = []
+    for name in df.columns:
+        if name == "ts_event":
+            continue
+        kind = df[name].dtype.kind
+        if kind in "biuf":
+            fields.append((name, df[name].dtype.newbyteorder("<").str))
+            columns.append(name)
+    records = np.empty(len(df), dtype=fields)
+    records["ts_recv"] = pd.DatetimeIndex(df.index).as_unit("ns").asi8
+    records["ts_event"] = pd.DatetimeIndex(df["ts_event"]).as_unit("ns").asi8
+    for name in columns:
+        records[name] = df[name].to_numpy()
+    return records
+
+
+def _records_frame(records):
+    """Inverse of _frame_records for a (memory-mapped) slice."""
+    data = {"ts_event": pd.to_datetime(np.asarray(records["ts_event"]), utc=True)}
+    for name in records.dtype.names[2:]:
+        data[name] = np.asarray(records[name])
+    frame = pd.DataFrame(data)
+    frame.index = pd.DatetimeIndex(pd.to_datetime(np.asarray(records["ts_recv"]), utc=True), name="ts_recv")
+    return frame
+
+
+def _mbp_info(meta):
+    """A record file's dtype and count, or None before the first recording."""
+    if not os.path.exists(meta):
+        return None
+    with open(meta) as f:
+        return json.load(f)
+
+
+def _splice_records(data, count, pending, dtype, merged, chunk_size=MBP_CHUNK_SIZE):
+    """
+    Writes data's count records with those in pending spliced in to merged:
+    recorded records inside pending's ts_event span are replaced and the
+    rest keep their place, so a re-recorded window never shows up twice.
+    Copies chunk by chunk through memmaps.
+    Returns the merged record count.
+    """
+    new = np.memmap(pending, dtype=dtype, mode="r")
+    old = np.memmap(data, dtype=dtype, mode="r", shape=(count,)) if count else np.empty(0, dtype=dtype)
+    ts = new["ts_event"]
+    lo = int(np.searchsorted(old["ts_event"], ts.min(), side="left"))
+    hi = max(lo, int(np.searchsorted(old["ts_event"], ts.max(), side="right")))
+    with open(merged, "wb") as out:
+        for part in (old[:lo], new, old[hi:]):
+            for i in range(0, len(part), chunk_size):
+                out.write(part[i:i + chunk_size].tobytes())
+    return lo + len(new) + count - hi
+
+
+def _utc_ns(value):
+    """Naive (taken as UTC) or tz-aware timestamp -> int ns since epoch."""
+    ts = pd.Timestamp(value)
+    return (ts.tz_localize("UTC") if ts.tz is None else ts.tz_convert("UTC")).value
+
+
+class ReplayProvider(Provider):
+    """
+    Serves a session recorded by RecordingProvider from root:
+      root/snapshots/         quotes, chains and yields (MarketDataCache entries)
+      root/mbp10/<T>.bin      MBP-10 records, fixed width, in ts_event order
+      root/mbp10/<T>.json     their dtype and record count
+    Yield histories are sliced to the requested dates from everything
+    recorded for those tickers.
+    """
+
+    name = "replay"
+    cacheable = False
+
+    def __init__(self, root):
+        self.root = root
+        self._snapshots = _snapshot_cache(root)
+
+    def version(self, schemas=SCHEMAS):
+        # A recording only changes when files are added or rewritten under root
+        latest, count = 0, 0
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                latest = max(latest, os.stat(os.path.join(directory, name)).st_mtime_ns)
+                count += 1
+        return f"replay:{self.root}:{count}:{latest}"
+
+    def _load(self, schema, **params):
+        value = self._snapshots.load(schema, **params)
+        if value is None:
+            raise KeyError(f"No recorded {schema} for {params} in {self.root}.")
+        return value
+
+    def spot(self, ticker):
+        return self._load("spot", ticker=ticker)
+
+    def rates(self, ticker):
+        return self._load("rates", ticker=ticker)
+
+    def expirations(self, ticker):
+        return [str(e) for e in self._load("expirations", ticker=ticker)]
+
+    def option_chain(self, ticker, expiry):
+        return self._load("option_chain", ticker=ticker, expiry=expiry)
+
+    def yield_history(self, tickers, start, end):
+        close = self._load("yield_history", tickers=list(tickers))
+        close = close.loc[(close.index >= pd.Timestamp(start)) & (close.index < pd.Timestamp(end))]
+        return close if len(close) else None
+
+    def mbp_records(self, ticker):
+        """All recorded MBP-10 records for ticker as a read-only memmap."""
+        data, meta = _mbp_paths(self.root, ticker)
+        with open(meta) as f:
+            info = json.load(f)
+        dtype = np.dtype([tuple(field) for field in info["dtype"]])
+        return np.memmap(data, dtype=dtype, mode="r", shape=(info["count"],))
+
+    def mbp10(self, ticker, start=None, end=None, limit=None, chunk_size=MBP_CHUNK_SIZE):
+        records = self.mbp_records(ticker)
+        ts = records["ts_event"]
+        lo = 0 if start is None else int(np.searchsorted(ts, _utc_ns(start)))
+        hi = len(records) if end is None else int(np.searchsorted(ts, _utc_ns(end)))
+        if limit is not None:
+            hi = min(hi, lo + int(limit))
+        for i in range(lo, hi, chunk_size):
+            yield _records_frame(records[i:min(i + chunk_size, hi)])
+
+
+class RecordingProvider(Provider):
+    """
+    Forwards to provider and writes everything served into a replay
+    directory readable by ReplayProvider(root). MBP-10 frames are written
+    to a pending file as they stream and spliced into the ticker's record
+    file when the stream ends, replacing anything recorded over the same
+    ts_event span, so the file stays in order and re-recording a window
+    does not duplicate it.
+    """
+
+    name = "recording"
+    cacheable = False
+
+    def __init__(self, provider, root):
+        self.provider = provider
+        self.root = root
+        self._snapshots = _snapshot_cache(root)
+
+    def version(self, schemas=SCHEMAS):
+        return self.provider.version(schemas)
+
+    def _record(self, schema, value, **params):
+        self._snapshots.store(schema, value, **params)
+        return value
+
+    def spot(self, ticker):
+        return self._record("spot", self.provider.spot(ticker), ticker=ticker)
+
+    def rates(self, ticker):
+        return self._record("rates", self.provider.rates(ticker), ticker=ticker)
+
+    def expirations(self, ticker):
+        return self._record("expirations", self.provider.expirations(ticker), ticker=ticker)
+
+    def option_chain(self, ticker, expiry):
+        return self._record("option_chain", self.provider.option_chain(ticker, expiry), ticker=ticker, expiry=expiry)
+
+    def yield_history(self, tickers, start, end):
+        close = self.provider.yield_history(tickers, start, end)
+        if close is not None:
+            # Merge with earlier recordings so replay can serve any sub-range
+            previous = self._snapshots.load("yield_history", tickers=list(tickers))
+            merged = close if previous is None else pd.concat([previous, close])
+            merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+            self._snapshots.store("yield_history", merged, tickers=list(tickers))
+        return close
+
+    def mbp10(self, ticker, start=None, end=None, limit=None, chunk_size=MBP_CHUNK_SIZE):
+        data, meta = _mbp_paths(self.root, ticker)
+        os.makedirs(os.path.dirname(data), exist_ok=True)
+        info = _mbp_info(meta)
+        pending = f"{data}.{os.getpid()}.tmp"
+        dtype = None
+        try:
+            with open(pending, "wb") as out:
+                for df in self.provider.mbp10(ticker, start, end, limit, chunk_size):
+                    records = _frame_records(df)
+                    if dtype is None:
+                        dtype = records.dtype
+                        if info is not None and [tuple(f) for f in info["dtype"]] != dtype.descr:
+                            raise ValueError(f"MBP-10 columns changed since {ticker} was last recorded.")
+                    elif records.dtype != dtype:
+                        raise ValueError(f"MBP-10 columns changed while recording {ticker}.")
+                    out.write(records.tobytes())
+                    yield df
+        finally:
+            # Whatever was recorded, also when the consumer stopped early
+            if dtype is not None and os.path.getsize(pending):
+                merged = f"{data}.{os.getpid()}.merge"
+                count = _splice_records(data, 0 if info is None else info["count"], pending, dtype, merged)
+                os.replace(merged, data)
+                with open(meta, "w") as f:
+                    json.dump({"dtype": dtype.descr, "count": count}, f)
+            os.remove(pending)
+
+
+#Generated data
+def _rng(*key):
+    return np.random.default_rng(zlib.crc32(repr(key).encode()))
+
+
+class SyntheticProvider(Provider):
+    """
+    Deterministic generated data: chains priced off a skewed smile, Treasury
+    yields from a common level walk plus mean-reverting tenor spreads, and
+    random-walk MBP-10 books. Everything is seeded from (seed, request).
+    """
+
+    name = "synthetic"
+    cacheable = False
+
+    def __init__(self, seed=0, spot=100.0, rate_pct=4.2, strikes=None, n_expiries=12,
+                 expiry_step_days=30, noise=0.0, mbp_rows=100_000):
+        self.seed = seed
+        self.spot_price = spot
+        self.rate_pct = rate_pct
+        self.strikes = np.arange(0.5 * spot, 1.5 * spot + 1e-9, 0.025 * spot) if strikes is None else np.asarray(strikes, dtype=float)
+        self.n_expiries = n_expiries
+        self.expiry_step_days = expiry_step_days
+        self.noise = noise
+        self.mbp_rows = mbp_rows
+
+    def version(self, schemas=SCHEMAS):
+        # Expiries are laid out from today, so chains change at midnight
+        config = repr((self.spot_price, self.rate_pct, self.n_expiries, self.expiry_step_days, self.noise,
+                       self.mbp_rows)).encode() + self.strikes.tobytes()
+        return f"synthetic:{self.seed}:{zlib.crc32(config):08x}:{datetime.now().date().isoformat()}"
+
+    def smile(self, K, T, S=None):
+        """Skewed smile with a mild term structure, used to price the chains."""
+        k = np.log(K / (self.spot_price if S is None else S))
+        return 0.22 + 0.05 / np.sqrt(1.0 + 4.0 * T) - 0.12 * k + 0.25 * k**2
+
+    def spot(self, ticker):
+        return self.spot_price
+
+    def rates(self, ticker):
+        return self.rate_pct
+
+    def expirations(self, ticker):
+        today = datetime.now().date()
+        return [(today + timedelta(days=7 + self.expiry_step_days * i)).isoformat() for i in range(self.n_expiries)]
+
+    def option_chain(self, ticker, expiry):
+        # Imported here: IVSurface itself depends on Common
+        from IVSurface.BSMCompute import black_scholes_price
+
+        T = (datetime.strptime(expiry, "%Y-%m-%d") - datetime.now()).days / 365.0
+        rng = _rng("chain", self.seed, ticker, expiry)
+        sides = {}
+        for name, is_call in (("calls", True), ("puts", False)):
+            mid = black_scholes_price(self.spot_price, self.strikes, max(T, 1e-4), self.rate_pct / 100.0,
+                                      self.smile(self.strikes, T), is_call)
+            if self.noise:
+                mid = mid * (1.0 + rng.normal(0.0, self.noise, mid.size))
+            spread = np.maximum(0.01, 0.02 * mid)
+            sides[name] = pd.DataFrame({
+                "strike": self.strikes,
+                "bid": np.round(np.maximum(mid - spread / 2, 0.0), 2),
+                "ask": np.round(mid + spread / 2, 2),
+                "lastPrice": np.round(mid, 2),
+            })
+        return sides
+
+    def yield_history(self, tickers, start, end):
+        dates = pd.bdate_range(start, end, name="Date")
+        rng = _rng("yields", self.seed, str(start), str(end))
+        base = np.array([4.3, 4.0, 4.2, 4.4, 4.5, 4.6])[:len(tickers)]
+        level = rng.normal(0.0, 0.04, len(dates)).cumsum()
+        spread = np.zeros((len(dates), len(tickers)))
+        shocks = rng.normal(0.0, 0.01, spread.shape)
+        for i in range(1, len(dates)):
+            spread[i] = 0.98 * spread[i - 1] + shocks[i]
+        return pd.DataFrame(base + level[:, None] + spread, index=dates, columns=list(tickers))
+
+    def mbp_frame(self, rows=100_000, depth=10, seed=0, start="2024-01-02 14:30", tick=0.01):
+        """
+        Synthetic MBP-10 frame in Databento's to_df() layout: a random-walk mid,
+        one-tick-wide levels and random sizes, with ~2ms between updates.
+        """
+        rng = _rng("mbp", rows, depth, seed)
+        mid = self.spot_price + np.cumsum(rng.choice([-tick, 0.0, 0.0, tick], rows))
+        gaps = rng.exponential(2e6, rows).astype(np.int64)
+        origin = pd.Timestamp(start)
+        origin = origin.tz_localize("UTC") if origin.tz is None else origin.tz_convert("UTC")
+        ts = origin.value + np.cumsum(gaps)
+
+        data = {"ts_event": pd.to_datetime(ts, utc=True)}
+        for i in range(depth):
+            data[f"bid_px_{i:02d}"] = np.round(mid - tick * (i + 0.5), 4)
+            data[f"ask_px_{i:02d}"] = np.round(mid + tick * (i + 0.5), 4)
+            data[f"bid_sz_{i:02d}"] = rng.integers(1, 500, rows).astype(np.uint32)
+            data[f"ask_sz_{i:02d}"] = rng.integers(1, 500, rows).astype(np.uint32)
+        frame = pd.DataFrame(data)
+        frame.index = pd.DatetimeIndex(frame["ts_event"], name="ts_recv")
+        return frame
+
+    def mbp10(self, ticker, start=None, end=None, limit=None, chunk_size=MBP_CHUNK_SIZE):
+        rows = self.mbp_rows if limit is None else int(limit)
+        frame = self.mbp_frame(rows, seed=zlib.crc32(f"{self.seed}:{ticker}".encode()),
+                               start=start if start is not None else "2024-01-02 14:30")
+        if end is not None:
+            end = pd.Timestamp(end)
+            frame = frame[frame["ts_event"] < (end.tz_localize("UTC") if end.tz is None else end)]
+        for i in range(0, len(frame), chunk_size):
+            yield frame.iloc[i:i + chunk_size]
+
+
+#Process-wide provider
+PROVIDERS = {
+    "live": LiveProvider,
+    "synthetic": SyntheticProvider,
+    "stub": SyntheticProvider,
+    "replay": lambda: ReplayProvider(os.environ["STREETVIEW_REPLAY_DIR"]),
+}
+
+_provider = None
+
+
+def provider_from_name(name):
+    """'live', 'synthetic' (alias 'stub') or 'replay' (STREETVIEW_REPLAY_DIR)."""
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown data provider '{name}'; choose from {sorted(PROVIDERS)}.")
+    if name == "replay" and not os.environ.get("STREETVIEW_REPLAY_DIR"):
+        raise ValueError("The replay provider needs STREETVIEW_REPLAY_DIR.")
+    return PROVIDERS[name]()
+
+
+def get_provider():
+    """The provider behind the default cache fetchers (STREETVIEW_PROVIDER, default live)."""
+    global _provider
+    if _provider is None:
+        _provider = provider_from_name(os.environ.get("STREETVIEW_PROVIDER", "live"))
+    return _provider
+
+
+def set_provider(provider):
+    """Switches the process to provider, with a cache of its own."""
+    global _provider
+    _provider = provider
+    set_cache(provider.cache())
+
+
+@contextmanager
+def use_provider(provider):
+    """Temporarily switches provider and cache, restoring both on exit."""
+    global _provider
+    previous, previous_cache = _provider, get_cache()
+    set_provider(provider)
+    try:
+        yield provider
+    finally:
+        _provider = previous
+        set_cache(previous_cache)
+
+
+def _dispatch(schema):
+    return lambda **params: getattr(get_provider(), schema)(**params)
+
+
+for _schema in SCHEMAS:
+    register_fetcher(_schema, _dispatch(_schema))
+
+# A non-live provider from the environment also gets its own cache up front
+if os.environ.get("STREETVIEW_PROVIDER", "live") != "live":
+    set_provider(get_provider())
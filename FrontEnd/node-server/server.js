@@ -1,9 +1,12 @@
 const express = require('express');
 const axios = require('axios');
 const bodyParser = require('body-parser');
+const net = require('net');
 
 const app = express();
 const PORT = 5000; // or any port you prefer
+const COMPUTE_URL = process.env.COMPUTE_URL || 'http://localhost:5000/compute';
+const LIVE_URL = new URL(process.env.COMPUTE_LIVE_URL || 'ws://localhost:5000/live');
 
 app.use(bodyParser.json());
 
@@ -12,17 +15,55 @@ app.post('/api/compute', async (req, res) => {
   try {
     const { parameters } = req.body;
 
-    // Send parameters to the Python server
-    const response = await axios.post('http://localhost:5000/compute', { parameters });
+    // Send parameters to the Python server; the Accept header picks JSON or
+    // the binary grid format, so pass it through along with the raw body
+    // If-None-Match lets an unchanged result come back as a bodiless 304
+    const headers = { Accept: req.get('Accept') || 'application/json' };
+    if (req.get('If-None-Match')) headers['If-None-Match'] = req.get('If-None-Match');
+    const response = await axios.post(COMPUTE_URL, { parameters }, {
+      headers,
+      responseType: 'arraybuffer',
+      validateStatus: () => true,
+    });
 
     // Send the processed data back to the frontend
-    res.json(response.data);
+    for (const name of ['etag', 'cache-control', 'vary', 'x-result-stale', 'server-timing']) {
+      if (response.headers[name]) res.set(name, response.headers[name]);
+    }
+    if (response.status === 304) {
+      res.status(304).end();
+      return;
+    }
+    res.status(response.status)
+      .type(response.headers['content-type'] || 'application/json')
+      .send(Buffer.from(response.data));
   } catch (error) {
     console.error('Error communicating with Python server:', error);
     res.status(500).send('Internal Server Error');
   }
 });
 
-app.listen(PORT, () => {
+const server = app.listen(PORT, () => {
   console.log(`Node.js server running on http://localhost:${PORT}`);
+});
+
+// Live canyon: WebSocket upgrades on /api/live are piped straight through to
+// the compute service's /live endpoint, frames untouched
+server.on('upgrade', (req, socket, head) => {
+  if (!req.url.startsWith('/api/live')) {
+    socket.destroy();
+    return;
+  }
+  const upstream = net.connect(LIVE_URL.port || 80, LIVE_URL.hostname, () => {
+    const headers = [];
+    for (let i = 0; i < req.rawHeaders.length; i += 2) {
+      const name = req.rawHeaders[i];
+      headers.push(`${name}: ${name.toLowerCase() === 'host' ? LIVE_URL.host : req.rawHeaders[i + 1]}`);
+    }
+    upstream.write(`GET ${LIVE_URL.pathname} HTTP/1.1\r\n${headers.join('\r\n')}\r\n\r\n`);
+    upstream.write(head);
+    socket.pipe(upstream).pipe(socket);
+  });
+  upstream.on('error', () => socket.destroy());
+  socket.on('error', () => upstream.destroy());
 });
\ No newline at end of file
@@ -1,7 +1,8 @@
 import numpy as np
 from math import log, sqrt, exp
-from scipy.stats import norm
-from DataSourcing import get_risk_free_rate, get_option_data
+from scipy.special import ndtr
+from Common import metrics
+from .DataSourcing import get_risk_free_rates, get_option_data
 
 #Black–Scholes Formulas
 def black_scholes_call(S, K, T, r, sigma):
@@ -22,7 +23,7 @@ def black_scholes_call(S, K, T, r, sigma):
     d1 = (log(S/K) + (r + 0.5*sigma**2)*T) / (sigma * sqrt(T))
     d2 = d1 - sigma*sqrt(T)
     
-    call_price = S * norm.cdf(d1) - K * exp(-r*T) * norm.cdf(d2)
+    call_price = S * ndtr(d1) - K * exp(-r*T) * ndtr(d2)
     return call_price
 
 
@@ -43,127 +44,476 @@ def black_scholes_put(S, K, T, r, sigma):
     d1 = (log(S/K) + (r + 0.5*sigma**2)*T) / (sigma * sqrt(T))
     d2 = d1 - sigma*sqrt(T)
     
-    put_price = K * exp(-r*T) * norm.cdf(-d2) - S * norm.cdf(-d1)
+    put_price = K * exp(-r*T) * ndtr(-d2) - S * ndtr(-d1)
     return put_price
 
 
-#Implied Volatility Calculation using Newton-Raphson method
-def implied_vol_call(market_price, S, K, T, r=0.0, tol=0.001, max_iter=100):
+#Implied Volatility Calculation (scalar wrappers over the batch solver)
+def implied_vol_call(market_price, S, K, T, r=0.0, tol=None, max_iter=100, rtol=1e-8):
     """
-    Newton-Raphson to find implied volatility for a European Call.
+    Implied volatility for a single European Call.
     market_price: Observed market price (bid/ask mid or last)
     S, K, T, r: Underlying price, strike, time-to-expiry, risk-free rate
+    tol: Absolute price tolerance; if None, converge on a step below rtol * sigma
+
+    Returns NaN if the price violates no-arbitrage bounds or the solver
+    does not converge.
     """
-    # Intrinsic value for a call is max(0, S - K*exp(-r*T))
-    intrinsic_value = max(0.0, S - K*exp(-r*T))
-    if market_price < intrinsic_value:
-        return np.nan  # Impossible if below intrinsic
-    
-    sigma = 0.3  # initial guess
-    for _ in range(max_iter):
-        price_guess = black_scholes_call(S, K, T, r, sigma)
-        diff = price_guess - market_price
-        
-        if abs(diff) < tol:
-            return sigma
-        
-        # Vega: partial derivative wrt sigma
-        d1 = (log(S/K) + (r + 0.5*sigma**2)*T) / (sigma * sqrt(T))
-        vega = S * norm.pdf(d1) * sqrt(T)
-        
-        if vega < 1e-8:  # avoid division by near-zero
-            break
-        
-        sigma -= diff / vega
-        if sigma < 1e-8:
-            sigma = 1e-8
-    
-    return sigma
+    return _scalar_implied_vol(market_price, S, K, T, r, True, tol, max_iter, rtol)
 
 
-def implied_vol_put(market_price, S, K, T, r=0.0, tol=0.01, max_iter=100):
+def implied_vol_put(market_price, S, K, T, r=0.0, tol=None, max_iter=100, rtol=1e-8):
     """
-    Newton-Raphson to find implied volatility for a European Put.
+    Implied volatility for a single European Put.
     market_price: Observed market price (bid/ask mid or last)
     S, K, T, r: Underlying price, strike, time-to-expiry, risk-free rate
+    tol: Absolute price tolerance; if None, converge on a step below rtol * sigma
+
+    Returns NaN if the price violates no-arbitrage bounds or the solver
+    does not converge.
     """
-    # Intrinsic value for a put is max(0, K*exp(-r*T) - S)
-    intrinsic_value = max(0.0, K*exp(-r*T) - S)
-    if market_price < intrinsic_value:
-        return np.nan
-    
-    sigma = 0.3  # initial guess
+    return _scalar_implied_vol(market_price, S, K, T, r, False, tol, max_iter, rtol)
+
+
+def _scalar_implied_vol(market_price, S, K, T, r, is_call, tol, max_iter, rtol):
+    if tol is None:
+        return float(implied_vols(market_price, S, K, T, r=r, is_call=is_call,
+                                  method="seeded", rtol=rtol, max_iter=max_iter))
+    # Stop on the price, as callers passing tol expect, from the seeded start
+    sigma0 = seed_implied_vols(market_price, S, K, T, r, is_call)
+    return float(implied_vols(market_price, S, K, T, r=r, is_call=is_call,
+                              method="newton", tol=tol, sigma0=sigma0, max_iter=max_iter))
+
+
+
+#Vectorized Black–Scholes and batch implied volatility over whole chains
+SQRT_2PI = np.sqrt(2.0 * np.pi)
+SIGMA_LOWER = 1e-6
+SIGMA_UPPER = 10.0
+
+
+def _lanes(*values, is_call, flat=False):
+    """
+    values as float arrays and is_call as a bool array (last), broadcast
+    against each other; flat=True also ravels them to 1-D.
+    """
+    arrays = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in values), np.asarray(is_call, dtype=bool))
+    return [a.ravel() for a in arrays] if flat else arrays
+
+
+def _d1_d2(S, K, T, r, sigma):
+    sqrt_T = np.sqrt(T)
+    d1 = (np.log(S / K) + (r + 0.5 * sigma**2) * T) / (sigma * sqrt_T)
+    return d1, d1 - sigma * sqrt_T
+
+
+def black_scholes_price(S, K, T, r, sigma, is_call=True):
+    """
+    Black-Scholes price of European calls/puts over NumPy arrays.
+
+    All arguments broadcast against each other. is_call is a boolean
+    scalar or array selecting the call (True) or put (False) formula per lane.
+    Lanes with T <= 0 or sigma <= 0 are priced at intrinsic value.
+    """
+    S, K, T, r, sigma, is_call = _lanes(S, K, T, r, sigma, is_call=is_call)
+    live = (T > 0) & (sigma > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d1, d2 = _d1_d2(S, K, T, r, sigma)
+    df_K = K * np.exp(-r * np.where(live, T, 0.0))
+
+    call = S * ndtr(d1) - df_K * ndtr(d2)
+    put = df_K * ndtr(-d2) - S * ndtr(-d1)
+    price = np.where(is_call, call, put)
+
+    intrinsic = np.where(is_call, np.maximum(0.0, S - K), np.maximum(0.0, K - S))
+    return np.where(live, price, intrinsic)
+
+
+GREEKS = ("delta", "gamma", "vega", "theta", "rho", "vanna", "volga")
+
+
+def black_scholes_greeks(S, K, T, r, sigma, is_call=True, greeks=GREEKS):
+    """
+    Black-Scholes Greeks over NumPy arrays in one pass sharing d1/d2.
+
+    All arguments broadcast against each other, as in black_scholes_price.
+    greeks: names to compute, any of GREEKS
+    Returns {name: array}. Vega, vanna and volga are per unit of vol (1.0 =
+    100 vol points), theta is per year and rho per unit of rate. Lanes with
+    T <= 0, sigma <= 0 or NaN inputs are NaN.
+    """
+    unknown = set(greeks) - set(GREEKS)
+    if unknown:
+        raise ValueError(f"Unknown greeks {sorted(unknown)}; choose from {GREEKS}.")
+    S, K, T, r, sigma, is_call = _lanes(S, K, T, r, sigma, is_call=is_call)
+    live = (T > 0) & (sigma > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        T = np.where(live, T, np.nan)
+        sigma = np.where(live, sigma, np.nan)
+        sqrt_T = np.sqrt(T)
+        d1, d2 = _d1_d2(S, K, T, r, sigma)
+        pdf = np.exp(-0.5 * d1**2) / SQRT_2PI
+        df_K = K * np.exp(-r * T)
+        # Signed N(d2) term shared by theta and rho
+        nd2 = np.where(is_call, ndtr(d2), -ndtr(-d2))
+        vega = S * pdf * sqrt_T
+
+        formulas = {
+            "delta": lambda: np.where(is_call, ndtr(d1), ndtr(d1) - 1.0),
+            "gamma": lambda: pdf / (S * sigma * sqrt_T),
+            "vega": lambda: vega,
+            "theta": lambda: -S * pdf * sigma / (2.0 * sqrt_T) - r * df_K * nd2,
+            "rho": lambda: T * df_K * nd2,
+            "vanna": lambda: -pdf * d2 / sigma,
+            "volga": lambda: vega * d1 * d2 / sigma,
+        }
+        return {name: formulas[name]() for name in greeks}
+
+
+# Per-contract solver status codes
+IV_CONVERGED = 0
+IV_MAX_ITER = 1
+IV_NO_ARBITRAGE = 2
+
+
+def seed_implied_vols(prices, S, K, T, r=0.0, is_call=True):
+    """
+    Closed-form starting point for the implied vol iteration.
+
+    Corrado-Miller approximation, which reduces to Brenner-Subrahmanyam
+    (sigma ~ sqrt(2*pi/T) * C/S) at the money. Puts are mapped to calls
+    through put-call parity. Where the approximation's discriminant goes
+    negative (deep wings) the square root term is dropped.
+    """
+    prices, S, K, T, r, is_call = _lanes(prices, S, K, T, r, is_call=is_call)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        X = K * np.exp(-r * T)
+        call = np.where(is_call, prices, prices + S - X)
+        half_gap = 0.5 * (S - X)
+        excess = call - half_gap
+        disc = np.maximum(excess**2 - (S - X)**2 / np.pi, 0.0)
+        sigma = SQRT_2PI / ((S + X) * np.sqrt(T)) * (excess + np.sqrt(disc))
+    return np.clip(np.where(np.isfinite(sigma), sigma, 0.3), 0.01, 5.0)
+
+
+def _solve_implied_vols(prices, S, K, T, r, is_call, sigma0, tol, rtol, max_iter):
+    """
+    Safeguarded Halley/Newton iteration over every lane at once.
+
+    Each lane keeps a [lo, hi] bracket on sigma that tightens after every
+    pricing (the BSM price is increasing in sigma). Halley steps that leave
+    the bracket, or lanes whose vega has collapsed, fall back to bisection,
+    so every valid lane converges instead of stalling at a clamp.
+
+    A lane converges when |price - target| < tol, or when an accepted
+    Halley step is smaller than rtol * sigma (pass None to disable either).
+
+    Returns (sigma, iterations, status); lanes that did not converge are NaN.
+    """
+    prices, S, K, T, r, sigma, is_call = (
+        a.copy() for a in _lanes(prices, S, K, T, r, sigma0, is_call=is_call, flat=True)
+    )
+    n = prices.size
+    iterations = np.zeros(n, dtype=np.int64)
+    status = np.full(n, IV_MAX_ITER, dtype=np.int8)
+    tol = -1.0 if tol is None else tol
+    rtol = -1.0 if rtol is None else rtol
+
+    # No-arbitrage bounds: intrinsic < price < S (calls) or K*exp(-rT) (puts)
+    with np.errstate(invalid="ignore", over="ignore"):
+        df_K = K * np.exp(-r * T)
+        lower = np.where(is_call, np.maximum(0.0, S - df_K), np.maximum(0.0, df_K - S))
+        upper = np.where(is_call, S, df_K)
+        valid = (
+            np.isfinite(prices) & np.isfinite(S) & np.isfinite(K) & np.isfinite(T)
+            & (T > 0) & (S > 0) & (K > 0) & (prices > lower) & (prices < upper)
+        )
+    status[~valid] = IV_NO_ARBITRAGE
+
+    lo = np.full(n, SIGMA_LOWER)
+    hi = np.full(n, SIGMA_UPPER)
+    sigma = np.where(np.isfinite(sigma) & (sigma > lo) & (sigma < hi), sigma, 0.3)
+    active = np.flatnonzero(valid)
+
     for _ in range(max_iter):
-        price_guess = black_scholes_put(S, K, T, r, sigma)
-        diff = price_guess - market_price
-        
-        if abs(diff) < tol:
-            return sigma
-        
-        d1 = (log(S/K) + (r + 0.5*sigma**2)*T) / (sigma * sqrt(T))
-        vega = S * norm.pdf(d1) * sqrt(T)
-        
-        if vega < 1e-8:
+        if active.size == 0:
             break
-        
-        sigma -= diff / vega
-        if sigma < 1e-8:
-            sigma = 1e-8
-    
-    return sigma
+        s, k, t, rr, c, vol = S[active], K[active], T[active], r[active], is_call[active], sigma[active]
+        d1, d2 = _d1_d2(s, k, t, rr, vol)
+        df_k = k * np.exp(-rr * t)
+        price = np.where(c, s * ndtr(d1) - df_k * ndtr(d2), df_k * ndtr(-d2) - s * ndtr(-d1))
+        diff = price - prices[active]
+        iterations[active] += 1
+
+        # Tighten the bracket around the root
+        above = diff > 0
+        hi[active] = np.where(above, np.minimum(hi[active], vol), hi[active])
+        lo[active] = np.where(above, lo[active], np.maximum(lo[active], vol))
+
+        # Halley step: vega and volga share d1/d2 with the price
+        vega = s * np.exp(-0.5 * d1**2) / SQRT_2PI * np.sqrt(t)
+        volga = vega * d1 * d2 / vol
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            newton = diff / vega
+            step = newton / (1.0 - 0.5 * newton * volga / vega)
+            step = np.where(np.isfinite(step) & (np.abs(step) < np.abs(2.0 * newton)), step, newton)
+            candidate = vol - step
+
+        # A step below rtol * sigma is accepted even if round-off puts it
+        # on the wrong side of a bracket end that has shrunk onto sigma
+        usable = np.isfinite(candidate) & (vega >= 1e-12)
+        step_done = usable & (np.abs(step) <= rtol * vol)
+
+        a_lo, a_hi = lo[active], hi[active]
+        bisect = ~usable | (candidate <= a_lo) | (candidate >= a_hi)
+        candidate = np.where(bisect & ~step_done, 0.5 * (a_lo + a_hi), candidate)
+
+        # Converged on price, on a small step, or on a collapsed bracket
+        price_done = np.abs(diff) < tol
+        narrow = (a_hi - a_lo) < 1e-12 * np.maximum(1.0, a_hi)
+        done = price_done | step_done | narrow
 
-def compute_implied_vols(ticker_str, contract_type="calls"):
+        sigma[active] = np.where(price_done, vol, candidate)
+        status[active[done]] = IV_CONVERGED
+        active = active[~done]
+
+    sigma[status != IV_CONVERGED] = np.nan
+    return sigma, iterations, status
+
+
+def implied_vols(prices, S, K, T, r=0.0, is_call=True, tol=1e-6, max_iter=100,
+                 method="newton", rtol=1e-8, sigma0=None, full_output=False):
+    """
+    Batch implied volatility for a whole option chain.
+
+    prices: Observed option prices (bid/ask mid or last)
+    S, K, T, r: Underlying price, strike, time-to-expiry, risk-free rate
+    is_call: True for calls, False for puts (scalar or per-contract array)
+    tol: Absolute price tolerance (used by method="newton")
+    method: "newton" starts every lane at sigma=0.3 and stops on tol;
+            "seeded" starts from seed_implied_vols and stops once the step
+            is below rtol relative to sigma, typically in 2-4 iterations
+    sigma0: Optional starting sigma (scalar or array), overriding the method's
+    full_output: Also return per-contract iteration counts and status codes
+                 (IV_CONVERGED, IV_MAX_ITER, IV_NO_ARBITRAGE)
+
+    Arguments broadcast against each other. Returns an array of implied
+    volatilities with NaN wherever the price violates no-arbitrage bounds
+    or the solver did not converge.
+    """
+    shape = np.broadcast(prices, S, K, T, r, is_call).shape
+    if method == "newton":
+        start, price_tol, step_tol = 0.3, tol, None
+    elif method == "seeded":
+        start, price_tol, step_tol = seed_implied_vols(prices, S, K, T, r, is_call), None, rtol
+    else:
+        raise ValueError("method must be either 'newton' or 'seeded'.")
+    if sigma0 is not None:
+        start = sigma0
+
+    sigma, iterations, status = _solve_implied_vols(
+        prices, S, K, T, r, is_call, np.broadcast_to(start, shape), price_tol, step_tol, max_iter
+    )
+    if full_output:
+        return sigma.reshape(shape), iterations.reshape(shape), status.reshape(shape)
+    return sigma.reshape(shape)
+
+
+def _chain_to_arrays(data_list):
+    """
+    Flattens [(options_df, T), ...] into strike, market price and T arrays.
+    Uses the bid/ask mid where both are present, else lastPrice.
+    """
+    strikes, prices, ttes = [], [], []
+    for options_df, T in data_list:
+        n = len(options_df)
+        missing = np.full(n, np.nan)
+        bid = options_df["bid"].to_numpy(dtype=float) if "bid" in options_df else missing
+        ask = options_df["ask"].to_numpy(dtype=float) if "ask" in options_df else missing
+        last = options_df["lastPrice"].to_numpy(dtype=float) if "lastPrice" in options_df else missing
+
+        has_quote = ~np.isnan(bid) & ~np.isnan(ask)
+        strikes.append(options_df["strike"].to_numpy(dtype=float))
+        prices.append(np.where(has_quote, 0.5 * (bid + ask), last))
+        ttes.append(np.full(n, T, dtype=float))
+
+    if not strikes:
+        return np.empty(0), np.empty(0), np.empty(0)
+    return np.concatenate(strikes), np.concatenate(prices), np.concatenate(ttes)
+
+
+def implied_vols_from_chain(data_list, S, r, contract_type="calls", method="seeded", greeks=False):
+    """
+    Solves every contract in data_list at once.
+    r: Scalar rate, or one rate per (options_df, T) entry of data_list
+    greeks: Also return black_scholes_greeks at the solved vols (True for
+            all of GREEKS, or a list of names)
+    Returns (ivs, mny, ttes) arrays with NaN IVs filtered out; moneyness is
+    S/K for calls and K/S for puts. With greeks, (ivs, mny, ttes, {name: array}).
+    """
+    K, market_price, T = _chain_to_arrays(data_list)
+    is_call = contract_type == "calls"
+
+    r = np.asarray(r, dtype=float)
+    if r.ndim:
+        r = np.repeat(r, [len(options_df) for options_df, _ in data_list])
+
+    with metrics.span("iv.solve"):
+        iv, iterations, _ = implied_vols(market_price, S, K, T, r=r, is_call=is_call, method=method, full_output=True)
+    money = S / K if is_call else K / S
+
+    keep = ~np.isnan(iv)
+    if metrics.enabled():
+        metrics.count("iv.contracts", iv.size)
+        metrics.count("iv.newton_iterations", int(iterations.sum()))
+        metrics.count("iv.nan_dropped", int(iv.size - keep.sum()))
+    if not greeks:
+        return iv[keep], money[keep], T[keep]
+    names = GREEKS if greeks is True else greeks
+    rates = r[keep] if r.ndim else r
+    with metrics.span("iv.greeks"):
+        return iv[keep], money[keep], T[keep], black_scholes_greeks(S, K[keep], T[keep], rates, iv[keep], is_call, names)
+
+
+# Log-moneyness scale of the weights on put-call pairs in implied_forwards
+FORWARD_BAND = 0.1
+
+
+def implied_forwards(prices, S, K, T, r, is_call, band=FORWARD_BAND):
+    """
+    Forward per expiry from put-call parity, C - P = exp(-rT) * (F - K).
+
+    prices, K, T, is_call: calls and puts of every expiry as flat arrays
+    r: Scalar rate or one rate per contract (the discount factor)
+    band: Pairs are weighted by exp(-(ln(K/S) / band)^2), so the liquid
+          strikes near the money dominate the noisy deep-ITM/OTM ones
+
+    Strikes quoted on both sides are paired with one sort, each pair gives
+    F = K + exp(rT) * (C - P), and every expiry's weighted mean comes from
+    bincount sums, so all expiries are done in one pass. Expiries without a
+    usable pair fall back to S * exp(rT).
+    Returns (expiries, forwards), expiries sorted ascending.
+    """
+    prices, S, K, T, r, is_call = _lanes(prices, S, K, T, r, is_call=is_call, flat=True)
+    expiries, group = np.unique(T, return_inverse=True)
+    counts = np.bincount(group, minlength=expiries.size)
+    rate = np.bincount(group, weights=r, minlength=expiries.size) / np.maximum(counts, 1)
+    spot = np.bincount(group, weights=S, minlength=expiries.size) / np.maximum(counts, 1)
+    fallback = spot * np.exp(rate * expiries)
+
+    # Puts sort just before calls of the same expiry and strike
+    order = np.lexsort((is_call, K, group))
+    g, k, c, p, s = group[order], K[order], is_call[order], prices[order], S[order]
+    paired = (g[:-1] == g[1:]) & (k[:-1] == k[1:]) & ~c[:-1] & c[1:] & np.isfinite(p[:-1]) & np.isfinite(p[1:])
+    i = np.flatnonzero(paired)
+    g, k, s = g[i], k[i], s[i]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pair_forward = k + np.exp(rate[g] * expiries[g]) * (p[i + 1] - p[i])
+        weight = np.exp(-(np.log(k / s) / band) ** 2)
+        weight = np.where(np.isfinite(pair_forward) & np.isfinite(weight) & (pair_forward > 0), weight, 0.0)
+        total = np.bincount(g, weights=weight, minlength=expiries.size)
+        forwards = np.bincount(g, weights=weight * np.where(weight > 0, pair_forward, 0.0),
+                               minlength=expiries.size) / total
+    usable = (total > 1e-12) & np.isfinite(forwards) & (forwards > 0)
+    return expiries, np.where(usable, forwards, fallback)
+
+
+def otm_implied_vols(prices, S, K, T, r, is_call, method="seeded", band=FORWARD_BAND):
+    """
+    Implied vols of the out-of-the-money side of every strike.
+
+    Arguments are flat arrays of calls and puts together, as for
+    implied_forwards. Each expiry's forward F comes from implied_forwards;
+    puts are solved where K < F and calls where K >= F, against the
+    dividend-consistent spot F * exp(-rT) (Black-76 on the implied forward).
+    ITM contracts, about half the chain and the slowest, least liquid
+    lanes, are never solved.
+    Returns (iv, k, forwards): iv per contract (NaN for the ITM side and
+    unsolved contracts), log-forward-moneyness k = ln(K/F), and the
+    (expiries, forwards) pair from implied_forwards.
+    """
+    prices, S, K, T, r, is_call = _lanes(prices, S, K, T, r, is_call=is_call, flat=True)
+    with metrics.span("iv.forwards"):
+        expiries, forwards = implied_forwards(prices, S, K, T, r, is_call, band)
+    F = forwards[np.searchsorted(expiries, T)]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        k = np.log(K / F)
+    otm = np.where(is_call, K >= F, K < F)
+
+    iv = np.full(prices.size, np.nan)
+    i = np.flatnonzero(otm)
+    with metrics.span("iv.solve"):
+        iv[i], iterations, _ = implied_vols(prices[i], F[i] * np.exp(-r[i] * T[i]), K[i], T[i], r=r[i],
+                                            is_call=is_call[i], method=method, full_output=True)
+    if metrics.enabled():
+        metrics.count("iv.contracts", i.size)
+        metrics.count("iv.itm_skipped", int(prices.size - i.size))
+        metrics.count("iv.newton_iterations", int(iterations.sum()))
+        metrics.count("iv.nan_dropped", int(np.isnan(iv[i]).sum()))
+    return iv, k, (expiries, forwards)
+
+
+def otm_implied_vols_from_chain(data_list, S, r, method="seeded"):
+    """
+    otm_implied_vols over [(calls_df, puts_df, T), ...] chains.
+    r: Scalar rate, or one rate per entry of data_list
+    Returns (ivs, k, ttes, forwards) with NaN IVs filtered out; k is
+    ln(K/F) and forwards is (expiries, forwards).
+    """
+    K_c, price_c, T_c = _chain_to_arrays([(calls, T) for calls, _, T in data_list])
+    K_p, price_p, T_p = _chain_to_arrays([(puts, T) for _, puts, T in data_list])
+    is_call = np.r_[np.ones(K_c.size, dtype=bool), np.zeros(K_p.size, dtype=bool)]
+
+    r = np.asarray(r, dtype=float)
+    if r.ndim:
+        r = np.concatenate([np.repeat(r, [len(calls) for calls, _, _ in data_list]),
+                            np.repeat(r, [len(puts) for _, puts, _ in data_list])])
+
+    T = np.concatenate([T_c, T_p])
+    iv, k, forwards = otm_implied_vols(np.concatenate([price_c, price_p]), S, np.concatenate([K_c, K_p]), T,
+                                       r, is_call, method=method)
+    keep = ~np.isnan(iv)
+    return iv[keep], k[keep], T[keep], forwards
+
+
+def compute_implied_vols(ticker_str, contract_type="calls", greeks=False):
     """
     Main function to:
-      1. Get the risk-free rate from T-Bill yield.
-      2. Retrieve up to 3 earliest expiration DataFrames (calls or puts).
-      3. Compute implied volatility for each contract.
+      1. Retrieve up to 12 earliest expiration DataFrames (calls, puts or both).
+      2. Get a maturity-matched risk-free rate per expiry from the Treasury curve.
+      3. Compute implied volatility for the whole chain in one vectorized solve.
       4. Switch the moneyness formula:
          - For calls: moneyness = S / K
          - For puts:  moneyness = K / S
       5. Filter out any contracts that return NaN IV.
       6. Return arrays for implied vol, moneyness, and time-to-expiry.
+
+    With contract_type="both" each chain is downloaded once and a dict
+    {"calls": (ivs, mny, ttes), "puts": (ivs, mny, ttes)} is returned.
+    contract_type="otm" also downloads both sides but solves only the OTM one
+    of each strike against the implied forward (otm_implied_vols_from_chain),
+    returning (ivs, k, ttes, forwards) with k = ln(K/F); no greeks.
+
+    greeks=True (or a list of names from GREEKS) appends a dict of Greek
+    arrays, aligned with ivs, to each (ivs, mny, ttes) tuple.
     """
-    # Step 1: Risk-free rate from T-Bill
-    r = get_risk_free_rate()
-    
-    # Step 2: Get up to 3 option data sets
-    data_list, S = get_option_data(ticker_str, contract_type=contract_type)
-    
-    ivs = []
-    mny = []
-    ttes = []
-    
-    # Step 3: Loop over each (DataFrame, time-to-expiry) pair
-    for options_df, T in data_list:
-        for _, row in options_df.iterrows():
-            K = row["strike"]
-            
-            # Mid-price from bid/ask if possible
-            bid = row.get("bid", np.nan)
-            ask = row.get("ask", np.nan)
-            if not np.isnan(bid) and not np.isnan(ask):
-                market_price = 0.5 * (bid + ask)
-            else:
-                market_price = row.get("lastPrice", np.nan)
-            
-            if np.isnan(market_price):
-                continue  # skip if we have no usable price
-            
-            # Compute implied vol for call or put
-            if contract_type == "calls":
-                iv = implied_vol_call(market_price, S, K, T, r=r)
-                money = S / K  # Moneyness for calls
-            else:
-                iv = implied_vol_put(market_price, S, K, T, r=r)
-                money = K / S  # Moneyness for puts
-            
-            # Filter out any NaN implied vol
-            if np.isnan(iv):
-                continue
-            
-            ivs.append(iv)
-            mny.append(money)
-            ttes.append(T)
-    
-    return ivs, mny, ttes
\ No newline at end of file
+    if contract_type == "otm" and greeks:
+        raise ValueError("greeks are not available with contract_type='otm'.")
+
+    # Step 1: Get the option data sets
+    with metrics.span("iv.option_data"):
+        data_list, S = get_option_data(ticker_str, contract_type="both" if contract_type == "otm" else contract_type)
+
+    # Step 2: Zero rate matched to each expiry
+    with metrics.span("iv.rates"):
+        r = get_risk_free_rates([entry[-1] for entry in data_list])
+
+    # Steps 3-6: Batch solve and filter
+    if contract_type == "otm":
+        return otm_implied_vols_from_chain(data_list, S, r)
+    if contract_type == "both":
+        return {
+            "calls": implied_vols_from_chain([(calls, T) for calls, _, T in data_list], S, r, "calls", greeks=greeks),
+            "puts": implied_vols_from_chain([(puts, T) for _, puts, T in data_list], S, r, "puts", greeks=greeks),
+        }
+    return implied_vols_from_chain(data_list, S, r, contract_type=contract_type, greeks=greeks)
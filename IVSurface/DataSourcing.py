@@ -1,73 +1,129 @@
-import yfinance as yf
-from datetime import datetime
+import logging
+import numpy as np
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from Common.cache import get_cache
+import Common.providers  # backs the cache schemas with the configured data provider
+from YieldCurve.data import get_yield_data
+from YieldCurve.curve import TermStructure
+
+# Expirations fetched per ticker and the bound on concurrent chain downloads
+MAX_EXPIRATIONS = 12
+MAX_FETCH_WORKERS = 8
+
+logger = logging.getLogger(__name__)
 
 #Get the risk-free rate using the 3-month T-bill
 def get_risk_free_rate():
     """
-    Fetches the 3-month T-bill (annualized) yield from yfinance
+    Fetches the 3-month T-bill (annualized) yield from the data provider
     using the '^IRX' ticker. You can switch to a different T-Bill
     if you prefer e.g. '^IRX' -> 3-month, '^FVX' -> 5-year, etc.
     
     Returns the yield in decimal form (e.g. 0.045 => 4.5%).
     """
-    tbill = yf.Ticker("^IRX")  # 13-week T-bill index on Yahoo
-    hist = tbill.history(period="1d")
-    if hist.empty:
+    # 13-week T-bill index on Yahoo
+    last_close = get_cache().get("rates", ticker="^IRX")
+    if last_close is None:
         # Fallback if no data
         return 0.042
     
     # ^IRX is often quoted in basis points or %; typically it's in hundredths
-    last_close = hist["Close"].iloc[-1]
     # Convert to decimal form (e.g. 4.5 => 0.045)
     r_decimal = last_close / 100.0
     return r_decimal
 
 
-def get_option_data(ticker_str, contract_type="calls"):
+def get_risk_free_rates(T):
     """
-    Retrieves up to 3 option chain DataFrames (calls or puts) for a given ticker's earliest expirations.
-    
-    contract_type: 'calls' or 'puts'
+    Maturity-matched risk-free rates for each time-to-expiry in T (years).
+
+    Builds the Treasury term structure from the most recent day of index
+    yields and reads continuously-compounded zero rates off it. Falls back
+    to the flat 3-month T-bill rate, with a warning, when there is no day
+    with every tenor to build the curve from or the download fails.
+    """
+    T = np.asarray(T, dtype=float)
+    today = datetime.now()
+    try:
+        x, y, z = get_yield_data(today - timedelta(days=10), today + timedelta(days=1))
+        latest = ~np.isnan(z).any(axis=1)
+        if not latest.any():
+            raise ValueError("No day in the last 10 has a yield for every tenor.")
+        curve = TermStructure(x, y[latest][-1:], z[latest][-1:])
+    except (ValueError, KeyError, OSError) as e:
+        # KeyError: nothing recorded for a replay; OSError: the download failed
+        logger.warning("Using the flat 3-month T-bill rate; no Treasury curve: %s", e)
+        return np.full(T.shape, get_risk_free_rate())
+    return curve.zero_rates(T.ravel())[0].reshape(T.shape)
+
+
+def _fetch_chain(ticker_str, expiry_date):
+    """
+    Loads one expiration; a single option_chain download returns both sides.
+    """
+    chain = get_cache().get("option_chain", ticker=ticker_str, expiry=expiry_date)
+    return chain["calls"], chain["puts"]
+
+
+def _fetch_spot(ticker_str):
+    S = get_cache().get("spot", ticker=ticker_str)
+    if S is None:
+        raise ValueError("Could not retrieve stock price history.")
+    return S
+
+
+def get_option_chains(ticker_str, max_expirations=MAX_EXPIRATIONS, max_workers=MAX_FETCH_WORKERS):
+    """
+    Retrieves calls and puts for a ticker's earliest expirations concurrently.
+
+    The spot price and every expiration are downloaded on a bounded thread pool,
+    so surface build time is one round trip deep rather than one per expiry.
     Returns:
-      - A list of tuples: [(options_df, T), (options_df, T), (options_df, T)] for up to 3 expirations
+      - A list of tuples: [(calls_df, puts_df, T), ...] ordered by expiry
       - Underlying spot price S
     """
-    ticker = yf.Ticker(ticker_str)
-    
     # Get all available expiration dates
-    expirations = ticker.options
-    if not expirations:
+    expirations = get_cache().get("expirations", ticker=ticker_str)
+    if len(expirations) == 0:
         raise ValueError(f"No option data available for ticker {ticker_str}.")
-    
-    # Select up to the first 36 expiration dates
-    selected_expirations = expirations[:12]
-    
-    # Get current underlying price
-    stock_data = ticker.history(period="1d")
-    if stock_data.empty:
-        raise ValueError("Could not retrieve stock price history.")
-    S = stock_data["Close"].iloc[-1]
-    
-    # Build a list of (DataFrame, T) for each of the selected expirations
-    data_list = []
+    selected_expirations = [str(expiry_date) for expiry_date in expirations[:max_expirations]]
+
     now = datetime.now()
+    ttes = [
+        (datetime.strptime(expiry_date, "%Y-%m-%d") - now).days / 365.0
+        for expiry_date in selected_expirations
+    ]
+    # Skip if T <= 0
+    live = [(expiry_date, T) for expiry_date, T in zip(selected_expirations, ttes) if T > 0]
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(live) + 1))) as pool:
+        spot_future = pool.submit(_fetch_spot, ticker_str)
+        chain_futures = [pool.submit(_fetch_chain, ticker_str, expiry_date) for expiry_date, _ in live]
+
+        S = spot_future.result()
+        chains = [(*future.result(), T) for future, (_, T) in zip(chain_futures, live)]
+
+    return chains, S
+
+
+def get_option_data(ticker_str, contract_type="calls"):
+    """
+    Retrieves up to 12 option chain DataFrames for a given ticker's earliest expirations.
     
-    for expiry_date in selected_expirations:
-        chain = ticker.option_chain(expiry_date)
-        if contract_type == "calls":
-            options_df = chain.calls
-        elif contract_type == "puts":
-            options_df = chain.puts
-        else:
-            raise ValueError("contract_type must be either 'calls' or 'puts'.")
-        
-        expiry_dt = datetime.strptime(expiry_date, "%Y-%m-%d")
-        T = (expiry_dt - now).days / 365.0
-        
-        # Skip if T <= 0
-        if T > 0:
-            data_list.append((options_df, T))
-    
-    return data_list, S
+    contract_type: 'calls', 'puts' or 'both'
+    Returns:
+      - A list of tuples: [(options_df, T), ...] for calls or puts,
+        or [(calls_df, puts_df, T), ...] for 'both'
+      - Underlying spot price S
+    """
+    if contract_type not in ("calls", "puts", "both"):
+        raise ValueError("contract_type must be either 'calls', 'puts' or 'both'.")
 
+    chains, S = get_option_chains(ticker_str)
+    if contract_type == "both":
+        return chains, S
 
+    data_list = [(calls if contract_type == "calls" else puts, T) for calls, puts, T in chains]
+    return data_list, S
@@ -1,73 +1,103 @@
-import matplotlib.pyplot as plt
-from mpl_toolkits.mplot3d import Axes3D
-from scipy.interpolate import griddata
-import numpy as np
-from BSMCompute import compute_implied_vols
-
-# Choose a ticker symbol
-ticker_symbol = "NVDA"
-
-# Compute implied vols, moneyness, time-to-expiry for CALLS
-ivs_calls, mny_calls, ttes_calls = compute_implied_vols(ticker_symbol, contract_type="calls")
-
-filtered_calls = [
-    (iv, m, tte) 
-    for (iv, m, tte) in zip(ivs_calls, mny_calls, ttes_calls)
-    if -7 <= m <= 7
-]
-
-ivs_calls_filtered, mny_calls_filtered, ttes_calls_filtered = zip(*filtered_calls)
-
-# Compute implied vols, moneyness, time-to-expiry for PUTS
-ivs_puts, mny_puts, ttes_puts = compute_implied_vols(ticker_symbol, contract_type="puts")
-
-filtered_puts = [
-    (iv, m, tte) 
-    for (iv, m, tte) in zip(ivs_puts, mny_puts, ttes_puts)
-    if -7 <= m <= 7
-]
-
-ivs_puts_filtered, mny_puts_filtered, ttes_puts_filtered = zip(*filtered_puts)
+"""
+3D implied volatility surface plot.
 
-# Combined data
-ivs = np.array(ivs_calls_filtered + ivs_puts_filtered)
-mny = np.array(mny_calls_filtered + mny_puts_filtered)
-ttes = np.array(ttes_calls_filtered + ttes_puts_filtered)
+    python -m IVSurface.IVmap NVDA --method svi
+    python -m IVSurface.IVmap NVDA --side otm
 
-# Create grid data for interpolation
-grid_mny, grid_ttes = np.meshgrid(
-    np.linspace(min(mny), max(mny), 100),
-    np.linspace(min(ttes), max(ttes), 100)
-)
-grid_ivs = griddata((mny, ttes), ivs, (grid_mny, grid_ttes), method='cubic')
+surface_grid() is the compute half and needs no plotting libraries;
+surface_figure() draws onto a matplotlib Figure (imported on first use), so
+batch renders never open a window.
+"""
+import argparse
 
-fig = plt.figure(figsize=(12, 8), dpi=100)
-ax = fig.add_subplot(111, projection='3d')
-
-# Plot the surface
-surf = ax.plot_surface(grid_mny, grid_ttes, grid_ivs, cmap='viridis', edgecolor='none', alpha=0.8)
-
-# Customize the color bar
-cbar = fig.colorbar(surf, ax=ax, shrink=0.5, aspect=5, pad=0.1)
-cbar.set_label("Implied Volatility", rotation=270, labelpad=15)
-
-# Set axis labels and limits
-ax.set_xlabel("Moneyness (S/K or K/S)")
-ax.set_ylabel("Time to Expiry (Years)")
-ax.set_zlabel("Implied Volatility")
-
-# Set axis limits for better scaling
-ax.set_xlim(min(mny), max(mny))
-ax.set_ylim(min(ttes), max(ttes))
-ax.set_zlim(min(ivs), max(ivs)-3)
-
-# Set a better viewing angle
-ax.view_init(elev=30, azim=120)
-
-# Add a grid for better readability
-ax.grid(True)
-
-plt.title(f"Implied Volatility Surface for {ticker_symbol}")
+import numpy as np
 
-plt.tight_layout()
-plt.show()
\ No newline at end of file
+from Common import metrics
+from .store import record_surface
+from .surface import fit_surface
+
+GRID_POINTS = 100
+
+
+def surface_grid(ticker, method="svi", points=GRID_POINTS, record=False, side="both"):
+    """
+    Fits every expiry's smile (calls and puts from one download) and
+    evaluates the surface on a regular (log-moneyness, time-to-expiry) grid;
+    the fit is cached, so another resolution only re-evaluates it.
+    record: also append the surface to its history (IVSurface/store.py)
+    side: "both", or "otm" for OTM quotes only on ln(K/F) (see surface_quotes)
+    Returns (grid_k, grid_t, grid_ivs) with grid_ivs shaped (points, points).
+    """
+    surface = fit_surface(ticker, method=method, side=side)
+    if record:
+        record_surface(ticker, surface)
+    quotes = surface.quotes
+    grid_k = np.linspace(quotes["k"].min(), quotes["k"].max(), points)
+    grid_t = np.linspace(quotes["T"].min(), quotes["T"].max(), points)
+    return grid_k, grid_t, surface.grid(grid_k, grid_t)
+
+
+def surface_figure(ticker, grid_k, grid_t, grid_ivs, fig=None, side="both"):
+    """
+    Draws the surface; onto fig if given (e.g. a pyplot figure), else a new
+    headless Figure. side labels the moneyness axis, as in surface_grid.
+    """
+    if fig is None:
+        from matplotlib.figure import Figure
+        fig = Figure(figsize=(12, 8), dpi=100)
+    # Registers the 3d projection
+    from mpl_toolkits.mplot3d import Axes3D  # noqa: F401
+
+    with metrics.span("iv.plot"):
+        grid_mny, grid_ttes = np.meshgrid(grid_k, grid_t)
+        ax = fig.add_subplot(111, projection='3d')
+
+        # Plot the surface
+        surf = ax.plot_surface(grid_mny, grid_ttes, grid_ivs, cmap='viridis', edgecolor='none', alpha=0.8)
+
+        # Customize the color bar
+        cbar = fig.colorbar(surf, ax=ax, shrink=0.5, aspect=5, pad=0.1)
+        cbar.set_label("Implied Volatility", rotation=270, labelpad=15)
+
+        # Set axis labels and limits
+        ax.set_xlabel("Log-Moneyness ln(K/F)" if side == "otm" else "Log-Moneyness ln(K/S)")
+        ax.set_ylabel("Time to Expiry (Years)")
+        ax.set_zlabel("Implied Volatility")
+
+        # Set axis limits for better scaling
+        ax.set_xlim(grid_k.min(), grid_k.max())
+        ax.set_ylim(grid_t.min(), grid_t.max())
+        ax.set_zlim(np.nanmin(grid_ivs), np.nanmax(grid_ivs))
+
+        # Set a better viewing angle
+        ax.view_init(elev=30, azim=120)
+
+        # Add a grid for better readability
+        ax.grid(True)
+
+        ax.set_title(f"Implied Volatility Surface for {ticker}")
+        fig.tight_layout()
+    return fig
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plot a ticker's implied volatility surface.")
+    parser.add_argument("ticker", nargs="?", default="NVDA")
+    parser.add_argument("--method", default="svi", choices=["svi", "spline"])
+    parser.add_argument("--points", type=int, default=GRID_POINTS)
+    parser.add_argument("--side", default="both", choices=["both", "otm"],
+                        help="otm: solve only the OTM side of each strike, on log-forward moneyness")
+    args = parser.parse_args(argv)
+
+    # Kept in the surface history for later time-series queries
+    grid = surface_grid(args.ticker, args.method, args.points, record=True, side=args.side)
+
+    import matplotlib.pyplot as plt
+    surface_figure(args.ticker, *grid, fig=plt.figure(figsize=(12, 8), dpi=100), side=args.side)
+    if metrics.enabled():
+        print(metrics.summary())
+    plt.show()
+
+
+if __name__ == "__main__":
+    main()
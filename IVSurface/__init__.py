@@ -0,0 +1 @@
+"""Option chain sourcing, batch implied volatility and surface construction."""
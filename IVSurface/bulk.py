@@ -0,0 +1,138 @@
+"""
+Surfaces for a whole universe of tickers in one call.
+
+Chains are downloaded on a bounded thread pool (network bound); as each
+ticker's quotes arrive, its IV solve and surface fit are handed to a process
+pool (CPU bound), so downloads and fitting overlap. A failure in either stage
+is recorded against its ticker and the rest of the batch carries on.
+
+Fitted surfaces are also written to the "surface_fit" cache entry read by
+surface.fit_surface and, given a store, appended to its history.
+
+    python -m IVSurface.bulk NVDA AAPL MSFT --method svi --store
+    python -m IVSurface.bulk NVDA AAPL MSFT --side otm
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import NamedTuple
+
+import numpy as np
+
+from Common.cache import get_cache
+from .BSMCompute import _chain_to_arrays, implied_vols, otm_implied_vols
+from .DataSourcing import MAX_EXPIRATIONS, get_option_chains, get_risk_free_rates
+from .store import SurfaceStore, default_store
+from .surface import VolSurface
+
+IO_WORKERS = 16
+CPU_WORKERS = os.cpu_count() or 2
+
+
+class BulkResult(NamedTuple):
+    surfaces: dict      # ticker -> VolSurface
+    failures: dict      # ticker -> "ExceptionType: message"
+    elapsed: float      # seconds for the whole batch
+    throughput: float   # tickers (surfaces and failures) per second
+
+
+def _fetch_quotes(ticker, max_expirations):
+    """Network stage: calls and puts as flat arrays plus spot and per-contract rates."""
+    chains, S = get_option_chains(ticker, max_expirations=max_expirations)
+    K_c, price_c, T_c = _chain_to_arrays([(calls, T) for calls, _, T in chains])
+    K_p, price_p, T_p = _chain_to_arrays([(puts, T) for _, puts, T in chains])
+    K = np.concatenate([K_c, K_p])
+    T = np.concatenate([T_c, T_p])
+    is_call = np.r_[np.ones(K_c.size, dtype=bool), np.zeros(K_p.size, dtype=bool)]
+    return K, np.concatenate([price_c, price_p]), T, is_call, S, get_risk_free_rates(T)
+
+
+def _solve_surface(quotes, method, side="both"):
+    """CPU stage, run in a worker process: IV solve and fit -> VolSurface.to_dict()."""
+    K, price, T, is_call, S, r = quotes
+    if side == "otm":
+        iv, k, forwards = otm_implied_vols(price, S, K, T, r, is_call)
+        return VolSurface(k, T, iv, method=method, forwards=forwards, spot=S).to_dict()
+    iv = implied_vols(price, S, K, T, r=r, is_call=is_call, method="seeded")
+    return VolSurface(np.log(K / S), T, iv, method=method, spot=S).to_dict()
+
+
+def _describe(exc):
+    return f"{type(exc).__name__}: {exc}"
+
+
+def build_surfaces(tickers, method="svi", io_workers=IO_WORKERS, cpu_workers=CPU_WORKERS,
+                   max_expirations=MAX_EXPIRATIONS, store=None, side="both"):
+    """
+    Fits a surface for every ticker.
+    io_workers: concurrent chain downloads (each also fetches its expirations
+                concurrently, see get_option_chains)
+    cpu_workers: processes solving and fitting
+    store: SurfaceStore to append every fitted surface to, stamped with the
+           time its chain was fetched
+    side: "both", or "otm" to solve only the OTM side of each strike on
+          log-forward moneyness (see surface.surface_quotes)
+    Returns a BulkResult; tickers are deduplicated, order is preserved.
+    """
+    tickers = list(dict.fromkeys(tickers))
+    surfaces, failures, fetched = {}, {}, {}
+    start = time.perf_counter()
+    cache = get_cache()
+
+    with ThreadPoolExecutor(max_workers=max(1, io_workers)) as io_pool, \
+         ProcessPoolExecutor(max_workers=max(1, cpu_workers),
+                             mp_context=multiprocessing.get_context("spawn")) as cpu_pool:
+        pending = {io_pool.submit(_fetch_quotes, ticker, max_expirations): ("fetch", ticker) for ticker in tickers}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, ticker = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failures[ticker] = _describe(e)
+                    continue
+                if stage == "fetch":
+                    fetched[ticker] = (time.time_ns(), result[4])
+                    pending[cpu_pool.submit(_solve_surface, result, method, side)] = ("fit", ticker)
+                else:
+                    surfaces[ticker] = VolSurface.from_dict(result)
+                    cache.store("surface_fit", result, ticker=ticker, method=method, side=side)
+                    if store is not None:
+                        timestamp, spot = fetched[ticker]
+                        try:
+                            store.append(ticker, surfaces[ticker], spot, timestamp=timestamp)
+                        except Exception as e:
+                            failures[ticker] = _describe(e)
+
+    elapsed = time.perf_counter() - start
+    ordered = {ticker: surfaces[ticker] for ticker in tickers if ticker in surfaces}
+    failed = {ticker: failures[ticker] for ticker in tickers if ticker in failures}
+    return BulkResult(ordered, failed, elapsed, len(tickers) / elapsed if elapsed > 0 else float("inf"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fit IV surfaces for many tickers at once.")
+    parser.add_argument("tickers", nargs="+")
+    parser.add_argument("--method", default="svi", choices=["svi", "spline"])
+    parser.add_argument("--side", default="both", choices=["both", "otm"])
+    parser.add_argument("--io-workers", type=int, default=IO_WORKERS)
+    parser.add_argument("--cpu-workers", type=int, default=CPU_WORKERS)
+    parser.add_argument("--store", nargs="?", const="", default=None,
+                        help="append the surfaces to the surface history for --side (optionally at this directory)")
+    args = parser.parse_args(argv)
+
+    store = None if args.store is None else SurfaceStore(args.store) if args.store else default_store(args.side)
+    result = build_surfaces(args.tickers, args.method, args.io_workers, args.cpu_workers, store=store, side=args.side)
+    for ticker, surface in result.surfaces.items():
+        print(f"{ticker}: {surface.expiries.size} expiries")
+    for ticker, reason in result.failures.items():
+        print(f"{ticker}: FAILED {reason}")
+    print(f"{len(result.surfaces)}/{len(result.surfaces) + len(result.failures)} surfaces "
+          f"in {result.elapsed:.2f}s ({result.throughput:.1f} tickers/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Stateful IV surface that re-solves only the quotes that moved between polls.
+
+Contracts are identified by (T, side, strike); a strike listed twice in one
+chain keeps its last row. On every update the new chain is diffed against the
+previous one; only contracts that are new, or whose mid moved by more than
+price_tol (or price_rtol of the old mid), are re-solved, warm-started from
+their previous sigma. A spot move beyond spot_rtol makes every contract
+stale, but the warm start still gets each one in a step or two.
+Only expiries with a re-solved, added or dropped contract are refitted.
+"""
+import numpy as np
+import pandas as pd
+
+from .BSMCompute import _chain_to_arrays, implied_vols, seed_implied_vols
+from .DataSourcing import get_option_chains, get_risk_free_rates
+from .surface import VolSurface
+
+
+class IncrementalSurface:
+    """
+    ticker: symbol polled by refresh()
+    method: surface fit, "svi" or "spline"
+    price_tol, price_rtol: mid moves at or below max(price_tol, price_rtol * mid)
+                           keep the previous sigma
+    spot_rtol: relative spot move that invalidates every contract; smaller
+               moves keep solving against the last such spot
+    """
+
+    def __init__(self, ticker, method="svi", price_tol=0.005, price_rtol=1e-3, spot_rtol=1e-4):
+        self.ticker = ticker
+        self.method = method
+        self.price_tol = price_tol
+        self.price_rtol = price_rtol
+        self.spot_rtol = spot_rtol
+
+        self.surface = None
+        self.S = None
+        self.index = pd.MultiIndex.from_arrays([[], [], []], names=["T", "is_call", "K"])
+        self.mid = np.empty(0)
+        self.sigma = np.empty(0)
+        self._rates = {}
+
+    def _rates_for(self, T):
+        """Zero rate per contract; the curve is only read for unseen expiries."""
+        expiries = np.unique(T)
+        missing = [e for e in expiries.tolist() if e not in self._rates]
+        if missing:
+            self._rates.update(zip(missing, np.atleast_1d(get_risk_free_rates(np.asarray(missing))).tolist()))
+        lookup = np.array([self._rates[e] for e in expiries.tolist()])
+        return lookup[np.searchsorted(expiries, T)]
+
+    def update(self, chains, S):
+        """
+        chains: [(calls_df, puts_df, T), ...] as returned by get_option_chains
+        S: spot price
+        Returns a dict of counts: contracts, resolved, expiries_refit.
+        """
+        K_c, mid_c, T_c = _chain_to_arrays([(calls, T) for calls, _, T in chains])
+        K_p, mid_p, T_p = _chain_to_arrays([(puts, T) for _, puts, T in chains])
+        K = np.concatenate([K_c, K_p])
+        mid = np.concatenate([mid_c, mid_p])
+        T = np.concatenate([T_c, T_p])
+        is_call = np.r_[np.ones(K_c.size, dtype=bool), np.zeros(K_p.size, dtype=bool)]
+        index = pd.MultiIndex.from_arrays([T, is_call, K], names=["T", "is_call", "K"])
+        # A strike listed twice in one chain keeps its last row
+        unique = ~index.duplicated(keep="last")
+        if not unique.all():
+            K, mid, T, is_call, index = K[unique], mid[unique], T[unique], is_call[unique], index[unique]
+
+        # Match against the previous poll; -1 marks new contracts
+        prev = self.index.get_indexer(index) if len(self.index) else np.full(K.size, -1)
+        seen = prev >= 0
+        old_mid = np.full(K.size, np.nan)
+        old_sigma = np.full(K.size, np.nan)
+        old_mid[seen] = self.mid[prev[seen]]
+        old_sigma[seen] = self.sigma[prev[seen]]
+
+        spot_moved = self.S is None or abs(S - self.S) > self.spot_rtol * self.S
+        with np.errstate(invalid="ignore"):
+            moved = ~(np.abs(mid - old_mid) <= np.maximum(self.price_tol, self.price_rtol * np.abs(old_mid)))
+        moved &= ~(np.isnan(mid) & np.isnan(old_mid))
+        if spot_moved:
+            dirty = moved | ~seen | np.isfinite(mid)
+        else:
+            # Moves within spot_rtol keep the spot every sigma was solved at
+            S = self.S
+            # A quote that was unsolvable before and has not moved stays unsolvable
+            dirty = moved | ~seen
+
+        sigma = old_sigma.copy()
+        if dirty.any():
+            d = np.flatnonzero(dirty)
+            r = self._rates_for(T[d])
+            start = np.where(np.isfinite(old_sigma[d]), old_sigma[d],
+                             seed_implied_vols(mid[d], S, K[d], T[d], r, is_call[d]))
+            sigma[d] = implied_vols(mid[d], S, K[d], T[d], r=r, is_call=is_call[d], method="seeded", sigma0=start)
+
+        # Expiries with a re-solved contract or one that dropped out of the chain
+        gone = np.ones(len(self.index), dtype=bool)
+        gone[prev[seen]] = False
+        changed = np.union1d(np.unique(T[dirty]), np.unique(self.index.get_level_values("T")[gone]))
+
+        k = np.log(K / S)
+        if self.surface is None:
+            self.surface = VolSurface(k, T, sigma, method=self.method, spot=S)
+            refit = self.surface.expiries.tolist()
+        else:
+            refit = self.surface.update(k, T, sigma, changed)
+            self.surface.spot = float(S)
+
+        self.index, self.mid, self.sigma, self.S = index, mid, sigma, S
+        return {"contracts": int(K.size), "resolved": int(dirty.sum()), "expiries_refit": len(refit)}
+
+    def refresh(self, **kwargs):
+        """Polls the ticker's chains (through the market data cache) and applies them."""
+        chains, S = get_option_chains(self.ticker, **kwargs)
+        return self.update(chains, S)
+
+    def grid(self, k, T):
+        """Implied vols of the current surface on the (T, k) mesh."""
+        return self.surface.grid(k, T)
@@ -0,0 +1,280 @@
+"""
+Append-only history of fitted IV surfaces, read back through memory maps.
+
+Each ticker has its own directory of fixed-layout columnar files:
+
+    layout.json   grid axes: log-moneyness and tenors (days), and the
+                  moneyness convention, written once
+    index.bin     one INDEX_DTYPE record per surface, in timestamp order
+    grid.bin      float32 (n_tenors, n_k) implied vols per surface
+    rates.bin     float32 (n_tenors,) zero rates per surface
+    forwards.bin  float32 (n_tenors,) forwards per surface ("forward"
+                  histories only)
+    quotes.bin    QUOTE_DTYPE records (k, T, iv) of the raw quotes; each
+                  index record points at its run of them
+
+Every surface is evaluated on the same grid, so the history of one grid
+point (e.g. 30-day ATM vol) is a strided read of grid.bin and a date range
+is a binary search over the index's timestamps; nothing is parsed. The
+index record is written last and is what makes a surface visible, so a
+reader never sees a half-written one and a crashed append is overwritten
+by the next. One writer per ticker at a time.
+
+A history holds surfaces of one moneyness convention: "spot" (k = ln(K/S),
+the default build) or "forward" (k = ln(K/F), surfaces built from OTM
+quotes). Appending the other kind raises; default_store(side) keeps a
+separate history root per side.
+"""
+import json
+import os
+import re
+import threading
+import time
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from Common.cache import DEFAULT_DIRECTORY, get_cache
+from .DataSourcing import get_risk_free_rates
+
+DEFAULT_ROOT = os.path.join(DEFAULT_DIRECTORY, "surfaces")
+# History root per surface build side (see surface.surface_quotes)
+DEFAULT_ROOTS = {"both": DEFAULT_ROOT, "otm": os.path.join(DEFAULT_DIRECTORY, "surfaces-otm")}
+
+# Grid every stored surface is sampled on; includes k = 0 and the 30-day tenor
+LOG_MONEYNESS = np.round(np.linspace(-0.5, 0.5, 41), 6)
+TENOR_DAYS = np.array([7, 14, 30, 60, 91, 182, 273, 365, 547, 730])
+
+INDEX_DTYPE = np.dtype([("timestamp", "<i8"), ("spot", "<f8"), ("quote_start", "<i8"), ("quote_count", "<i8")])
+QUOTE_DTYPE = np.dtype([("k", "<f4"), ("T", "<f4"), ("iv", "<f4")])
+
+
+class SurfaceHistory(NamedTuple):
+    timestamps: np.ndarray      # (n,) int64 ns since epoch
+    spot: np.ndarray            # (n,)
+    iv: np.ndarray              # (n, n_tenors, n_k) float32
+    rates: np.ndarray           # (n, n_tenors) float32 zero rates
+    log_moneyness: np.ndarray   # (n_k,) grid axis
+    tenor_days: np.ndarray      # (n_tenors,) grid axis
+    positions: np.ndarray       # (n,) record numbers, for SurfaceStore.quotes
+    moneyness: str              # "spot" (k = ln(K/S)) or "forward" (k = ln(K/F))
+    forwards: np.ndarray        # (n, n_tenors) what k is measured against
+
+
+def _timestamp_ns(value):
+    if value is None:
+        return time.time_ns()
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    ts = pd.Timestamp(value)
+    return (ts.tz_localize("UTC") if ts.tz is None else ts).value
+
+
+def moneyness_of(surface):
+    """Convention of a VolSurface's k: "forward" when fitted against implied forwards, else "spot"."""
+    return "forward" if getattr(surface, "forwards", None) is not None else "spot"
+
+
+def _interp_weights(axis, x):
+    """Bracketing indices and weights for linear interpolation on axis, clamped at its ends."""
+    x = min(max(x, axis[0]), axis[-1])
+    i = int(np.clip(np.searchsorted(axis, x) - 1, 0, len(axis) - 2))
+    f = (x - axis[i]) / (axis[i + 1] - axis[i])
+    return i, f
+
+
+class SurfaceStore:
+    """
+    root: directory holding one subdirectory per ticker
+    log_moneyness, tenor_days: grid for tickers created by this store;
+                               existing tickers keep the grid they were
+                               created with
+    """
+
+    def __init__(self, root=DEFAULT_ROOT, log_moneyness=LOG_MONEYNESS, tenor_days=TENOR_DAYS):
+        self.root = root
+        self.log_moneyness = np.asarray(log_moneyness, dtype=float)
+        self.tenor_days = np.asarray(tenor_days, dtype=float)
+        self._lock = threading.Lock()
+
+    def _dir(self, ticker):
+        if not re.fullmatch(r"[A-Za-z0-9.^=_-]+", ticker):
+            raise ValueError(f"Unsupported ticker '{ticker}'.")
+        return os.path.join(self.root, ticker)
+
+    def _path(self, ticker, name):
+        return os.path.join(self._dir(ticker), name)
+
+    def tickers(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(t for t in os.listdir(self.root) if os.path.exists(os.path.join(self.root, t, "layout.json")))
+
+    def _layout(self, ticker):
+        with open(self._path(ticker, "layout.json")) as f:
+            return json.load(f)
+
+    def layout(self, ticker):
+        """(log_moneyness, tenor_days) of the ticker's grid."""
+        layout = self._layout(ticker)
+        return np.asarray(layout["log_moneyness"]), np.asarray(layout["tenor_days"])
+
+    def moneyness(self, ticker):
+        """The ticker's moneyness convention, "spot" or "forward" (histories predating it are "spot")."""
+        return self._layout(ticker).get("moneyness", "spot")
+
+    def _memmap(self, ticker, name, dtype, shape=()):
+        """Whole records of a column file as a read-only memmap (trailing partial writes ignored)."""
+        path = self._path(ticker, name)
+        record = np.dtype(dtype).itemsize * int(np.prod(shape))
+        count = os.path.getsize(path) // record if os.path.exists(path) else 0
+        if count == 0:
+            return np.empty((0, *shape), dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", shape=(count, *shape))
+
+    def version(self, ticker):
+        """Token that changes whenever a surface is appended for ticker."""
+        path = self._path(ticker, "index.bin")
+        if not os.path.exists(path):
+            return f"{ticker}:empty"
+        stat = os.stat(path)
+        return f"{ticker}:{stat.st_size // INDEX_DTYPE.itemsize}:{stat.st_mtime_ns}"
+
+    def _index(self, ticker):
+        if not os.path.exists(self._path(ticker, "layout.json")):
+            raise KeyError(f"No stored surfaces for {ticker}.")
+        return self._memmap(ticker, "index.bin", INDEX_DTYPE)
+
+    def append(self, ticker, surface, spot, timestamp=None, rates=None):
+        """
+        Stores a fitted VolSurface.
+        spot: underlying price the surface was fitted at
+        timestamp: when the quotes were taken (ns, datetime or string; now by default)
+        rates: zero rates at the grid tenors (default: the current Treasury curve)
+        Returns the record number within the ticker's history. Raises
+        ValueError if the surface's moneyness convention (moneyness_of)
+        differs from the history's.
+        """
+        ts = _timestamp_ns(timestamp)
+        moneyness = moneyness_of(surface)
+        with self._lock:
+            directory = self._dir(ticker)
+            if not os.path.exists(os.path.join(directory, "layout.json")):
+                os.makedirs(directory, exist_ok=True)
+                with open(os.path.join(directory, "layout.json"), "w") as f:
+                    json.dump({"log_moneyness": self.log_moneyness.tolist(),
+                               "tenor_days": self.tenor_days.tolist(), "moneyness": moneyness}, f)
+            if self.moneyness(ticker) != moneyness:
+                raise ValueError(f"The {ticker} history at {self.root} holds {self.moneyness(ticker)}-moneyness "
+                                 f"surfaces; cannot append a {moneyness}-moneyness one.")
+            k, days = self.layout(ticker)
+            T = days / 365.0
+
+            index = self._index(ticker)
+            n = len(index)
+            if n and ts < index["timestamp"][-1]:
+                raise ValueError(f"Surfaces for {ticker} must be appended in time order.")
+            quote_start = int(index["quote_start"][-1] + index["quote_count"][-1]) if n else 0
+            del index
+
+            quotes = surface.quotes or {"k": [], "T": [], "iv": []}
+            raw = np.empty(len(quotes["k"]), dtype=QUOTE_DTYPE)
+            raw["k"], raw["T"], raw["iv"] = quotes["k"], quotes["T"], quotes["iv"]
+            grid = surface.grid(k, T).astype("<f4")
+            if rates is None:
+                rates = get_risk_free_rates(T)
+            rates = np.broadcast_to(np.asarray(rates, dtype="<f4"), T.shape)
+
+            # Column files first, each written at its slot for record n; the
+            # index record last
+            self._write(ticker, "quotes.bin", quote_start * QUOTE_DTYPE.itemsize, raw.tobytes())
+            self._write(ticker, "grid.bin", n * grid.nbytes, grid.tobytes())
+            self._write(ticker, "rates.bin", n * rates.nbytes, rates.tobytes())
+            if moneyness == "forward":
+                forwards = surface.forward(float(spot), T).astype("<f4")
+                self._write(ticker, "forwards.bin", n * forwards.nbytes, forwards.tobytes())
+            record = np.array([(ts, float(spot), quote_start, raw.size)], dtype=INDEX_DTYPE)
+            self._write(ticker, "index.bin", n * INDEX_DTYPE.itemsize, record.tobytes())
+            return n
+
+    def _write(self, ticker, name, offset, data):
+        path = self._path(ticker, name)
+        with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+            f.seek(offset)
+            f.write(data)
+            f.truncate()
+
+    def _range(self, timestamps, start, end):
+        lo = 0 if start is None else int(np.searchsorted(timestamps, _timestamp_ns(start), side="left"))
+        hi = len(timestamps) if end is None else int(np.searchsorted(timestamps, _timestamp_ns(end), side="right"))
+        return lo, max(lo, hi)
+
+    def history(self, ticker, start=None, end=None):
+        """Surfaces with timestamps in [start, end] as memory-mapped views (SurfaceHistory)."""
+        index = self._index(ticker)
+        k, days = self.layout(ticker)
+        lo, hi = self._range(index["timestamp"], start, end)
+        grid = self._memmap(ticker, "grid.bin", "<f4", (days.size, k.size))
+        rates = self._memmap(ticker, "rates.bin", "<f4", (days.size,))
+        moneyness = self.moneyness(ticker)
+        if moneyness == "forward":
+            forwards = self._memmap(ticker, "forwards.bin", "<f4", (days.size,))[lo:hi]
+        else:
+            forwards = np.repeat(np.asarray(index["spot"][lo:hi], dtype="<f4")[:, None], days.size, axis=1)
+        return SurfaceHistory(index["timestamp"][lo:hi], index["spot"][lo:hi], grid[lo:hi], rates[lo:hi],
+                              k, days, np.arange(lo, hi), moneyness, forwards)
+
+    def series(self, ticker, tenor_days=30, k=0.0, start=None, end=None):
+        """
+        Implied vol at one (tenor, log-moneyness) point over time:
+        (timestamps, vols), bilinear between grid points (exact on them).
+        """
+        h = self.history(ticker, start, end)
+        i, fi = _interp_weights(h.tenor_days, tenor_days)
+        j, fj = _interp_weights(h.log_moneyness, k)
+        corners = h.iv[:, i:i + 2, j:j + 2].astype(float)
+        near = corners[:, 0, 0] * (1 - fj) + corners[:, 0, 1] * fj
+        far = corners[:, 1, 0] * (1 - fj) + corners[:, 1, 1] * fj
+        return np.asarray(h.timestamps), near * (1 - fi) + far * fi
+
+    def term_structure(self, ticker, k=0.0, start=None, end=None):
+        """(timestamps, tenor_days, vols of shape (n, n_tenors)) at one log-moneyness."""
+        h = self.history(ticker, start, end)
+        j, fj = _interp_weights(h.log_moneyness, k)
+        vols = h.iv[:, :, j] * (1 - fj) + h.iv[:, :, j + 1] * fj
+        return np.asarray(h.timestamps), h.tenor_days, vols
+
+    def quotes(self, ticker, position):
+        """Raw (k, T, iv) quotes of one stored surface, by record number."""
+        record = self._index(ticker)[position]
+        quotes = self._memmap(ticker, "quotes.bin", QUOTE_DTYPE)
+        run = quotes[record["quote_start"]:record["quote_start"] + record["quote_count"]]
+        return {name: np.asarray(run[name], dtype=float) for name in QUOTE_DTYPE.names}
+
+    def at(self, ticker, timestamp):
+        """Record number of the latest surface at or before timestamp, or None."""
+        index = self._index(ticker)
+        i = int(np.searchsorted(index["timestamp"], _timestamp_ns(timestamp), side="right")) - 1
+        return i if i >= 0 else None
+
+
+def default_store(side="both"):
+    """The shared history for surfaces built with side ("both" or "otm")."""
+    if side not in DEFAULT_ROOTS:
+        raise ValueError(f"side must be one of {tuple(DEFAULT_ROOTS)}.")
+    return SurfaceStore(DEFAULT_ROOTS[side])
+
+
+def record_surface(ticker, surface, store=None, timestamp=None):
+    """
+    Appends a freshly fitted surface at the spot it was fitted at (the cached
+    spot price for surfaces that do not carry one), by default to the shared
+    history for its moneyness convention.
+    """
+    if store is None:
+        store = default_store("otm" if moneyness_of(surface) == "forward" else "both")
+    spot = getattr(surface, "spot", None)
+    if spot is None:
+        spot = get_cache().get("spot", ticker=ticker)
+    return store.append(ticker, surface, spot, timestamp=timestamp)
@@ -0,0 +1,366 @@
+"""
+Implied volatility surfaces fitted per expiry and interpolated across maturity.
+
+Each expiry's smile is fitted in total implied variance w = iv^2 * T against
+log-moneyness k = ln(K / S), or k = ln(K / F) against each expiry's implied
+forward when the surface is built from OTM quotes only (side="otm"):
+  - "svi": raw SVI, w(k) = a + b * (rho * (k - m) + sqrt((k - m)^2 + s^2)).
+    For fixed (m, s) the model is linear in (a, b * rho, b), so every point
+    of an (m, s) grid is one small least-squares solve, all done at once; the
+    best grid point is refined on a finer grid around it. Wings are linear
+    in k, so there is no overshoot outside the quoted strikes.
+  - "spline": a smoothing spline in k, sampled on shared k nodes and held
+    flat beyond each expiry's quoted strikes.
+
+Between expiries w is interpolated linearly in T at fixed k; before the first
+expiry and after the last, the nearest smile's implied vols are held.
+
+A fitted surface is just a few small arrays (VolSurface.to_dict), so it can be
+cached and re-evaluated on any grid without refitting.
+"""
+import numpy as np
+
+from Common import metrics
+from Common.cache import get_cache, register_fetcher
+from .BSMCompute import GREEKS, black_scholes_greeks, implied_vols_from_chain, otm_implied_vols_from_chain
+from .DataSourcing import get_option_chains, get_risk_free_rates
+
+SIDES = ("both", "otm")
+
+SVI_M_POINTS = 25
+SVI_S_GRID = np.geomspace(0.01, 1.5, 25)
+SVI_REFINE_POINTS = 15
+SPLINE_NODES = 201
+MIN_POINTS = 5
+
+
+def log_moneyness(mny, contract_type):
+    """compute_implied_vols moneyness (S/K for calls, K/S for puts) -> ln(K/S)."""
+    mny = np.asarray(mny, dtype=float)
+    return -np.log(mny) if contract_type == "calls" else np.log(mny)
+
+
+def svi_total_variance(k, params):
+    """Raw SVI total variance; params (..., 5) as (a, b, rho, m, s) broadcast against k."""
+    a, b, rho, m, s = np.moveaxis(np.asarray(params, dtype=float), -1, 0)
+    x = k - m
+    return a + b * (rho * x + np.sqrt(x * x + s * s))
+
+
+def _svi_grid_solve(k, w, weights, ms, ss):
+    """
+    Least squares for (a, b, rho) at every (m, s) pair of the given grids.
+    Returns (params (n_grid, 5), weighted SSE (n_grid,)); pairs whose solution
+    breaks b >= 0, |rho| <= 1 or a non-negative minimum variance get inf SSE.
+    """
+    m, s = (g.ravel() for g in np.meshgrid(ms, ss, indexing="ij"))
+    x = k[None, :] - m[:, None]
+    design = np.stack([np.ones_like(x), x, np.sqrt(x * x + s[:, None] ** 2)], axis=-1)
+    wd = design * weights[None, :, None]
+    lhs = np.einsum("gnf,gnh->gfh", wd, design) + 1e-12 * np.eye(3)
+    rhs = np.einsum("gnf,n->gf", wd, w)
+    coef = np.linalg.solve(lhs, rhs[..., None])[..., 0]
+
+    a, c_rho, b = coef.T
+    rho = np.divide(c_rho, b, out=np.zeros_like(b), where=b > 0)
+    resid = np.einsum("gnf,gf->gn", design, coef) - w
+    sse = np.einsum("gn,gn,n->g", resid, resid, weights)
+    feasible = (b >= 0) & (np.abs(rho) <= 1) & (a + b * s * np.sqrt(np.maximum(1 - rho * rho, 0)) >= 0)
+    sse = np.where(feasible, sse, np.inf)
+    return np.stack([a, b, rho, m, s], axis=-1), sse
+
+
+def fit_svi(k, w, weights=None):
+    """
+    Raw SVI parameters (a, b, rho, m, s) for one smile.
+    k: log-moneyness, w: total variance, weights: optional per-point weights
+    Falls back to a flat smile at the mean variance if no grid point is feasible.
+    """
+    k = np.asarray(k, dtype=float)
+    w = np.asarray(w, dtype=float)
+    weights = np.ones_like(k) if weights is None else np.asarray(weights, dtype=float)
+
+    span = max(k.max() - k.min(), 1e-3)
+    ms = np.linspace(k.min() - 0.25 * span, k.max() + 0.25 * span, SVI_M_POINTS)
+    params, sse = _svi_grid_solve(k, w, weights, ms, SVI_S_GRID)
+    best = np.argmin(sse)
+    if not np.isfinite(sse[best]):
+        return np.array([np.average(w, weights=weights), 0.0, 0.0, 0.0, 0.1])
+
+    # Refine around the best (m, s) on a grid one coarse step wide
+    m0, s0 = params[best, 3], params[best, 4]
+    dm = ms[1] - ms[0]
+    ratio = SVI_S_GRID[1] / SVI_S_GRID[0]
+    fine_ms = np.linspace(m0 - dm, m0 + dm, SVI_REFINE_POINTS)
+    fine_ss = np.geomspace(s0 / ratio, s0 * ratio, SVI_REFINE_POINTS)
+    fine, fine_sse = _svi_grid_solve(k, w, weights, fine_ms, fine_ss)
+    i = np.argmin(fine_sse)
+    return fine[i] if fine_sse[i] < sse[best] else params[best]
+
+
+def fit_spline(k, w, nodes, lam=None):
+    """
+    Smoothing spline of w in k sampled at nodes; flat beyond the quoted range.
+    Duplicate strikes (e.g. a call and a put) are averaged first.
+    """
+    k = np.asarray(k, dtype=float)
+    w = np.asarray(w, dtype=float)
+    # Calls and puts give ln(K/S) via S/K and K/S, equal only up to rounding
+    uk, inverse = np.unique(np.round(k, 10), return_inverse=True)
+    uw = np.bincount(inverse, weights=w) / np.bincount(inverse)
+    if uk.size < MIN_POINTS:
+        return np.interp(nodes, uk, uw)
+    from scipy.interpolate import make_smoothing_spline
+    spline = make_smoothing_spline(uk, uw, lam=lam)
+    return np.maximum(spline(np.clip(nodes, uk[0], uk[-1])), 0.0)
+
+
+def _finite_quotes(k, T, iv):
+    k, T, iv = (np.asarray(a, dtype=float).ravel() for a in (k, T, iv))
+    ok = np.isfinite(k) & np.isfinite(T) & np.isfinite(iv) & (T > 0) & (iv > 0)
+    return k[ok], T[ok], iv[ok]
+
+
+class VolSurface:
+    """
+    k: log-moneyness ln(K/S) per quote, or ln(K/F) given forwards
+    T: time to expiry in years per quote
+    iv: implied vol per quote
+    method: "svi" or "spline"
+    forwards: (expiries, forwards) the quotes' k is measured against, as
+              returned by BSMCompute.implied_forwards; None for ln(K/S)
+    spot: underlying price the quotes were solved at (kept in .spot)
+    Quotes are grouped into expiries by T; expiries with fewer than MIN_POINTS
+    quotes are skipped. The finite quotes are kept in .quotes.
+    """
+
+    def __init__(self, k, T, iv, method="svi", forwards=None, spot=None):
+        if method not in ("svi", "spline"):
+            raise ValueError("method must be either 'svi' or 'spline'.")
+        k, T, iv = _finite_quotes(k, T, iv)
+        self.method = method
+        self.spot = None if spot is None else float(spot)
+        self.forwards = None if forwards is None else {"T": np.asarray(forwards[0], dtype=float),
+                                                       "F": np.asarray(forwards[1], dtype=float)}
+        self.nodes = np.linspace(k.min(), k.max(), SPLINE_NODES) if method == "spline" and k.size else np.empty(0)
+        self.expiries = np.empty(0)
+        self.params = np.empty((0, SPLINE_NODES if method == "spline" else 5))
+        self._refit(k, T, iv, None)
+
+    def _fit_slice(self, k, w):
+        return fit_svi(k, w) if self.method == "svi" else fit_spline(k, w, self.nodes)
+
+    def _refit(self, k, T, iv, changed):
+        """
+        Fits the expiries in changed (all of them if None), keeping the
+        existing parameters of every other expiry that is still quoted.
+        Returns the refitted expiries.
+        """
+        expiries, group = np.unique(T, return_inverse=True)
+        counts = np.bincount(group, minlength=expiries.size)
+        if (counts >= MIN_POINTS).sum() == 0:
+            raise ValueError("Not enough quotes to fit a volatility surface.")
+        w = iv * iv * T
+
+        old = dict(zip(self.expiries.tolist(), self.params))
+        changed = None if changed is None else set(np.asarray(changed, dtype=float).tolist())
+        params, refit = [], []
+        for i, e in enumerate(expiries.tolist()):
+            if counts[i] < MIN_POINTS:
+                continue
+            if changed is None or e in changed or e not in old:
+                params.append(self._fit_slice(k[group == i], w[group == i]))
+                refit.append(e)
+            else:
+                params.append(old[e])
+
+        self.expiries = expiries[counts >= MIN_POINTS]
+        self.params = np.asarray(params)
+        self.k_range = (float(k.min()), float(k.max()))
+        self.quotes = {"k": k, "T": T, "iv": iv}
+        return refit
+
+    def update(self, k, T, iv, changed):
+        """
+        Replaces the quotes with a new full set, refitting only the expiries
+        in changed plus any newly quoted ones. Returns the refitted expiries.
+        """
+        return self._refit(*_finite_quotes(k, T, iv), changed)
+
+    @classmethod
+    def from_dict(cls, d):
+        """Rebuilds a surface from to_dict() output without refitting."""
+        surface = cls.__new__(cls)
+        surface.method = str(d["method"])
+        surface.expiries = np.asarray(d["expiries"], dtype=float)
+        surface.params = np.asarray(d["params"], dtype=float)
+        surface.nodes = np.asarray(d["nodes"], dtype=float)
+        surface.k_range = tuple(np.asarray(d["k_range"], dtype=float))
+        surface.quotes = d.get("quotes")
+        surface.forwards = d.get("forwards")
+        spot = d.get("spot")
+        surface.spot = None if spot is None else float(spot)
+        return surface
+
+    def to_dict(self):
+        """Fitted parameters as plain arrays (cacheable with Common.cache)."""
+        return {
+            "method": self.method,
+            "expiries": self.expiries,
+            "params": self.params,
+            "nodes": self.nodes,
+            "k_range": np.asarray(self.k_range),
+            "quotes": self.quotes,
+            "forwards": self.forwards,
+            "spot": self.spot,
+        }
+
+    def slices(self, k):
+        """Total variance of every fitted expiry at k: (n_expiries, *k.shape)."""
+        k = np.asarray(k, dtype=float)
+        if self.method == "svi":
+            return np.moveaxis(svi_total_variance(k[..., None], self.params), -1, 0)
+
+        # Linear interpolation on the shared nodes, clamped at the ends
+        x = np.clip(k, self.nodes[0], self.nodes[-1])
+        i = np.clip(np.searchsorted(self.nodes, x) - 1, 0, self.nodes.size - 2)
+        f = (x - self.nodes[i]) / (self.nodes[i + 1] - self.nodes[i])
+        return self.params[:, i] * (1 - f) + self.params[:, i + 1] * f
+
+    def _time_weights(self, T):
+        """
+        (len(T), n_expiries) weights such that w(k, T) = weights @ slices(k):
+        linear in T between expiries, constant implied vol outside them.
+        """
+        T = np.asarray(T, dtype=float).ravel()
+        e = self.expiries
+        weights = np.zeros((T.size, e.size))
+        rows = np.arange(T.size)
+        if e.size == 1:
+            weights[:, 0] = T / e[0]
+            return weights
+        j = np.clip(np.searchsorted(e, T), 1, e.size - 1)
+        f = (T - e[j - 1]) / (e[j] - e[j - 1])
+        below, above = T <= e[0], T >= e[-1]
+        f = np.where(below | above, 0.0, f)
+        weights[rows, j - 1] = 1 - f
+        weights[rows, j] += f
+        weights[below] = 0.0
+        weights[below, 0] = T[below] / e[0]
+        weights[above] = 0.0
+        weights[above, -1] = T[above] / e[-1]
+        return weights
+
+    def total_variance(self, k, T):
+        """w at matching (broadcast) k and T."""
+        k, T = np.broadcast_arrays(np.asarray(k, dtype=float), np.asarray(T, dtype=float))
+        slices = self.slices(k.ravel())                       # (n_exp, N)
+        weights = self._time_weights(T.ravel())               # (N, n_exp)
+        return np.einsum("ne,en->n", weights, slices).reshape(k.shape)
+
+    def implied_vol(self, k, T):
+        """Implied vol at matching (broadcast) k and T."""
+        k, T = np.broadcast_arrays(np.asarray(k, dtype=float), np.asarray(T, dtype=float))
+        w = np.maximum(self.total_variance(k, T), 0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(T > 0, np.sqrt(w / T), np.nan)
+
+    def grid(self, k, T):
+        """
+        Implied vols on the (T, k) mesh, shape (len(T), len(k)) like
+        np.meshgrid(k, T): one slice evaluation per k and one matrix product.
+        """
+        k = np.asarray(k, dtype=float).ravel()
+        T = np.asarray(T, dtype=float).ravel()
+        w = np.maximum(self._time_weights(T) @ self.slices(k), 0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(T[:, None] > 0, np.sqrt(w / T[:, None]), np.nan)
+
+    def forward(self, S, T):
+        """
+        What k is measured against at each T: S itself, or for a surface on
+        implied forwards their carry ln(F/S)/T interpolated in T (held flat
+        outside the quoted expiries).
+        """
+        T = np.asarray(T, dtype=float)
+        if self.forwards is None:
+            return np.full(T.shape, float(S))
+        carry = np.log(self.forwards["F"] / S) / self.forwards["T"]
+        return S * np.exp(np.interp(T, self.forwards["T"], carry) * T)
+
+    def greeks_grid(self, S, k, T, r=0.0, is_call=True, greeks=GREEKS):
+        """
+        Greeks of the surface on the (T, k) mesh, priced at strikes
+        forward(S, T) * exp(k) with the fitted vols. r is a scalar or one
+        rate per T.
+        Returns {name: (len(T), len(k))}, see black_scholes_greeks.
+        """
+        k = np.asarray(k, dtype=float).ravel()
+        T = np.asarray(T, dtype=float).ravel()
+        r = np.asarray(r, dtype=float)
+        sigma = self.grid(k, T)
+        strikes = self.forward(S, T)[:, None] * np.exp(k)[None, :]
+        return black_scholes_greeks(S, strikes, T[:, None], r.reshape(-1, 1) if r.ndim else r,
+                                    sigma, is_call, greeks)
+
+
+def _chain_quotes(ticker_str, side):
+    """
+    (k, T, iv, S, forwards) from one chain download: S is the spot every
+    quote was solved at, forwards is None unless side is "otm".
+    """
+    with metrics.span("iv.option_data"):
+        chains, S = get_option_chains(ticker_str)
+    with metrics.span("iv.rates"):
+        r = get_risk_free_rates([T for _, _, T in chains])
+    if side == "otm":
+        iv, k, T, forwards = otm_implied_vols_from_chain(chains, S, r)
+        return k, T, iv, S, forwards
+    sides = {
+        "calls": implied_vols_from_chain([(calls, T) for calls, _, T in chains], S, r, "calls"),
+        "puts": implied_vols_from_chain([(puts, T) for _, puts, T in chains], S, r, "puts"),
+    }
+    k = np.concatenate([log_moneyness(sides[name][1], name) for name in ("calls", "puts")])
+    T = np.concatenate([sides["calls"][2], sides["puts"][2]])
+    iv = np.concatenate([sides["calls"][0], sides["puts"][0]])
+    return k, T, iv, S, None
+
+
+def otm_quotes(ticker_str):
+    """
+    The OTM side of every strike for ticker_str as flat (k, T, iv) arrays,
+    k = ln(K/F), plus the (expiries, forwards) k is measured against.
+    """
+    k, T, iv, _, forwards = _chain_quotes(ticker_str, "otm")
+    return k, T, iv, forwards
+
+
+def surface_quotes(ticker_str, side="both"):
+    """
+    Quotes for ticker_str as flat (k, T, iv) arrays.
+    side: "both" solves calls and puts at every strike, k = ln(K/S);
+          "otm" solves only the OTM side of each strike, k = ln(K/F)
+          (see otm_quotes)
+    """
+    if side not in SIDES:
+        raise ValueError(f"side must be one of {SIDES}.")
+    return _chain_quotes(ticker_str, side)[:3]
+
+
+def _fit_ticker(ticker, method, side="both"):
+    k, T, iv, S, forwards = _chain_quotes(ticker, side)
+    with metrics.span("iv.fit"):
+        return VolSurface(k, T, iv, method=method, forwards=forwards, spot=S).to_dict()
+
+
+register_fetcher("surface_fit", _fit_ticker)
+
+
+def fit_surface(ticker_str, method="svi", side="both"):
+    """
+    Fitted surface for ticker_str, reused from the cache while it is fresh.
+    side: "both" or "otm", see surface_quotes
+    """
+    if side not in SIDES:
+        raise ValueError(f"side must be one of {SIDES}.")
+    return VolSurface.from_dict(get_cache().get("surface_fit", ticker=ticker_str, method=method, side=side))
@@ -0,0 +1 @@
+"""MBP-10 order book ingestion and aggregation for the order-flow canyon."""
@@ -0,0 +1,167 @@
+"""
+Order-book analytics over MBP-10 canyon arrays.
+
+Inputs are (n, depth) prices and sizes per level, level 0 being the top of
+book, as produced by create_orderbook or OrderBookBars (canyon depth is
+cumulative; level_sizes undoes that). Every metric is computed for all rows
+at once, so they can be served next to the canyon as extra layers.
+"""
+import numpy as np
+import pandas as pd
+
+# Rows compared at a time when matching levels by price between snapshots
+MATCH_CHUNK = 65_536
+
+# Per-row series
+SERIES = ("spread", "mid", "microprice", "depth_weighted_mid", "total_imbalance",
+          "ask_withdrawal", "ask_replenishment", "bid_withdrawal", "bid_replenishment")
+# Per-level (n, depth) layers
+LAYERS = ("imbalance", "depth_imbalance")
+METRICS = SERIES + LAYERS
+
+def level_sizes(cumulative):
+  """Cumulative depth (avc, bvc) -> size resting at each level."""
+  return np.diff(cumulative, axis=1, prepend=0.0)
+
+def _ratio(num, den):
+  with np.errstate(invalid='ignore', divide='ignore'):
+    return np.where(den > 0, num / den, np.nan)
+
+def spread(apx, bpx):
+  return apx[:, 0] - bpx[:, 0]
+
+def mid(apx, bpx):
+  return (apx[:, 0] + bpx[:, 0]) / 2
+
+def microprice(apx, bpx, asz, bsz):
+  """Top-of-book mid weighted toward the side with less size: (a * b_sz + b * a_sz) / (a_sz + b_sz)."""
+  return _ratio(apx[:, 0] * bsz[:, 0] + bpx[:, 0] * asz[:, 0], asz[:, 0] + bsz[:, 0])
+
+def depth_weighted_mid(apx, bpx, asz, bsz):
+  """Average of the size-weighted ask and bid prices over all levels."""
+  ask = _ratio(np.nansum(apx * asz, axis=1), np.nansum(asz, axis=1))
+  bid = _ratio(np.nansum(bpx * bsz, axis=1), np.nansum(bsz, axis=1))
+  return (ask + bid) / 2
+
+def imbalance(asz, bsz):
+  """(bid - ask) / (bid + ask) size at each level, in [-1, 1]; positive leans bid."""
+  return _ratio(bsz - asz, bsz + asz)
+
+def depth_imbalance(asz, bsz):
+  """Imbalance of the cumulative size down to each level; the last column is the whole book's."""
+  return imbalance(np.nancumsum(asz, axis=1), np.nancumsum(bsz, axis=1))
+
+def liquidity_changes(px, sz):
+  """
+  One side's (added, removed) resting size between consecutive snapshots,
+  matching levels by price so a shifting book is not counted as flow.
+  A price that appears inside the previous snapshot's visible range is new
+  size; a price that leaves the book from inside the current range is
+  withdrawn size. Prices scrolling past the visible depth count as neither.
+  Removals include executions, which MBP-10 alone cannot tell apart from
+  cancels. Row 0 has nothing to compare against and is zero.
+  """
+  n = len(px)
+  added = np.zeros(n)
+  removed = np.zeros(n)
+  with np.errstate(invalid='ignore'):
+    lo = np.fmin.reduce(px, axis=1)
+    hi = np.fmax.reduce(px, axis=1)
+    for start in range(1, n, MATCH_CHUNK):
+      cur = slice(start, min(start + MATCH_CHUNK, n))
+      prev = slice(start - 1, cur.stop - 1)
+      match = px[cur][:, :, None] == px[prev][:, None, :]
+
+      # Current levels against the previous snapshot
+      prev_size = np.einsum('nij,nj->ni', match, np.nan_to_num(sz[prev]))
+      seen = match.any(axis=2) | ((px[cur] >= lo[prev, None]) & (px[cur] <= hi[prev, None]))
+      delta = np.where(seen, np.nan_to_num(sz[cur]) - prev_size, 0.0)
+      added[cur] = np.maximum(delta, 0).sum(axis=1)
+      removed[cur] = np.maximum(-delta, 0).sum(axis=1)
+
+      # Previous levels that vanished from inside the current range
+      gone = ~match.any(axis=1) & (px[prev] >= lo[cur, None]) & (px[prev] <= hi[cur, None])
+      removed[cur] += np.where(gone, np.nan_to_num(sz[prev]), 0.0).sum(axis=1)
+  return added, removed
+
+def rolling(values, window, times=None, how='mean'):
+  """
+  Trailing window over rows (first axis).
+  window: int (rows) or a duration ('500ms', '1s', Timedelta) measured on
+          times (int64 ns, non-decreasing)
+  how: 'mean', 'sum', or 'rate' (sum per second; duration windows only)
+  Rows before a full window has passed use what is available.
+  """
+  values = np.asarray(values, dtype=np.float64)
+  filled = np.nan_to_num(values)
+  csum = np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(filled, axis=0)])
+  ccount = np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(~np.isnan(values), axis=0)])
+  end = np.arange(1, len(values) + 1)
+  if isinstance(window, (int, np.integer)):
+    span = None
+    begin = np.maximum(end - int(window), 0)
+  else:
+    if times is None:
+      raise ValueError('A duration window needs times.')
+    span = pd.Timedelta(window).value
+    begin = np.searchsorted(times, np.asarray(times) - span, side='right')
+  total = csum[end] - csum[begin]
+  if how == 'sum':
+    return total
+  if how == 'rate':
+    if span is None:
+      raise ValueError("how='rate' needs a duration window.")
+    return total / (span / 1e9)
+  return _ratio(total, ccount[end] - ccount[begin])
+
+def book_analytics(apx, bpx, avc, bvc, times=None, window=None, metrics=METRICS):
+  """
+  Analytics of canyon arrays (cumulative depth, as returned by get_data).
+  times: (n,) or (n, depth) event times in ns; needed for duration windows
+  window: None for per-snapshot liquidity flow, rows (int) for a trailing
+          sum over that many snapshots, or a duration ('1s') for trailing
+          rates in size per second
+  metrics: names from METRICS
+  Returns {name: array}: SERIES are (n,), LAYERS are (n, depth).
+  """
+  unknown = set(metrics) - set(METRICS)
+  if unknown:
+    raise ValueError(f'Unknown order-book metrics {sorted(unknown)}; choose from {list(METRICS)}.')
+  if times is not None:
+    times = np.asarray(times)
+    times = times[:, 0] if times.ndim == 2 else times
+  asz, bsz = level_sizes(avc), level_sizes(bvc)
+
+  out = {}
+  wanted = set(metrics)
+  if 'spread' in wanted:
+    out['spread'] = spread(apx, bpx)
+  if 'mid' in wanted:
+    out['mid'] = mid(apx, bpx)
+  if 'microprice' in wanted:
+    out['microprice'] = microprice(apx, bpx, asz, bsz)
+  if 'depth_weighted_mid' in wanted:
+    out['depth_weighted_mid'] = depth_weighted_mid(apx, bpx, asz, bsz)
+  if 'imbalance' in wanted:
+    out['imbalance'] = imbalance(asz, bsz)
+  if wanted & {'depth_imbalance', 'total_imbalance'}:
+    cumulative = depth_imbalance(asz, bsz)
+    if 'depth_imbalance' in wanted:
+      out['depth_imbalance'] = cumulative
+    if 'total_imbalance' in wanted:
+      out['total_imbalance'] = cumulative[:, -1]
+
+  for side, px, sz in (('ask', apx, asz), ('bid', bpx, bsz)):
+    names = (f'{side}_replenishment', f'{side}_withdrawal')
+    if not wanted & set(names):
+      continue
+    for name, flow in zip(names, liquidity_changes(px, sz)):
+      if name not in wanted:
+        continue
+      if window is None:
+        out[name] = flow
+      elif isinstance(window, (int, np.integer)):
+        out[name] = rolling(flow, window, how='sum')
+      else:
+        out[name] = rolling(flow, window, times, how='rate')
+  return {name: out[name] for name in metrics}
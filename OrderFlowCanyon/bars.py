@@ -0,0 +1,167 @@
+"""
+Fixed time bars over MBP-10 updates.
+
+Updates are bucketed by ts_event into bars of a fixed duration, so the canyon's
+time axis is wall clock and its size depends only on the window, not on the
+message rate. Per bar and level we keep:
+  - last: the book as of the bar's final update
+  - vwap: the size-weighted average quoted price of each level
+  - twa:  the time-weighted average size at each level, counting how long
+          each book state was live inside the bar
+Bars with no updates carry the previous book forward.
+"""
+from typing import NamedTuple
+import numpy as np
+import pandas as pd
+from .utils import level_block, event_times_ns, DEPTH
+
+class OrderBookBars(NamedTuple):
+  times: np.ndarray       # (n,) bar start, int64 ns since epoch
+  counts: np.ndarray      # (n,) updates in the bar
+  ask_px: np.ndarray      # (n, depth) last ask prices
+  bid_px: np.ndarray      # (n, depth) last bid prices
+  ask_sz: np.ndarray      # (n, depth) last ask sizes
+  bid_sz: np.ndarray      # (n, depth) last bid sizes
+  ask_vwap: np.ndarray    # (n, depth)
+  bid_vwap: np.ndarray    # (n, depth)
+  ask_twa: np.ndarray     # (n, depth) time-weighted ask sizes
+  bid_twa: np.ndarray     # (n, depth) time-weighted bid sizes
+
+  def canyon(self):
+    """Bars in create_orderbook's layout: apx, bpx, avc, bvc, times."""
+    depth = self.ask_px.shape[1]
+    times = np.repeat(self.times[:, None], depth, axis=1)
+    return self.ask_px, self.bid_px, np.cumsum(self.ask_twa, axis=1), np.cumsum(self.bid_twa, axis=1), times
+
+def bar_ns(bar):
+  """'100ms', '1s', '1min', a Timedelta or an int (ns) -> int ns."""
+  return int(bar) if isinstance(bar, (int, np.integer)) else pd.Timedelta(bar).value
+
+def _ffill_rows(values, has):
+  """Rows where has is False take the previous row where it is True."""
+  idx = np.where(has, np.arange(len(has)), 0)
+  np.maximum.accumulate(idx, out=idx)
+  return values[idx]
+
+def _aggregate(ts, books, bar, first_bucket, prev):
+  """
+  ts: (m,) non-decreasing event times relative to the bar origin
+  books: [ask_px, bid_px, ask_sz, bid_sz], each (m, depth)
+  first_bucket: first bar to emit; must not be after the first update's bar
+  prev: the book live before ts[0] (4 rows of (depth,)), or None at the start
+  Returns (times, counts, last, vwap, twa) for bars first_bucket..last update's.
+  """
+  b = ts // bar
+  n = int(b[-1]) - first_bucket + 1
+  depth = books[0].shape[1]
+  starts = np.flatnonzero(np.r_[True, b[1:] != b[:-1]])
+  ends = np.r_[starts[1:], len(ts)] - 1
+  rows = b[starts] - first_bucket
+
+  counts = np.zeros(n, dtype=np.int64)
+  counts[rows] = ends - starts + 1
+  has = counts > 0
+  has[0] = True
+
+  last = []
+  for k, side in enumerate(books):
+    values = np.empty((n, depth))
+    if prev is not None:
+      values[0] = prev[k]
+    values[rows] = side[ends]
+    last.append(_ffill_rows(values, has))
+
+  # How long each update's book was live within its own bar
+  bar_end = (b + 1) * bar
+  live = (np.minimum(np.r_[ts[1:], bar_end[-1]], bar_end) - ts).astype(float)
+  # The stretch before a bar's first update belongs to the book before it
+  lead = (ts[starts] - b[starts] * bar).astype(float)
+  covered = np.full(len(starts), float(bar))
+  if prev is None:
+    covered[0] -= lead[0]
+
+  vwap = []
+  for px, sz, k in ((books[0], books[2], 0), (books[1], books[3], 1)):
+    notional = np.add.reduceat(px * sz, starts, axis=0)
+    volume = np.add.reduceat(sz, starts, axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+      per_bar = np.where(volume > 0, notional / volume, px[ends])
+    values = last[k].copy()
+    values[rows] = per_bar
+    vwap.append(values)
+
+  twa = []
+  for k in (2, 3):
+    sz = books[k]
+    before = sz[np.maximum(starts - 1, 0)].astype(float)
+    before[0] = prev[k] if prev is not None else 0.0
+    weighted = np.add.reduceat(sz * live[:, None], starts, axis=0) + before * lead[:, None]
+    values = last[k].copy()
+    values[rows] = weighted / covered[:, None]
+    twa.append(values)
+
+  times = (first_bucket + np.arange(n, dtype=np.int64)) * bar
+  return times, counts, last, vwap, twa
+
+def _frame_books(df, depth):
+  return [level_block(df, prefix, depth, 1) for prefix in ('ask_px', 'bid_px', 'ask_sz', 'bid_sz')]
+
+def iter_bars(frames, bar='1s', depth=DEPTH):
+  """
+  Aggregates a stream of MBP frames (e.g. DBNStore.to_df(count=...)) into
+  OrderBookBars, one batch per frame. The last, possibly incomplete, bar of
+  each frame is held back and finished with the next one, so the batches
+  concatenate to exactly the bars of the whole stream.
+  """
+  bar = bar_ns(bar)
+  origin = None
+  prev = None
+  next_bucket = None
+  last_ts = None
+  tail_ts, tail_books = None, None
+
+  def emit(ts, books):
+    nonlocal prev, next_bucket
+    first = ts[0] // bar if next_bucket is None else next_bucket
+    times, counts, last, vwap, twa = _aggregate(ts, books, bar, first, prev)
+    prev = [side[-1] for side in books]
+    next_bucket = first + len(times)
+    return OrderBookBars(times + origin, counts, *last, *vwap, *twa)
+
+  for df in frames:
+    if len(df) == 0:
+      continue
+    ts = event_times_ns(df)
+    # ts_event can step back slightly relative to receive order
+    if last_ts is not None:
+      ts = np.maximum(ts, last_ts)
+    ts = np.maximum.accumulate(ts)
+    last_ts = ts[-1]
+    if origin is None:
+      origin = ts[0] - ts[0] % bar
+
+    ts = ts - origin
+    books = _frame_books(df, depth)
+    if tail_ts is not None:
+      ts = np.concatenate([tail_ts, ts])
+      books = [np.concatenate([t, side]) for t, side in zip(tail_books, books)]
+
+    cut = np.searchsorted(ts, (ts[-1] // bar) * bar)
+    if cut > 0:
+      yield emit(ts[:cut], [side[:cut] for side in books])
+    tail_ts, tail_books = ts[cut:], [side[cut:] for side in books]
+
+  if tail_ts is not None and len(tail_ts):
+    yield emit(tail_ts, tail_books)
+
+def concat_bars(batches, depth=DEPTH):
+  """Concatenates OrderBookBars batches into one."""
+  batches = list(batches)
+  if not batches:
+    empty = np.empty((0, depth))
+    return OrderBookBars(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), *([empty] * 8))
+  return OrderBookBars(*(np.concatenate(field) for field in zip(*batches)))
+
+def aggregate_orderbook(df, bar='1s', depth=DEPTH):
+  """Time bars for a single MBP frame."""
+  return concat_bars(iter_bars([df], bar, depth), depth)
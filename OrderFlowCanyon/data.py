@@ -1,30 +1,114 @@
-import databento as db
 from datetime import datetime, timedelta
 import numpy as np
 import pandas as pd
-from utils import create_orderbook
-
-def get_data(ticker='TSLA', days=7):
-  client = db.Historical("db-HSVn4NBRBrgrFASf5WCUiKGkMywks")
-
-  #start_date a week from today
-  start_date = datetime.now() - timedelta(days=days)
-  #end date yesterday
-  end_date = datetime.now() - timedelta(days=1)
-  symbols = [ticker]
-
-  df = client.timeseries.get_range(
-      dataset="XNAS.ITCH",
-      schema="mbp-10",
-      symbols=symbols,
-      start=start_date,
-      end=end_date,
-      limit=10_000,
-  ).to_df()
-
-  apx, bpx, avc, bvc, times = create_orderbook(df)
+
+from Common import metrics
+from Common.lod import DEFAULT_BUDGET, Pyramid
+from Common.providers import MBP_CHUNK_SIZE, get_provider
+from .utils import create_orderbook, DEPTH, STRIDE
+from .bars import iter_bars, concat_bars
+
+# MBP-10 records decoded per DataFrame chunk when streaming
+CHUNK_SIZE = MBP_CHUNK_SIZE
+
+def iter_orderbook(frames, stride=STRIDE, depth=DEPTH):
+  """
+  Yields (apx, bpx, avc, bvc, times) for each MBP-10 frame of a stream
+  (e.g. DBNStore.to_df(count=...) or a provider's mbp10()). The sampling
+  phase carries across frame boundaries so the output matches a single
+  create_orderbook(whole_frame, stride) call.
+  """
+  seen = 0
+  for df in frames:
+    start = (-seen) % stride
+    seen += len(df)
+    if start < len(df):
+      with metrics.span('canyon.orderbook'):
+        chunk = create_orderbook(df, stride=stride, depth=depth, start=start)
+      metrics.count('canyon.rows', len(chunk[0]))
+      yield chunk
+
+def _frames(ticker, days, path, limit, chunk_size):
+  """
+  MBP-10 frames from a local DBN file, or from the data provider for the
+  last `days` days; producing them (download and decode) is timed as
+  canyon.fetch.
+  """
+  if path is not None:
+    import databento as db
+    frames = db.DBNStore.from_file(path).to_df(count=chunk_size)
+  else:
+    #start_date a week from today
+    start_date = datetime.now() - timedelta(days=days)
+    #end date yesterday
+    end_date = datetime.now() - timedelta(days=1)
+    frames = get_provider().mbp10(ticker, start_date, end_date, limit=limit, chunk_size=chunk_size)
+  for df in metrics.timed('canyon.fetch', frames):
+    metrics.count('canyon.records', len(df))
+    yield df
+
+def stream_data(ticker='TSLA', days=7, path=None, limit=None, chunk_size=CHUNK_SIZE, stride=STRIDE, depth=DEPTH):
+  """
+  Streaming counterpart of get_data: yields canyon chunks as they are decoded.
+
+  path: Local DBN file to replay instead of asking the data provider.
+  Without it the range comes from the configured provider (see
+  Common.providers); the live one streams Databento straight to a temporary
+  file, so neither the download nor the decode holds more than one chunk
+  of records in memory.
+  """
+  yield from iter_orderbook(_frames(ticker, days, path, limit, chunk_size), stride, depth)
+
+def stream_bars(ticker='TSLA', days=7, bar='1s', path=None, limit=None, chunk_size=CHUNK_SIZE, depth=DEPTH):
+  """
+  Like stream_data, but yields OrderBookBars batches bucketed by ts_event
+  into fixed bars ('100ms', '1s', '1min', ...) instead of every Nth update.
+  The canyon.bars span includes the canyon.fetch time nested in it.
+  """
+  yield from metrics.timed('canyon.bars', iter_bars(_frames(ticker, days, path, limit, chunk_size), bar, depth))
+
+def collect_chunks(chunks, depth=DEPTH):
+  """Concatenates streamed (apx, bpx, avc, bvc, times) chunks into full canyon arrays."""
+  parts = list(zip(*chunks))
+  if not parts:
+    return tuple(np.empty((0, depth)) for _ in range(5))
+  return tuple(np.concatenate(p) for p in parts)
+
+def get_data(ticker='TSLA', days=7, path=None, limit=10_000, stride=STRIDE, depth=DEPTH, bar=None):
+  """
+  Canyon arrays apx, bpx, avc, bvc, times for the last `days` days.
+  With bar set (e.g. '1s') rows are fixed time bars with time-weighted depth;
+  otherwise every `stride`-th update.
+  """
+  if bar is not None:
+    return concat_bars(stream_bars(ticker, days, bar, path=path, limit=limit, depth=depth), depth).canyon()
+
+  apx, bpx, avc, bvc, times = collect_chunks(
+      stream_data(ticker, days, path=path, limit=limit, stride=stride, depth=depth), depth)
   return apx, bpx, avc, bvc, times
 
+CANYON_FIELDS = ('apx', 'bpx', 'avc', 'bvc')
 
+def canyon_pyramid(apx, bpx, avc, bvc, times, layers=None):
+  """
+  Level-of-detail pyramid of canyon arrays over event time, for canyon_window.
+  layers: extra {name: (n,) or (n, depth) array} (e.g. book_analytics output)
+          reduced alongside, read back with canyon_layers
+  """
+  return Pyramid((times[:, 0],), {'apx': apx, 'bpx': bpx, 'avc': avc, 'bvc': bvc, **(layers or {})})
 
+def canyon_window(pyramid, start=None, end=None, budget=DEFAULT_BUDGET):
+  """
+  apx, bpx, avc, bvc, times for event times in [start, end] (ns) with at
+  most about `budget` rows. Prices are block means and depths block maxima,
+  so liquidity walls survive any zoom level.
+  """
+  view = pyramid.window(start, end, budget, reduction={'avc': 'max', 'bvc': 'max'})
+  v = view.values
+  times = np.repeat(view.coords[0][:, None], v['apx'].shape[1], axis=1)
+  return v['apx'], v['bpx'], v['avc'], v['bvc'], times
 
+def canyon_layers(pyramid, start=None, end=None, budget=DEFAULT_BUDGET):
+  """The extra layers (block means) for the same rows canyon_window returns."""
+  view = pyramid.window(start, end, budget)
+  return {name: values for name, values in view.values.items() if name not in CANYON_FIELDS}
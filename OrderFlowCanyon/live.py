@@ -0,0 +1,290 @@
+"""
+Live order-flow canyon: an MBP-10 stream folded into a fixed-size ring buffer.
+
+A LiveCanyon consumes frames (Databento Live, a paced replay of a DBN file or
+any provider's mbp10()) on a background thread and keeps the last `capacity`
+canyon rows in preallocated arrays, so memory is constant however long the
+session runs. Rows carry a global sequence number; readers ask for the rows
+after the last one they have seen and get only those.
+"""
+import os
+import queue
+import threading
+import time
+from types import GeneratorType
+
+import numpy as np
+import pandas as pd
+
+from .data import iter_orderbook
+from .utils import DEPTH, STRIDE, event_times_ns, level_columns
+
+# Canyon rows held per session (rows x depth x 4 float64 fields + times)
+CAPACITY = 20_000
+# MBP-10 records per frame for replays and per batch for the live feed
+LIVE_CHUNK_SIZE = 1_000
+# Longest a live batch waits to fill before it is handed on (seconds)
+LIVE_BATCH_SECONDS = 0.05
+# Replay release interval (seconds)
+PACE_TICK = 0.02
+
+FIELDS = ('apx', 'bpx', 'avc', 'bvc', 'times')
+
+class CanyonRing:
+  """
+  Preallocated (capacity, depth) ring of canyon rows. `total` counts every
+  row ever appended; the rows held are sequence numbers
+  [total - len(self), total).
+  """
+
+  def __init__(self, capacity=CAPACITY, depth=DEPTH):
+    self.capacity = capacity
+    self.depth = depth
+    self.apx = np.full((capacity, depth), np.nan)
+    self.bpx = np.full((capacity, depth), np.nan)
+    self.avc = np.zeros((capacity, depth))
+    self.bvc = np.zeros((capacity, depth))
+    self.times = np.zeros(capacity, dtype=np.int64)
+    self.total = 0
+
+  def __len__(self):
+    return min(self.total, self.capacity)
+
+  def append(self, apx, bpx, avc, bvc, times):
+    """Appends a canyon chunk; times may be per row or repeated across levels."""
+    times = np.asarray(times)
+    if times.ndim == 2:
+      times = times[:, 0]
+    n = len(times)
+    # Only the newest `capacity` rows of an oversized chunk can survive
+    skip = max(0, n - self.capacity)
+    pos = (self.total + skip) % self.capacity
+    rows = np.arange(pos, pos + n - skip) % self.capacity
+    for name, values in zip(FIELDS, (apx, bpx, avc, bvc, times)):
+      getattr(self, name)[rows] = values[skip:]
+    self.total += n
+
+  def since(self, seq):
+    """
+    Rows with sequence numbers >= seq, oldest first, as a dict of the FIELDS
+    plus 'start' (sequence number of the first row returned) and 'dropped'
+    (rows after seq that were overwritten before this read).
+    """
+    start = min(max(seq, self.total - len(self)), self.total)
+    rows = np.arange(start, self.total) % self.capacity
+    out = {name: getattr(self, name)[rows] for name in FIELDS}
+    out.update(start=start, dropped=max(0, start - max(seq, 0)))
+    return out
+
+  def canyon(self):
+    """Everything held, in the (apx, bpx, avc, bvc, times) layout of get_data."""
+    rows = self.since(0)
+    times = np.repeat(rows['times'][:, None], self.depth, axis=1)
+    return rows['apx'], rows['bpx'], rows['avc'], rows['bvc'], times
+
+class LiveCanyon:
+  """
+  Runs iter_orderbook over `frames` on a daemon thread into a CanyonRing.
+
+  frames: iterable of MBP-10 DataFrames, e.g. live_frames(), replay_frames()
+  wait(seq) blocks until rows past seq arrive (or the stream ends) and
+  returns ring.since(seq) taken under the lock, so readers never see a
+  half-written chunk.
+  """
+
+  def __init__(self, frames, capacity=CAPACITY, stride=STRIDE, depth=DEPTH):
+    self.ring = CanyonRing(capacity, depth)
+    self.error = None
+    self.done = False
+    self._frames = frames
+    self._stride = stride
+    self._stop = threading.Event()
+    self._changed = threading.Condition()
+    self._thread = threading.Thread(target=self._consume, daemon=True)
+
+  def start(self):
+    self._thread.start()
+    return self
+
+  def _consume(self):
+    try:
+      for chunk in iter_orderbook(self._frames, self._stride, self.ring.depth):
+        if self._stop.is_set():
+          break
+        with self._changed:
+          self.ring.append(*chunk)
+          self._changed.notify_all()
+    except Exception as e:
+      self.error = e
+    finally:
+      close = getattr(self._frames, 'close', None)
+      if close is not None:
+        close()
+      with self._changed:
+        self.done = True
+        self._changed.notify_all()
+
+  def wait(self, seq, timeout=None):
+    with self._changed:
+      self._changed.wait_for(lambda: self.ring.total > seq or self.done, timeout)
+      return self.ring.since(seq)
+
+  def stop(self, timeout=1.0):
+    """
+    Stops consuming and ends the source. Sources with a thread-safe close()
+    (LiveFeed, Paced) end at once, even while the thread is blocked on a
+    quiet feed; plain generators stop after their current frame. Waits up
+    to `timeout` seconds for the thread to finish.
+    """
+    self._stop.set()
+    close = getattr(self._frames, 'close', None)
+    if close is not None and not isinstance(self._frames, GeneratorType):
+      close()
+    if self._thread.is_alive() and self._thread is not threading.current_thread():
+      self._thread.join(timeout)
+
+#Frame sources
+class Paced:
+  """
+  Releases MBP-10 rows as their event times come due, `speed` times real
+  time, so a recorded session plays back like a live one: each frame is cut
+  into the slices due every `tick` seconds. speed=None passes frames
+  straight through. close() may be called from any thread and ends the
+  iteration, even in the middle of a long gap between events.
+  """
+
+  def __init__(self, frames, speed=1.0, tick=PACE_TICK):
+    self.frames = frames
+    self.speed = speed
+    self.tick = tick
+    self._closed = threading.Event()
+
+  def __iter__(self):
+    speed, origin, wall = self.speed, None, None
+    try:
+      for df in self.frames:
+        if self._closed.is_set():
+          return
+        if not speed or not len(df):
+          yield df
+          continue
+        ts = event_times_ns(df)
+        if origin is None:
+          origin, wall = ts[0], time.monotonic()
+        pos = 0
+        while pos < len(df):
+          now = origin + (time.monotonic() - wall) * speed * 1e9
+          due = int(np.searchsorted(ts, now, side='right'))
+          if due > pos:
+            yield df.iloc[pos:due]
+            pos = due
+          elif self._closed.wait(max(self.tick, (ts[pos] - now) / 1e9 / speed)):
+            return
+    finally:
+      close = getattr(self.frames, 'close', None)
+      if close is not None:
+        close()
+
+  def close(self):
+    self._closed.set()
+
+def paced(frames, speed=1.0, tick=PACE_TICK):
+  return Paced(frames, speed, tick)
+
+def replay_frames(path, speed=1.0, chunk_size=LIVE_CHUNK_SIZE):
+  """MBP-10 frames from a local DBN file, paced as if they were arriving now."""
+  import databento as db
+  return paced(db.DBNStore.from_file(path).to_df(count=chunk_size), speed)
+
+def _records_frame(records, depth=DEPTH):
+  """Databento Live MBP10Msg records -> the DataFrame layout of DBNStore.to_df()."""
+  data = {'ts_event': pd.to_datetime([r.ts_event for r in records], utc=True)}
+  for side in ('bid', 'ask'):
+    for i, (px, sz) in enumerate(zip(level_columns(f'{side}_px', depth), level_columns(f'{side}_sz', depth))):
+      data[px] = np.array([getattr(r.levels[i], f'pretty_{side}_px') for r in records], dtype=np.float64)
+      data[sz] = np.array([getattr(r.levels[i], f'{side}_sz') for r in records], dtype=np.uint32)
+  frame = pd.DataFrame(data)
+  frame.index = pd.DatetimeIndex(pd.to_datetime([r.ts_recv for r in records], utc=True), name='ts_recv')
+  return frame
+
+_END = object()
+
+class LiveFeed:
+  """
+  MBP-10 frames from a Databento Live subscription (DATABENTO_API_KEY unless
+  key is given), flushed every `batch` records or `batch_seconds` after a
+  batch's first record, whichever comes first. Records are read on a thread
+  of their own, so a partial batch goes out on time even when the feed goes
+  quiet. The subscription starts when iteration does; close() terminates it
+  from any thread, which ends an iteration blocked waiting for records.
+  """
+
+  def __init__(self, ticker, key=None, dataset='XNAS.ITCH', batch=LIVE_CHUNK_SIZE, batch_seconds=LIVE_BATCH_SECONDS):
+    self.ticker = ticker
+    self.key = key or os.environ.get('DATABENTO_API_KEY')
+    self.dataset = dataset
+    self.batch = batch
+    self.batch_seconds = batch_seconds
+    self._client = None
+    self._closed = False
+    self._lock = threading.Lock()
+
+  @staticmethod
+  def _read(client, records):
+    """Moves the client's records onto a queue, ending with _END (or the error raised)."""
+    try:
+      for record in client:
+        records.put(record)
+      records.put(_END)
+    except Exception as e:
+      records.put(e)
+
+  def __iter__(self):
+    import databento as db
+    import databento_dbn
+
+    if not self.key:
+      raise RuntimeError('Set DATABENTO_API_KEY to stream MBP-10 data from Databento.')
+    with self._lock:
+      if self._closed:
+        return
+      client = self._client = db.Live(key=self.key)
+    try:
+      client.subscribe(dataset=self.dataset, schema='mbp-10', symbols=[self.ticker])
+      incoming = queue.SimpleQueue()
+      reader = threading.Thread(target=self._read, args=(client, incoming), daemon=True)
+      reader.start()
+      records, deadline = [], None
+      while True:
+        try:
+          item = incoming.get(timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+        except queue.Empty:
+          item = None  # the batch's time is up
+        if item is _END:
+          break
+        if isinstance(item, Exception):
+          raise item
+        if isinstance(item, databento_dbn.MBP10Msg):
+          if not records:
+            deadline = time.monotonic() + self.batch_seconds
+          records.append(item)
+        if records and (len(records) >= self.batch or time.monotonic() >= deadline):
+          yield _records_frame(records)
+          records, deadline = [], None
+      if records:
+        yield _records_frame(records)
+    finally:
+      self.close()
+
+  def close(self):
+    with self._lock:
+      self._closed = True
+      client, self._client = self._client, None
+    if client is not None:
+      try:
+        client.terminate()
+      except ValueError:
+        pass  # never connected
+
+def live_frames(ticker, key=None, dataset='XNAS.ITCH', batch=LIVE_CHUNK_SIZE, batch_seconds=LIVE_BATCH_SECONDS):
+  return LiveFeed(ticker, key, dataset, batch, batch_seconds)
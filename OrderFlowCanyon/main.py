@@ -1,48 +1,82 @@
-import plotly.graph_objects as go
-import numpy as np
-import pandas as pd
-from data import get_data
+"""
+3D order-flow canyon plot.
+
+    python -m OrderFlowCanyon.main SPY --days 3
+
+load_canyon() is the compute half; canyon_figure() builds the plotly figure
+(plotly is imported on first use).
+"""
+import argparse
+
+from Common import metrics
+from .data import canyon_pyramid, canyon_window, get_data
 
 TICKER = 'SPY'
 DAYS = 3
+# Rows drawn; zooming in (a narrower time window) keeps the same budget
+ROWS = 1000
+# Snapshots skipped while the book fills in
+WARMUP = 500
+
+def load_canyon(ticker=TICKER, days=DAYS, rows=ROWS, warmup=WARMUP, **data_options):
+  """apx, bpx, avc, bvc, times for the last `days` days, reduced to about `rows` rows."""
+  canyon = canyon_pyramid(*get_data(ticker, days, **data_options))
+  snapshot_times = canyon.coords[0][0]
+  if not len(snapshot_times):
+    raise ValueError(f'No order book data for {ticker}.')
+  return canyon_window(canyon, start=snapshot_times[min(warmup, len(snapshot_times) - 1)], budget=rows)
+
+def canyon_figure(ticker, apx, bpx, avc, bvc, days=DAYS, op=0.8):
+  import numpy as np
+  import plotly.graph_objects as go
 
-apx, bpx, avc, bvc, times = get_data(TICKER, DAYS)
-
-op = 0.8
-scaler = 8
-inds = np.arange(500, len(apx), scaler)
-
-fig = go.Figure(data = [
-  go.Surface(x=apx[inds], 
-             y=np.arange(len(apx[inds])), 
-             z=avc[inds],
-             colorscale = 'OrRd', 
-             opacity=op
-             )])
-
-fig.add_surface(
-    x=bpx[inds], 
-    y=np.arange(len(bpx[inds])), 
-    z=bvc[inds],
-    colorscale = 'BuGn', 
-    opacity=op
-  )
-
-#change the scaling/limits for the axes
-fig.update_layout(scene = dict(
-    xaxis = dict(nticks=4, range=[min(apx[inds].min(), bpx[inds].min()), max(apx[inds].max(), bpx[inds].max())],),
-    yaxis = dict(nticks=4, range=[0, len(apx[inds])],),
-    zaxis = dict(nticks=4, range=[0, max(avc[inds].max(), bvc[inds].max())],),),
-    margin=dict(l=0, r=0, b=0, t=0))
-
-fig.update_layout(
-    title=f"Orderflow Ravine for ${TICKER} for the last {DAYS-1} days",
-    scene=dict(
-        xaxis_title="Price",
-        yaxis_title="Time",
-        zaxis_title="CumulativeVolume"
+  with metrics.span('canyon.plot'):
+    fig = go.Figure(data = [
+      go.Surface(x=apx,
+                 y=np.arange(len(apx)),
+                 z=avc,
+                 colorscale = 'OrRd',
+                 opacity=op
+                 )])
+
+    fig.add_surface(
+        x=bpx,
+        y=np.arange(len(bpx)),
+        z=bvc,
+        colorscale = 'BuGn',
+        opacity=op
+      )
+
+    #change the scaling/limits for the axes
+    fig.update_layout(scene = dict(
+        xaxis = dict(nticks=4, range=[min(apx.min(), bpx.min()), max(apx.max(), bpx.max())],),
+        yaxis = dict(nticks=4, range=[0, len(apx)],),
+        zaxis = dict(nticks=4, range=[0, max(avc.max(), bvc.max())],),),
+        margin=dict(l=0, r=0, b=0, t=0))
+
+    fig.update_layout(
+        title=f"Orderflow Ravine for ${ticker} for the last {days-1} days",
+        scene=dict(
+            xaxis_title="Price",
+            yaxis_title="Time",
+            zaxis_title="CumulativeVolume"
+        )
     )
-)
+  return fig
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description='Plot an order-flow canyon.')
+  parser.add_argument('ticker', nargs='?', default=TICKER)
+  parser.add_argument('--days', type=int, default=DAYS)
+  parser.add_argument('--rows', type=int, default=ROWS)
+  parser.add_argument('--path', help='local DBN file to plot instead of fetching')
+  args = parser.parse_args(argv)
 
-fig.show()
+  apx, bpx, avc, bvc, _ = load_canyon(args.ticker, args.days, args.rows, path=args.path)
+  fig = canyon_figure(args.ticker, apx, bpx, avc, bvc, days=args.days)
+  if metrics.enabled():
+    print(metrics.summary())
+  fig.show()
 
+if __name__ == '__main__':
+  main()
@@ -1,51 +1,57 @@
 import pandas as pd
 import numpy as np
 
-def create_snapshot(df, ti):
-  depth = 10
-  ask_prices = []
-  bid_prices = []
-
-  ask_vols = []
-  bid_vols = []
-
-  for i in range(depth):
-    bv = f'bid_sz_0{i}'
-    av = f'ask_sz_0{i}'
-    bp = f'bid_px_0{i}'
-    ap = f'ask_px_0{i}'
-    
-    ask_vols.append(df.iloc[ti][av])
-    bid_vols.append(df.iloc[ti][bv])
-    bid_prices.append(df.iloc[ti][bp])
-    ask_prices.append(df.iloc[ti][ap])
+DEPTH = 10
+STRIDE = 10
+
+def level_columns(prefix, depth=DEPTH):
+  """MBP column names for one field across levels, e.g. bid_px_00..bid_px_09."""
+  return [f'{prefix}_{i:02d}' for i in range(depth)]
+
+def level_block(df, prefix, depth=DEPTH, stride=STRIDE, start=0):
+  """
+  One field across all levels as a contiguous (rows, depth) float array,
+  sampled every `stride` rows from `start`. Each column is read once as a
+  NumPy view and strided straight into the output, so there is no per-row work.
+  """
+  n = len(range(start, len(df), stride))
+  out = np.empty((n, depth), dtype=np.float64)
+  for i, col in enumerate(level_columns(prefix, depth)):
+    out[:, i] = df[col].to_numpy()[start::stride]
+  return out
+
+def event_times_ns(df):
+  """Exchange event time (ts_event) of each update as int64 ns since epoch."""
+  ts = df['ts_event'] if 'ts_event' in df.columns else df.index
+  return pd.DatetimeIndex(ts).as_unit('ns').asi8
+
+def create_snapshot(df, ti, depth=DEPTH):
+  row = df.iloc[ti]
+  ask_vols = row[level_columns('ask_sz', depth)].to_list()
+  bid_vols = row[level_columns('bid_sz', depth)].to_list()
+  ask_prices = row[level_columns('ask_px', depth)].to_list()
+  bid_prices = row[level_columns('bid_px', depth)].to_list()
 
   #bid_vols = np.array(bid_vols) * -1
   return ask_vols, bid_vols, ask_prices, bid_prices
 
-def create_orderbook(df):
-  times = []
-  ask_vols_t = []
-  bid_vols_t = []
-  ask_prices_t = []
-  bid_prices_t = []
-  for ti in range(0, len(df), 10):
-    ask_vols, bid_vols, ask_prices, bid_prices = create_snapshot(df, ti)
-    ask_vols_t.append(ask_vols)
-    bid_vols_t.append(bid_vols)
-    ask_prices_t.append(ask_prices)
-    bid_prices_t.append(bid_prices)
-    snapshot_time = df.iloc[ti]['ts_in_delta']
-    times.append([snapshot_time] * 10)
-
-  apx = np.array(ask_prices_t)
-  bpx = np.array(bid_prices_t)
-  avx = np.array(ask_vols_t)
-  bvx = np.array(bid_vols_t)
-  times = np.array(times)
+def create_orderbook(df, stride=STRIDE, depth=DEPTH, start=0):
+  """
+  Column-block build of the canyon arrays from an MBP frame.
+  Every `stride`-th update from `start` is kept; all outputs are (rows, depth).
+  Returns apx, bpx, avc, bvc (cumulative sizes from the top of book) and
+  times (ts_event in ns, repeated across levels).
+  """
+  apx = level_block(df, 'ask_px', depth, stride, start)
+  bpx = level_block(df, 'bid_px', depth, stride, start)
+  avx = level_block(df, 'ask_sz', depth, stride, start)
+  bvx = level_block(df, 'bid_sz', depth, stride, start)
+
+  snapshot_times = event_times_ns(df)[start::stride]
+  times = np.repeat(snapshot_times[:, None], depth, axis=1)
 
   #avc = np.fliplr( np.cumsum( np.fliplr(avx), axis=1 ) )
   #bvc = np.fliplr( np.cumsum( np.fliplr(bvx), axis=1 ) )
   avc = np.cumsum( avx, axis=1 )
   bvc = np.cumsum( bvx, axis=1 )
-  return apx, bpx, avc, bvc, times
\ No newline at end of file
+  return apx, bpx, avc, bvc, times
@@ -0,0 +1,362 @@
+"""
+Benchmarks for the IV, yield-curve and order-book hot paths.
+
+Every fixture is synthetic and seeded, and market data is served by
+Common.providers.SyntheticProvider, so the suite runs offline and the same
+arguments always time the same work.
+
+    python Tests/Benchmarks/bench.py --out bench.json
+    python Tests/Benchmarks/bench.py --filter iv. --strikes 400 --expiries 24
+    python Tests/Benchmarks/bench.py --compare baseline.json --tolerance 0.15
+
+Each benchmark reports calls/sec, items/sec (contracts, rows, dates, grid
+points), latency percentiles in milliseconds and the peak traced Python
+memory of one extra call. --compare exits non-zero if any benchmark's median
+latency regressed by more than --tolerance against a previous --out file,
+and refuses (exit status 2) a baseline run with different parameters.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import zlib
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+sys.path.append(ROOT)
+from Common.providers import SyntheticProvider, set_provider
+from IVSurface.BSMCompute import (_chain_to_arrays, black_scholes_price, compute_implied_vols, implied_vol_call,
+                                  implied_vols, otm_implied_vols)
+from IVSurface.DataSourcing import get_option_chains, get_risk_free_rates
+from IVSurface.surface import VolSurface, surface_quotes
+from OrderFlowCanyon.analytics import book_analytics
+from OrderFlowCanyon.bars import aggregate_orderbook
+from OrderFlowCanyon.data import canyon_pyramid, canyon_window
+from OrderFlowCanyon.utils import create_orderbook
+from YieldCurve.curve import TermStructure
+from YieldCurve.data import get_yield_data
+
+
+#Seeded fixtures
+def _rng(*key):
+    return np.random.default_rng(zlib.crc32(repr(key).encode()))
+
+
+def solver_fixture(n, seed=0):
+    """n call contracts with known vols: (prices, S, K, T, r, sigma)."""
+    synthetic = SyntheticProvider(seed)
+    rng = _rng("solver", n, seed)
+    S = synthetic.spot_price
+    K = S * np.exp(rng.uniform(-0.5, 0.5, n))
+    T = rng.uniform(0.02, 2.0, n)
+    sigma = synthetic.smile(K, T)
+    r = synthetic.rate_pct / 100.0
+    return black_scholes_price(S, K, T, r, sigma, True), S, K, T, r, sigma
+
+
+def chain_fixture():
+    """Calls and puts of every fixture chain as flat arrays: (prices, S, K, T, r, is_call)."""
+    chains, S = get_option_chains("BENCH")
+    K_c, price_c, T_c = _chain_to_arrays([(calls, T) for calls, _, T in chains])
+    K_p, price_p, T_p = _chain_to_arrays([(puts, T) for _, puts, T in chains])
+    T = np.concatenate([T_c, T_p])
+    is_call = np.r_[np.ones(K_c.size, dtype=bool), np.zeros(K_p.size, dtype=bool)]
+    return np.concatenate([price_c, price_p]), S, np.concatenate([K_c, K_p]), T, get_risk_free_rates(T), is_call
+
+
+def fixture_provider(args):
+    """Seeded synthetic data sized by the command line (no disk cache, no network)."""
+    return SyntheticProvider(
+        seed=args.seed,
+        strikes=np.linspace(50.0, 150.0, args.strikes),
+        n_expiries=args.expiries,
+        expiry_step_days=14,
+        noise=0.002,
+    )
+
+
+#Measurement
+def measure(fn, repeat, warmup=1):
+    """Latencies (seconds) of repeat calls after warmup, and peak traced bytes of one more."""
+    for _ in range(warmup):
+        fn()
+    latencies = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies[i] = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return latencies, peak
+
+
+def summarize(name, items, latencies, peak):
+    mean = float(latencies.mean())
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1e3
+    return {
+        "name": name,
+        "items": int(items),
+        "repeat": int(latencies.size),
+        "ops_per_sec": 1.0 / mean if mean > 0 else float("inf"),
+        "items_per_sec": items / mean if mean > 0 else float("inf"),
+        "mean_ms": mean * 1e3,
+        "p50_ms": float(p50),
+        "p90_ms": float(p90),
+        "p99_ms": float(p99),
+        "min_ms": float(latencies.min() * 1e3),
+        "peak_memory_bytes": int(peak),
+    }
+
+
+#Benchmarks: name -> setup(args) returning (callable, items)
+def bench_solver(method):
+    def setup(args):
+        prices, S, K, T, r, _ = solver_fixture(args.contracts, args.seed)
+        return (lambda: implied_vols(prices, S, K, T, r=r, method=method)), prices.size
+    return setup
+
+
+def bench_scalar_solver(args):
+    # The per-contract wrapper, on a slice so the suite stays quick
+    prices, S, K, T, r, _ = solver_fixture(min(args.contracts, 200), args.seed)
+    return (lambda: [implied_vol_call(p, S, k, t, r) for p, k, t in zip(prices, K, T)]), prices.size
+
+
+def bench_compute_implied_vols(args):
+    items = 2 * args.expiries * args.strikes
+    return (lambda: compute_implied_vols("BENCH", contract_type="both")), items
+
+
+def bench_chain_solve(side):
+    def setup(args):
+        prices, S, K, T, r, is_call = chain_fixture()
+        if side == "otm":
+            return (lambda: otm_implied_vols(prices, S, K, T, r, is_call)), prices.size
+        return (lambda: implied_vols(prices, S, K, T, r=r, is_call=is_call, method="seeded")), prices.size
+    return setup
+
+
+def bench_compute_otm_implied_vols(args):
+    # Same chains as above; only the OTM half is solved
+    items = 2 * args.expiries * args.strikes
+    return (lambda: compute_implied_vols("BENCH", contract_type="otm")), items
+
+
+def bench_surface_fit(method):
+    def setup(args):
+        k, T, iv = surface_quotes("BENCH")
+        return (lambda: VolSurface(k, T, iv, method=method)), k.size
+    return setup
+
+
+def bench_surface_grid(args):
+    k, T, iv = surface_quotes("BENCH")
+    surface = VolSurface(k, T, iv)
+    grid_k = np.linspace(k.min(), k.max(), args.grid)
+    grid_t = np.linspace(T.min(), T.max(), args.grid)
+    return (lambda: surface.grid(grid_k, grid_t)), args.grid * args.grid
+
+
+def bench_create_orderbook(args):
+    frame = SyntheticProvider().mbp_frame(args.rows, seed=args.seed)
+    return (lambda: create_orderbook(frame)), args.rows
+
+
+def bench_aggregate_orderbook(args):
+    frame = SyntheticProvider().mbp_frame(args.rows, seed=args.seed)
+    return (lambda: aggregate_orderbook(frame, "1s")), args.rows
+
+
+def bench_book_analytics(args):
+    canyon = create_orderbook(SyntheticProvider().mbp_frame(args.rows, seed=args.seed), stride=1)
+    return (lambda: book_analytics(*canyon, window="1s")), args.rows
+
+
+def bench_canyon_pyramid(args):
+    canyon = create_orderbook(SyntheticProvider().mbp_frame(args.rows, seed=args.seed), stride=1)
+    return (lambda: canyon_pyramid(*canyon)), args.rows
+
+
+def bench_canyon_window(args):
+    # A zoom into the middle tenth of the session at a 1000-row budget
+    canyon = create_orderbook(SyntheticProvider().mbp_frame(args.rows, seed=args.seed), stride=1)
+    pyramid = canyon_pyramid(*canyon)
+    times = canyon[4][:, 0]
+    start, end = times[int(0.45 * times.size)], times[int(0.55 * times.size)]
+    return (lambda: canyon_window(pyramid, start, end, 1000)), 1000
+
+
+def _yield_range(args):
+    end = pd.Timestamp("2025-01-01")
+    return end - pd.DateOffset(years=args.years), end
+
+
+def bench_get_yield_data(args):
+    start, end = _yield_range(args)
+    items = len(pd.bdate_range(start, end))
+    return (lambda: get_yield_data(start, end)), items
+
+
+def bench_term_structure(method):
+    def setup(args):
+        x, y, z = get_yield_data(*_yield_range(args))
+        return (lambda: TermStructure(x, y, z, method=method).dense()), len(y)
+    return setup
+
+
+BENCHMARKS = {
+    "iv.implied_vols.seeded": bench_solver("seeded"),
+    "iv.implied_vols.newton": bench_solver("newton"),
+    "iv.implied_vol_call.scalar": bench_scalar_solver,
+    "iv.compute_implied_vols": bench_compute_implied_vols,
+    "iv.compute_implied_vols.otm": bench_compute_otm_implied_vols,
+    "iv.chain_solve.both": bench_chain_solve("both"),
+    "iv.chain_solve.otm": bench_chain_solve("otm"),
+    "iv.surface_fit.svi": bench_surface_fit("svi"),
+    "iv.surface_fit.spline": bench_surface_fit("spline"),
+    "iv.surface_grid": bench_surface_grid,
+    "orderbook.create_orderbook": bench_create_orderbook,
+    "orderbook.aggregate_orderbook": bench_aggregate_orderbook,
+    "orderbook.book_analytics": bench_book_analytics,
+    "orderbook.canyon_pyramid": bench_canyon_pyramid,
+    "orderbook.canyon_window": bench_canyon_window,
+    "yield.get_yield_data": bench_get_yield_data,
+    "yield.term_structure.spline": bench_term_structure("spline"),
+    "yield.term_structure.nelson_siegel": bench_term_structure("nelson_siegel"),
+}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    set_provider(fixture_provider(args))
+    results = []
+    for name, setup in BENCHMARKS.items():
+        if args.filter and not any(f in name for f in args.filter):
+            continue
+        fn, items = setup(args)
+        latencies, peak = measure(fn, args.repeat, args.warmup)
+        result = summarize(name, items, latencies, peak)
+        results.append(result)
+        print(f"{name:40s} {result['ops_per_sec']:10.1f} ops/s {result['items_per_sec']:14.0f} items/s "
+              f"p50 {result['p50_ms']:9.3f} ms  p99 {result['p99_ms']:9.3f} ms  "
+              f"peak {result['peak_memory_bytes'] / 2**20:8.1f} MiB", file=sys.stderr)
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "params": _params(args),
+        },
+        "results": results,
+    }
+
+
+def _params(args):
+    """The arguments that decide what is timed (everything but output and comparison options)."""
+    return {k: v for k, v in vars(args).items() if k not in ("out", "compare", "tolerance", "filter")}
+
+
+def mismatched_params(params, baseline):
+    """Parameters that differ from the baseline's, as {name: (baseline, current)}."""
+    before = baseline.get("meta", {}).get("params")
+    if before is None:
+        return {}
+    return {k: (before.get(k), params.get(k)) for k in sorted(set(before) | set(params))
+            if before.get(k) != params.get(k)}
+
+
+def compare(report, baseline, tolerance):
+    """
+    Median latency ratios against baseline; returns the names that regressed.
+    Raises ValueError if the two reports were run with different parameters.
+    """
+    mismatched = mismatched_params(report["meta"]["params"], baseline)
+    if mismatched:
+        raise ValueError("The baseline was run with different parameters: "
+                         + ", ".join(f"{k} {old} -> {new}" for k, (old, new) in mismatched.items()))
+    before = {r["name"]: r for r in baseline["results"]}
+    regressed = []
+    for result in report["results"]:
+        old = before.get(result["name"])
+        if old is None:
+            continue
+        ratio = result["p50_ms"] / old["p50_ms"] if old["p50_ms"] > 0 else float("inf")
+        flag = "REGRESSED" if ratio > 1.0 + tolerance else ""
+        print(f"{result['name']:40s} {old['p50_ms']:9.3f} -> {result['p50_ms']:9.3f} ms  x{ratio:5.2f} {flag}",
+              file=sys.stderr)
+        if flag:
+            regressed.append(result["name"])
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", help="previous JSON report to compare median latencies against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed median slowdown for --compare")
+    parser.add_argument("--filter", nargs="*", help="only run benchmarks whose name contains one of these")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--contracts", type=int, default=10_000, help="contracts for the solver benchmarks")
+    parser.add_argument("--expiries", type=int, default=12, help="expirations per option chain")
+    parser.add_argument("--strikes", type=int, default=100, help="strikes per expiration and side")
+    parser.add_argument("--rows", type=int, default=200_000, help="MBP-10 rows")
+    parser.add_argument("--years", type=int, default=5, help="years of daily yield history")
+    parser.add_argument("--grid", type=int, default=200, help="surface grid points per axis")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if "params" not in baseline.get("meta", {}):
+            print("warning: the baseline does not record its parameters; comparing anyway", file=sys.stderr)
+        # Refuse before spending the run on timings that cannot be compared
+        mismatched = mismatched_params(_params(args), baseline)
+        if mismatched:
+            print("error: the baseline was run with different parameters:", file=sys.stderr)
+            for k, (old, new) in mismatched.items():
+                print(f"  {k}: {old} -> {new}", file=sys.stderr)
+            return 2
+
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if baseline is not None:
+        if compare(report, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from Common import batch
+from Common.providers import SyntheticProvider, use_provider
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+HEAVY = ("matplotlib", "plotly", "yfinance", "databento")
+
+
+@pytest.fixture
+def restore_provider():
+    """run(source=...) switches the process provider; put it back afterwards."""
+    with use_provider(SyntheticProvider()):
+        yield
+
+
+@pytest.mark.parametrize("module", ["IVSurface.IVmap", "OrderFlowCanyon.main", "YieldCurve.main",
+                                    "Common.batch", "pipelines"])
+def test_importing_pulls_in_no_plotting_or_vendor_sdk(module):
+    # A fresh interpreter: this one has long since imported everything
+    code = (f"import sys; import {module}; "
+            f"print(','.join(name for name in {HEAVY!r} if name in sys.modules))")
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([ROOT, os.path.join(ROOT, "flask-compute")])}
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ""
+
+
+def test_plan_names_one_file_per_target(tmp_path):
+    jobs = batch.plan("yield_curve", ["2024-01-01:2024-07-01"], str(tmp_path))
+    assert jobs == [batch.Job("yield_curve", "2024-01-01:2024-07-01",
+                              str(tmp_path / "yield_curve_2024-01-01_2024-07-01.html"))]
+    assert [job.path for job in batch.plan("iv_surface", ["NVDA", "BRK/B"], "out")] == \
+        [os.path.join("out", "iv_surface_NVDA.png"), os.path.join("out", "iv_surface_BRK-B.png")]
+    assert batch.plan("orderflow_canyon", ["SPY"], "out", "png")[0].path.endswith(".png")
+    with pytest.raises(ValueError, match="Unknown view"):
+        batch.plan("heatmap", ["SPY"], "out")
+
+
+def test_render_reports_failures_instead_of_raising(tmp_path):
+    job = batch.plan("yield_curve", ["2024-01-01"], str(tmp_path / "nested"))[0]
+    outcome = batch.render(job)
+    assert outcome.job == job
+    assert outcome.error == "ValueError: Expected a start:end date range, got '2024-01-01'."
+    assert outcome.seconds >= 0
+    assert not os.path.exists(job.path)
+
+
+@pytest.mark.parametrize("kind, target, options", [
+    ("iv_surface", "TEST", {"points": 20}),
+    ("orderflow_canyon", "SPY", {"days": 3, "rows": 200}),
+    ("yield_curve", "2024-01-01:2024-03-01", {}),
+])
+def test_renders_each_view_from_synthetic_data(tmp_path, restore_provider, kind, target, options):
+    pytest.importorskip("matplotlib" if kind == "iv_surface" else "plotly")
+    jobs = batch.plan(kind, [target], str(tmp_path / "renders"))
+    outcomes = list(batch.run(jobs, options, source="synthetic"))
+
+    assert [outcome.error for outcome in outcomes] == [None]
+    assert os.path.getsize(jobs[0].path) > 0
+    if kind != "iv_surface":
+        with open(jobs[0].path) as f:
+            assert "cdn.plot.ly" in f.read()
+
+
+def test_run_carries_on_past_a_failed_job(tmp_path, restore_provider):
+    pytest.importorskip("plotly")
+    jobs = batch.plan("yield_curve", ["nonsense", "2024-01-01:2024-03-01"], str(tmp_path))
+    outcomes = list(batch.run(jobs, source="synthetic"))
+    assert [outcome.job for outcome in outcomes] == jobs
+    assert outcomes[0].error.startswith("ValueError") and outcomes[1].error is None
+
+
+def test_main_exit_status(tmp_path, restore_provider, capsys):
+    pytest.importorskip("plotly")
+    assert batch.main(["yield_curve", "2024-01-01:2024-03-01", "--out", str(tmp_path),
+                       "--source", "synthetic"]) == 0
+    assert batch.main(["yield_curve", "nonsense", "--out", str(tmp_path), "--source", "synthetic"]) == 1
+    assert "0/1 rendered" in capsys.readouterr().out
@@ -0,0 +1,83 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from Common.cache import MarketDataCache
+
+
+class StubFetcher:
+    """Counts calls and returns a fresh value for each."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, **params):
+        self.calls.append(params)
+        return pd.DataFrame({
+            "strike": np.arange(3.0) + len(self.calls),
+            "ts": pd.date_range("2025-01-02", periods=3, freq="h", tz="America/New_York"),
+        })
+
+
+def age(cache, schema, seconds, **params):
+    """Backdates an entry's write and access times."""
+    path = cache._path(schema, params)
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+@pytest.fixture
+def fetcher():
+    return StubFetcher()
+
+
+def test_hits_until_the_ttl_runs_out(tmp_path, fetcher):
+    cache = MarketDataCache(str(tmp_path), ttls={"option_chain": 60}, fetchers={"option_chain": fetcher})
+    first = cache.get("option_chain", ticker="SPY", expiry="2025-03-21")
+    again = cache.get("option_chain", ticker="SPY", expiry="2025-03-21")
+    assert len(fetcher.calls) == 1
+    pd.testing.assert_frame_equal(first, again)
+
+    cache.get("option_chain", ticker="QQQ", expiry="2025-03-21")
+    assert fetcher.calls[-1] == {"ticker": "QQQ", "expiry": "2025-03-21"}
+
+    age(cache, "option_chain", 61, ticker="SPY", expiry="2025-03-21")
+    stale = cache.get("option_chain", ticker="SPY", expiry="2025-03-21")
+    assert len(fetcher.calls) == 3
+    assert stale["strike"].iloc[0] == 3.0
+    # A per-call ttl overrides the schema's
+    age(cache, "option_chain", 61, ticker="SPY", expiry="2025-03-21")
+    cache.get("option_chain", ttl=120, ticker="SPY", expiry="2025-03-21")
+    assert len(fetcher.calls) == 3
+
+
+def test_evicts_the_least_recently_used(tmp_path, fetcher):
+    cache = MarketDataCache(str(tmp_path), max_entries=2, fetchers={"option_chain": fetcher})
+    cache.get("option_chain", ticker="A")
+    cache.get("option_chain", ticker="B")
+    age(cache, "option_chain", 30, ticker="A")
+    age(cache, "option_chain", 20, ticker="B")
+    # Reading A makes B the least recently used
+    cache.get("option_chain", ticker="A")
+    cache.get("option_chain", ticker="C")
+    assert len(fetcher.calls) == 3
+    assert cache.load("option_chain", ticker="B") is None
+    assert cache.load("option_chain", ticker="A") is not None
+    assert cache.load("option_chain", ticker="C") is not None
+
+
+def test_none_is_not_cached_and_disabled_always_fetches(tmp_path):
+    calls = []
+    cache = MarketDataCache(str(tmp_path), fetchers={"spot": lambda **p: calls.append(p)})
+    cache.get("spot", ticker="SPY")
+    cache.get("spot", ticker="SPY")
+    assert len(calls) == 2
+
+    off = MarketDataCache(str(tmp_path), fetchers={"spot": lambda **p: calls.append(p) or 101.5}, enabled=False)
+    assert off.get("spot", ticker="SPY") == 101.5
+    assert off.get("spot", ticker="SPY") == 101.5
+    assert len(calls) == 4
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+
+from Common.lod import Pyramid
+
+N = 1000
+T0 = 1_704_205_800_123_456_789  # ns; too large for float64 midpoints to be exact
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    times = T0 + np.cumsum(rng.integers(1, 5_000_000, N))
+    depth = rng.uniform(0, 100, (N, 4))
+    price = 100 + np.cumsum(rng.normal(0, 0.01, N))
+    return times, depth, price
+
+
+@pytest.fixture(scope="module")
+def pyramid(data):
+    times, depth, price = data
+    return Pyramid((times,), {"depth": depth, "price": price})
+
+
+def blocks(values, step):
+    """Full-resolution blocks behind each point of a level; the last may be short."""
+    return [values[i:i + step] for i in range(0, len(values), step)]
+
+
+def test_budget_picks_the_finest_level_that_fits(pyramid):
+    assert pyramid.window(budget=N).level == 0
+    assert pyramid.window(budget=N - 1).level == 1
+    assert pyramid.window(budget=500).level == 1
+    assert pyramid.window(budget=499).level == 2
+    view = pyramid.window(budget=40)
+    assert view.step == (32,) and len(view.coords[0]) <= 40
+    # Levels stop once the axis is down to MIN_SIZE, however small the budget
+    assert len(pyramid.window(budget=1).coords[0]) <= 16
+    assert pyramid.window(budget=10, level=1).level == 1
+
+
+def test_window_bounds_pick_the_level_for_the_range(pyramid, data):
+    times = data[0]
+    view = pyramid.window(times[100], times[299], budget=200)
+    assert view.level == 0
+    np.testing.assert_array_equal(view.coords[0], times[100:300])
+    np.testing.assert_array_equal(view.values["price"], data[2][100:300])
+
+    view = pyramid.window(times[100], times[299], budget=50)
+    assert view.level == 2
+    # The whole blocks covering rows 100..299
+    np.testing.assert_allclose(view.values["price"], [b.mean() for b in blocks(data[2], 4)[25:75]], rtol=1e-12)
+
+
+@pytest.mark.parametrize("level", range(6))
+def test_blocks_match_the_raw_data(pyramid, data, level):
+    times, depth, price = data
+    view = pyramid.window(level=level, reduction={"depth": "max", "price": "min"})
+    step = view.step[0]
+    assert len(view.coords[0]) == -(-N // step)
+    np.testing.assert_array_equal(view.values["depth"], [b.max(axis=0) for b in blocks(depth, step)])
+    np.testing.assert_array_equal(view.values["price"], [b.min() for b in blocks(price, step)])
+    means = pyramid.window(level=level).values
+    np.testing.assert_allclose(means["depth"], [b.mean(axis=0) for b in blocks(depth, step)], rtol=1e-12)
+    assert means["depth"].shape[1:] == (4,)
+
+
+def test_short_tail_block(pyramid, data):
+    # 1000 = 62 * 16 + 8: the last block at step 16 holds only the final 8 rows
+    view = pyramid.window(level=4, reduction="max")
+    assert view.step == (16,) and len(view.coords[0]) == 63
+    np.testing.assert_array_equal(view.values["price"][-1], data[2][992:].max())
+    np.testing.assert_array_equal(view.values["depth"][-1], data[1][992:].max(axis=0))
+    assert data[0][992] <= view.coords[0][-1] <= data[0][999]
+
+
+def test_int64_midpoints_are_exact(pyramid, data):
+    # Each level's midpoints, in Python integers, from the level below
+    below = [int(t) for t in data[0]]
+    for level in range(1, len(pyramid.levels)):
+        pairs = [below[i:i + 2] for i in range(0, len(below), 2)]
+        below = [b[0] + (b[-1] - b[0]) // 2 for b in pairs]
+        coords = pyramid.coords[level][0]
+        assert coords.dtype == np.int64
+        assert coords.tolist() == below
+        assert np.all(np.diff(coords) > 0)
+
+
+def test_nans_are_ignored_in_blocks():
+    values = np.arange(64.0)
+    values[[5, 8, 9]] = np.nan
+    pyramid = Pyramid((np.arange(64),), {"v": values}, min_size=8)
+    np.testing.assert_array_equal(pyramid.window(level=1).values["v"][:5], [0.5, 2.5, 4.0, 6.5, np.nan])
+    np.testing.assert_array_equal(pyramid.window(level=1, reduction="max").values["v"][:5], [1, 3, 4, 7, np.nan])
+
+
+def test_two_axis_pyramid():
+    rng = np.random.default_rng(1)
+    dates = np.arange(100, dtype=float)
+    maturities = np.linspace(0.25, 30, 40)
+    z = rng.normal(size=(100, 40))
+    pyramid = Pyramid((dates, maturities), {"z": z})
+    assert pyramid.shape == (100, 40)
+
+    # Both axes shrink together until each is down to MIN_SIZE
+    view = pyramid.window(budget=(25, 40), reduction="max")
+    assert view.step == (4, 4)
+    np.testing.assert_array_equal(view.values["z"], z.reshape(25, 4, 10, 4).max(axis=(1, 3)))
+    np.testing.assert_array_equal(view.coords[0], dates.reshape(25, 4)[:, [0, 3]].mean(axis=1))
+    assert pyramid.window(budget=(16, 1000)).step == (8, 4)
+    assert pyramid.window(budget=1).step == (8, 4)
+
+    # Dates 10..49 and maturities up to 5y, rounded out to whole blocks
+    view = pyramid.window((10, None), (49, 5.0), budget=(20, 40), reduction="min")
+    assert view.step == (2, 2)
+    rows, cols = slice(10 // 2, 50 // 2), slice(0, -(-(maturities <= 5.0).sum() // 2))
+    expected = z.reshape(50, 2, 20, 2).min(axis=(1, 3))[rows, cols]
+    np.testing.assert_array_equal(view.values["z"], expected)
+
+    with pytest.raises(ValueError, match="does not match"):
+        Pyramid((dates, maturities), {"z": z.T})
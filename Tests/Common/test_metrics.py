@@ -0,0 +1,149 @@
+import threading
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from Common import metrics
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics(monkeypatch):
+    """Empty process totals and metrics off, restored after each test."""
+    tracing = tracemalloc.is_tracing()
+    monkeypatch.setattr(metrics, "_enabled", False)
+    monkeypatch.setattr(metrics, "_memory", False)
+    monkeypatch.setattr(metrics, "_totals", metrics._empty())
+    monkeypatch.setattr(metrics, "_reports", [])
+    yield
+    if not tracing and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def test_disabled_records_nothing():
+    assert not metrics.enabled()
+    assert metrics.span("a") is metrics.span("b")
+    with metrics.collect() as report:
+        with metrics.span("stage"):
+            metrics.count("rows", 5)
+        assert list(metrics.timed("fetch", range(3))) == [0, 1, 2]
+    assert report is None
+    snap = metrics.snapshot()
+    assert snap["spans"] == {} and snap["counters"] == {}
+    assert not snap["enabled"]
+    assert "streetview_span_calls_total{" not in metrics.prometheus()
+
+
+def test_spans_and_counters():
+    metrics.enable()
+    for _ in range(3):
+        with metrics.span("stage"):
+            pass
+    with pytest.raises(RuntimeError):
+        with metrics.span("failing"):
+            raise RuntimeError
+    metrics.count("rows", 5)
+    metrics.count("rows")
+    metrics.count("contracts", 2)
+
+    snap = metrics.snapshot()
+    stage = snap["spans"]["stage"]
+    assert stage["calls"] == 3
+    assert 0 <= stage["max_seconds"] <= stage["seconds"]
+    assert "peak_bytes" not in stage
+    # A span that raised is still timed
+    assert snap["spans"]["failing"]["calls"] == 1
+    assert snap["counters"] == {"rows": 6, "contracts": 2}
+    assert snap["enabled"]
+
+    metrics.reset()
+    assert metrics.snapshot()["spans"] == {}
+
+
+def test_timed_counts_each_next():
+    metrics.enable()
+    assert list(metrics.timed("fetch", iter("abc"))) == ["a", "b", "c"]
+    # three items and the final StopIteration
+    assert metrics.snapshot()["spans"]["fetch"]["calls"] == 4
+
+
+def test_memory_peaks_nest():
+    metrics.enable(memory=True)
+    with metrics.span("outer"):
+        with metrics.span("inner"):
+            block = np.ones(1_000_000)
+            del block
+    spans = metrics.snapshot()["spans"]
+    assert spans["inner"]["peak_bytes"] >= 8_000_000
+    # The parent's peak includes its child's
+    assert spans["outer"]["peak_bytes"] >= spans["inner"]["peak_bytes"]
+
+
+def test_collect_sees_only_its_window():
+    metrics.enable()
+    metrics.count("before")
+    with metrics.collect() as report:
+        with metrics.span("stage"):
+            metrics.count("rows", 3)
+        # Spans from other threads land in the open report too
+        thread = threading.Thread(target=lambda: metrics.count("rows", 4))
+        thread.start()
+        thread.join()
+    metrics.count("after")
+
+    assert report["counters"] == {"rows": 7}
+    assert list(report["spans"]) == ["stage"]
+    assert metrics.snapshot()["counters"] == {"before": 1, "rows": 7, "after": 1}
+
+
+def test_merge_adds_reports_to_the_totals():
+    metrics.enable()
+    with metrics.span("stage"):
+        pass
+    metrics.count("rows", 2)
+    seconds = metrics.snapshot()["spans"]["stage"]["seconds"]
+
+    metrics.merge({
+        "spans": {"stage": {"calls": 2, "seconds": 5.0, "max_seconds": 4.0, "peak_bytes": 100},
+                  "worker": {"calls": 1, "seconds": 1.0, "max_seconds": 1.0}},
+        "counters": {"rows": 3, "contracts": 7},
+    })
+    metrics.merge(None)
+
+    snap = metrics.snapshot()
+    assert snap["spans"]["stage"] == {"calls": 3, "seconds": pytest.approx(seconds + 5.0),
+                                      "max_seconds": 4.0, "peak_bytes": 100}
+    assert snap["spans"]["worker"] == {"calls": 1, "seconds": 1.0, "max_seconds": 1.0}
+    assert snap["counters"] == {"rows": 5, "contracts": 7}
+
+
+def test_prometheus_exposition():
+    metrics.merge({
+        "spans": {"iv.solve": {"calls": 2, "seconds": 1.5, "max_seconds": 1.0, "peak_bytes": 2048},
+                  'odd"name': {"calls": 1, "seconds": 0.25, "max_seconds": 0.25}},
+        "counters": {"iv.contracts": 40},
+    })
+    lines = metrics.prometheus().splitlines()
+
+    assert "# TYPE streetview_span_seconds_total counter" in lines
+    assert 'streetview_span_seconds_total{span="iv.solve"} 1.500000' in lines
+    assert 'streetview_span_calls_total{span="iv.solve"} 2' in lines
+    assert 'streetview_span_max_seconds{span="iv.solve"} 1.000000' in lines
+    assert 'streetview_span_peak_bytes{span="iv.solve"} 2048' in lines
+    assert not any(line.startswith('streetview_span_peak_bytes{span="odd') for line in lines)
+    assert 'streetview_span_calls_total{span="odd\\"name"} 1' in lines
+    assert "# TYPE streetview_events_total counter" in lines
+    assert 'streetview_events_total{name="iv.contracts"} 40' in lines
+    if metrics.max_rss() is not None:
+        assert any(line.startswith("streetview_max_rss_bytes ") for line in lines)
+    assert metrics.prometheus(prefix="svc").startswith("# TYPE svc_span_seconds_total counter")
+
+
+def test_summary_lists_the_slowest_stage_first():
+    report = {"spans": {"fast": {"calls": 1, "seconds": 0.001, "max_seconds": 0.001},
+                        "slow": {"calls": 2, "seconds": 0.5, "max_seconds": 0.3, "peak_bytes": 3e6}},
+              "counters": {"rows": 10}}
+    lines = metrics.summary(report).splitlines()
+    assert lines[1].split() == ["slow", "2", "500.0", "300.0", "3.0"]
+    assert lines[2].split() == ["fast", "1", "1.0", "1.0", "-"]
+    assert lines[3].split() == ["rows", "10"]
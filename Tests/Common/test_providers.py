@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Common.providers import RecordingProvider, ReplayProvider, SyntheticProvider
+
+ROWS = 1000
+
+
+def record(root, start=None, end=None, limit=None, chunk_size=128, ticker="TEST"):
+    source = SyntheticProvider(mbp_rows=ROWS)
+    return pd.concat(RecordingProvider(source, str(root)).mbp10(ticker, start, end, limit, chunk_size))
+
+
+def replay(root, *args, ticker="TEST", **kwargs):
+    frames = list(ReplayProvider(str(root)).mbp10(ticker, *args, **kwargs))
+    return pd.concat(frames) if frames else None
+
+
+def test_mbp10_round_trip(tmp_path):
+    recorded = record(tmp_path)
+    replayed = replay(tmp_path, chunk_size=300)
+    assert len(replayed) == ROWS
+    pd.testing.assert_frame_equal(replayed, recorded, check_dtype=False, check_index_type=False)
+    assert [len(df) for df in ReplayProvider(str(tmp_path)).mbp10("TEST", chunk_size=300)] == [300, 300, 300, 100]
+
+
+@pytest.mark.parametrize("tz", [None, "UTC", "America/New_York"])
+def test_time_windows(tmp_path, tz):
+    recorded = record(tmp_path)
+    start, end = recorded["ts_event"].iloc[100], recorded["ts_event"].iloc[400]
+    if tz is None:
+        start, end = start.tz_localize(None), end.tz_localize(None)
+    else:
+        start, end = start.tz_convert(tz), end.tz_convert(tz)
+    window = replay(tmp_path, start, end)
+    pd.testing.assert_frame_equal(window, recorded.iloc[100:400], check_dtype=False, check_index_type=False)
+    assert len(replay(tmp_path, start, limit=50)) == 50
+    assert len(replay(tmp_path, end=str(recorded["ts_event"].iloc[10].tz_localize(None)))) == 10
+
+
+def test_rerecording_replaces_the_window(tmp_path):
+    recorded = record(tmp_path)
+    record(tmp_path)
+    replayed = replay(tmp_path)
+    assert len(replayed) == ROWS
+    assert replayed["ts_event"].is_monotonic_increasing
+    pd.testing.assert_frame_equal(replayed, recorded, check_dtype=False, check_index_type=False)
+
+
+def test_later_and_earlier_recordings_stay_in_order(tmp_path):
+    first = record(tmp_path, start="2024-01-02 14:30")
+    later = record(tmp_path, start="2024-01-02 16:00", limit=300)
+    earlier = record(tmp_path, start="2024-01-02 12:00", limit=200)
+    replayed = replay(tmp_path)
+    assert len(replayed) == ROWS + 300 + 200
+    assert replayed["ts_event"].is_monotonic_increasing
+    expected = pd.concat([earlier, first, later])
+    np.testing.assert_array_equal(replayed["bid_px_00"].to_numpy(), expected["bid_px_00"].to_numpy())
+
+    # A recording overlapping the middle replaces only what it covers
+    before = replayed["ts_event"]
+    overlap = record(tmp_path, start=first["ts_event"].iloc[200], limit=300)
+    span = overlap["ts_event"].iloc[[0, -1]]
+    covered = ((before >= span.iloc[0]) & (before <= span.iloc[1])).sum()
+    replayed = replay(tmp_path)
+    assert len(replayed) == len(before) - covered + len(overlap)
+    assert replayed["ts_event"].is_monotonic_increasing
+    inside = replay(tmp_path, span.iloc[0], span.iloc[1] + pd.Timedelta(1, "ns"))
+    np.testing.assert_array_equal(inside["ask_sz_03"].to_numpy(), overlap["ask_sz_03"].to_numpy())
+
+
+def test_stopping_early_keeps_what_was_streamed(tmp_path):
+    frames = RecordingProvider(SyntheticProvider(mbp_rows=ROWS), str(tmp_path)).mbp10("TEST", chunk_size=100)
+    taken = [next(frames), next(frames)]
+    frames.close()
+    assert len(replay(tmp_path)) == sum(len(df) for df in taken)
+    assert sorted(p.name for p in (tmp_path / "mbp10").iterdir()) == ["TEST.bin", "TEST.json"]
+
+
+def test_snapshots_round_trip(tmp_path):
+    source = SyntheticProvider()
+    recorder = RecordingProvider(source, str(tmp_path))
+    expiry = recorder.expirations("TEST")[0]
+    chain = recorder.option_chain("TEST", expiry)
+    assert recorder.spot("TEST") == source.spot_price
+    recorder.yield_history(["^IRX", "^TNX"], "2024-01-01", "2024-03-01")
+
+    replayed = ReplayProvider(str(tmp_path))
+    assert replayed.spot("TEST") == source.spot_price
+    assert replayed.expirations("TEST")[0] == expiry
+    pd.testing.assert_frame_equal(replayed.option_chain("TEST", expiry)["calls"], chain["calls"])
+    history = replayed.yield_history(["^IRX", "^TNX"], "2024-02-01", "2024-02-15")
+    assert history.index.min() >= pd.Timestamp("2024-02-01") and history.index.max() < pd.Timestamp("2024-02-15")
+    with pytest.raises(KeyError):
+        replayed.spot("OTHER")
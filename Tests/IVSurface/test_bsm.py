@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from IVSurface.BSMCompute import (IV_CONVERGED, IV_NO_ARBITRAGE, black_scholes_call, black_scholes_price,
+                                  black_scholes_put, implied_forwards, implied_vol_call, implied_vol_put,
+                                  implied_vols, otm_implied_vols)
+
+S, R = 100.0, 0.04
+
+
+def chain(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    K = S * np.exp(rng.uniform(-0.4, 0.4, n))
+    T = rng.uniform(0.02, 2.0, n)
+    sigma = rng.uniform(0.08, 1.2, n)
+    is_call = rng.random(n) < 0.5
+    return K, T, sigma, is_call
+
+
+@pytest.mark.parametrize("method", ["seeded", "newton"])
+def test_round_trip(method):
+    K, T, sigma, is_call = chain()
+    prices = black_scholes_price(S, K, T, R, sigma, is_call)
+    iv, iterations, status = implied_vols(prices, S, K, T, r=R, is_call=is_call, method=method,
+                                          tol=1e-10, full_output=True)
+    # Lanes with no time value left cannot pin sigma down
+    vega_ok = (black_scholes_price(S, K, T, R, sigma * 1.01, is_call) - prices) > 1e-8
+    assert (status[vega_ok] == IV_CONVERGED).all()
+    np.testing.assert_allclose(iv[vega_ok], sigma[vega_ok], rtol=1e-5)
+    assert iterations.max() < 100
+
+
+def test_no_arbitrage_lanes_are_flagged():
+    K = np.array([90.0, 90.0, 110.0, 110.0, 100.0])
+    T = np.array([0.5, 0.5, 0.5, 0.5, 0.0])
+    is_call = np.array([True, True, False, False, True])
+    # Below intrinsic, above the spot, below put intrinsic, above K*exp(-rT), expired
+    prices = np.array([5.0, 101.0, 5.0, 120.0, 1.0])
+    iv, _, status = implied_vols(prices, S, K, T, r=R, is_call=is_call, full_output=True)
+    assert (status == IV_NO_ARBITRAGE).all()
+    assert np.isnan(iv).all()
+
+
+def test_scalar_wrappers():
+    call = black_scholes_call(S, 105.0, 0.5, R, 0.3)
+    put = black_scholes_put(S, 95.0, 0.5, R, 0.3)
+    assert implied_vol_call(call, S, 105.0, 0.5, R) == pytest.approx(0.3, rel=1e-6)
+    assert implied_vol_put(put, S, 95.0, 0.5, R) == pytest.approx(0.3, rel=1e-6)
+    assert np.isnan(implied_vol_call(0.0, S, 105.0, 0.5, R))
+
+
+def test_scalar_tol_keyword():
+    call = black_scholes_call(S, 105.0, 0.5, R, 0.3)
+    put = black_scholes_put(S, 95.0, 0.5, R, 0.3)
+    # tol is an absolute price tolerance, positionally sixth as before
+    sigma = implied_vol_call(call, S, 105.0, 0.5, R, tol=1e-3)
+    assert abs(black_scholes_call(S, 105.0, 0.5, R, sigma) - call) < 1e-3
+    sigma = implied_vol_put(put, S, 95.0, 0.5, R, 1e-2)
+    assert abs(black_scholes_put(S, 95.0, 0.5, R, sigma) - put) < 1e-2
+
+
+def dividend_chain(q=0.025, noise=0.0, seed=1):
+    """Calls and puts on three expiries, priced off F = S * exp((r - q) T) with a skew."""
+    rng = np.random.default_rng(seed)
+    expiries = np.array([0.1, 0.5, 1.5])
+    K = np.tile(np.arange(70.0, 131.0, 5.0), expiries.size)
+    T = np.repeat(expiries, K.size // expiries.size)
+    F = S * np.exp((R - q) * T)
+    sigma = 0.25 - 0.3 * np.log(K / F)
+    K, T, F, sigma = (np.r_[a, a] for a in (K, T, F, sigma))
+    is_call = np.arange(K.size) < K.size // 2
+    prices = black_scholes_price(F * np.exp(-R * T), K, T, R, sigma, is_call)
+    return prices * (1 + noise * rng.standard_normal(K.size)), K, T, sigma, is_call, expiries, F
+
+
+def test_implied_forwards_recover_a_dividend_forward():
+    prices, K, T, _, is_call, expiries, _ = dividend_chain()
+    got, forwards = implied_forwards(prices, S, K, T, R, is_call)
+    np.testing.assert_array_equal(got, expiries)
+    np.testing.assert_allclose(forwards, S * np.exp((R - 0.025) * expiries), rtol=1e-10)
+    # Spot carry alone would be off by the dividend
+    assert np.all(np.abs(forwards - S * np.exp(R * expiries)) > 0.2)
+
+
+def test_implied_forwards_weight_out_noise_and_fall_back():
+    prices, K, T, _, is_call, expiries, _ = dividend_chain(noise=0.002)
+    _, forwards = implied_forwards(prices, S, K, T, R, is_call)
+    np.testing.assert_allclose(forwards, S * np.exp((R - 0.025) * expiries), rtol=2e-3)
+
+    # An expiry quoted on one side only has no parity pair
+    prices, K, T, _, is_call, expiries, _ = dividend_chain()
+    keep = (T != expiries[1]) | is_call
+    _, forwards = implied_forwards(prices[keep], S, K[keep], T[keep], R, is_call[keep])
+    assert forwards[1] == pytest.approx(S * np.exp(R * expiries[1]))
+    assert forwards[0] == pytest.approx(S * np.exp((R - 0.025) * expiries[0]))
+
+
+def test_otm_vols_are_solved_against_the_forward():
+    prices, K, T, sigma, is_call, _, F = dividend_chain()
+    iv, k, _ = otm_implied_vols(prices, S, K, T, R, is_call)
+    otm = np.where(is_call, K >= F, K < F)
+    assert np.isnan(iv[~otm]).all()
+    np.testing.assert_allclose(iv[otm], sigma[otm], rtol=1e-6)
+    np.testing.assert_allclose(k, np.log(K / F), rtol=1e-9, atol=1e-12)
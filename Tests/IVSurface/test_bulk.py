@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from Common.providers import SyntheticProvider, use_provider
+from IVSurface.bulk import _fetch_quotes, _solve_surface, build_surfaces
+from IVSurface.store import SurfaceStore
+from IVSurface.surface import VolSurface
+
+
+class PartlyBroken(SyntheticProvider):
+    """Synthetic data, except that BROKEN has no quote."""
+
+    def spot(self, ticker):
+        if ticker == "BROKEN":
+            raise LookupError("no quote for BROKEN")
+        return super().spot(ticker)
+
+
+@pytest.fixture
+def provider():
+    with use_provider(PartlyBroken(n_expiries=4)) as provider:
+        yield provider
+
+
+def run(tickers, **kwargs):
+    return build_surfaces(tickers, io_workers=2, cpu_workers=1, max_expirations=4, **kwargs)
+
+
+def test_one_failure_leaves_the_batch_intact(provider):
+    result = run(["AAA", "BROKEN", "BBB", "AAA"])
+
+    assert list(result.surfaces) == ["AAA", "BBB"]
+    assert result.failures == {"BROKEN": "LookupError: no quote for BROKEN"}
+    assert result.elapsed > 0
+    assert result.throughput == pytest.approx(3 / result.elapsed)
+    # The pooled fit matches solving the same chain in this process
+    serial = VolSurface.from_dict(_solve_surface(_fetch_quotes("AAA", 4), "svi"))
+    k = np.linspace(-0.3, 0.3, 7)
+    for surface in result.surfaces.values():
+        assert surface.spot == provider.spot_price
+        np.testing.assert_array_equal(surface.expiries, serial.expiries)
+        np.testing.assert_allclose(surface.grid(k, serial.expiries), serial.grid(k, serial.expiries))
+
+
+def test_store_appends_each_surface(provider, tmp_path):
+    store = SurfaceStore(str(tmp_path))
+    first = run(["AAA", "BROKEN"], store=store)
+    second = run(["AAA", "BBB"], store=store)
+
+    assert first.failures.keys() == {"BROKEN"} and not second.failures
+    assert store.tickers() == ["AAA", "BBB"]
+    history = store.history("AAA")
+    assert history.iv.shape[0] == 2
+    assert np.all(np.diff(history.timestamps) > 0)
+    np.testing.assert_allclose(history.forwards[:, 0], provider.spot_price, rtol=0.05)
+    assert store.history("BBB").iv.shape[0] == 1
+
+
+def test_store_failures_are_recorded_per_ticker(provider, tmp_path):
+    store = SurfaceStore(str(tmp_path))
+    result = run(["AAA", "BAD/NAME"], store=store)
+
+    # Fitted, but the store rejected the name
+    assert set(result.surfaces) == {"AAA", "BAD/NAME"}
+    assert result.failures == {"BAD/NAME": "ValueError: Unsupported ticker 'BAD/NAME'."}
+    assert store.tickers() == ["AAA"]
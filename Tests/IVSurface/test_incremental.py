@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Common.providers import SyntheticProvider, use_provider
+from IVSurface.DataSourcing import get_option_chains
+from IVSurface.incremental import IncrementalSurface
+
+
+@pytest.fixture
+def chains():
+    with use_provider(SyntheticProvider(n_expiries=4)):
+        yield get_option_chains("TEST")
+
+
+def bumped(chains, expiry, row, by):
+    """A copy of chains with one call's bid and ask moved."""
+    out = []
+    for i, (calls, puts, T) in enumerate(chains):
+        calls = calls.copy()
+        if i == expiry:
+            calls.loc[row, ["bid", "ask"]] += by
+        out.append((calls, puts, T))
+    return out
+
+
+def test_unchanged_poll_resolves_nothing(chains):
+    chain, S = chains
+    surface = IncrementalSurface("TEST")
+    first = surface.update(chain, S)
+    assert first["resolved"] == first["contracts"]
+    assert first["expiries_refit"] == len(chain)
+
+    params = surface.surface.params.copy()
+    again = surface.update(chain, S)
+    assert again == {"contracts": first["contracts"], "resolved": 0, "expiries_refit": 0}
+    np.testing.assert_array_equal(surface.surface.params, params)
+
+
+def test_moved_quote_refits_only_its_expiry(chains):
+    chain, S = chains
+    surface = IncrementalSurface("TEST")
+    surface.update(chain, S)
+    params = surface.surface.params.copy()
+
+    stats = surface.update(bumped(chain, 2, 20, 0.05), S)
+    assert stats["resolved"] == 1
+    assert stats["expiries_refit"] == 1
+    others = np.arange(len(chain)) != 2
+    np.testing.assert_array_equal(surface.surface.params[others], params[others])
+    assert not np.array_equal(surface.surface.params[2], params[2])
+
+
+def test_warm_start_matches_a_fresh_solve(chains):
+    chain, S = chains
+    moved = bumped(chain, 1, 18, 0.1)
+    warm = IncrementalSurface("TEST")
+    warm.update(chain, S)
+    # A spot move past spot_rtol re-solves every contract from its old sigma
+    warm.update(moved, S * 1.01)
+    fresh = IncrementalSurface("TEST")
+    fresh.update(moved, S * 1.01)
+
+    np.testing.assert_allclose(warm.sigma, fresh.sigma, rtol=1e-6, equal_nan=True)
+    k, T = np.linspace(-0.3, 0.3, 7), np.array([0.1, 0.3])
+    np.testing.assert_allclose(warm.grid(k, T), fresh.grid(k, T), rtol=1e-6)
+
+
+def test_duplicate_strikes_keep_the_last_row(chains):
+    chain, S = chains
+    calls, puts, T = chain[0]
+    duplicate = calls.iloc[[20]].assign(bid=calls["bid"].iloc[20] + 0.05, ask=calls["ask"].iloc[20] + 0.05)
+    doubled = [(pd.concat([calls, duplicate], ignore_index=True), puts, T)] + chain[1:]
+
+    surface = IncrementalSurface("TEST")
+    first = surface.update(doubled, S)
+    again = surface.update(doubled, S)
+    assert again["contracts"] == first["contracts"]
+    assert again["resolved"] == 0
+
+    reference = IncrementalSurface("TEST")
+    reference.update(bumped(chain, 0, 20, 0.05), S)
+    order = surface.index.get_indexer(reference.index)
+    np.testing.assert_allclose(surface.sigma[order], reference.sigma, equal_nan=True)
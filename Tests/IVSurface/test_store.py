@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from IVSurface.store import SurfaceStore, default_store, moneyness_of
+from IVSurface.surface import VolSurface
+
+EXPIRIES = np.array([7, 30, 91, 365]) / 365.0
+
+
+def flat_surface(vol, forwards=None):
+    """Flat vol at every quote of four expiries."""
+    k = np.tile(np.linspace(-0.4, 0.4, 9), EXPIRIES.size)
+    T = np.repeat(EXPIRIES, 9)
+    return VolSurface(k, T, np.full(k.size, vol), forwards=forwards)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SurfaceStore(str(tmp_path))
+
+
+def test_append_and_range_queries(store):
+    for day, vol in enumerate([0.2, 0.25, 0.3]):
+        assert store.append("TEST", flat_surface(vol), 100.0 + day, timestamp=f"2025-01-0{day + 1}", rates=0.04) == day
+
+    h = store.history("TEST")
+    assert h.iv.shape == (3, store.tenor_days.size, store.log_moneyness.size)
+    assert h.moneyness == "spot"
+    np.testing.assert_allclose(h.forwards[:, 0], [100.0, 101.0, 102.0])
+
+    times, vols = store.series("TEST", tenor_days=30, k=0.0, start="2025-01-02", end="2025-01-03")
+    assert len(times) == 2
+    np.testing.assert_allclose(vols, [0.25, 0.3], atol=1e-5)
+
+    _, tenors, term = store.term_structure("TEST", end="2025-01-01")
+    assert term.shape == (1, tenors.size)
+    np.testing.assert_allclose(term, 0.2, atol=1e-5)
+
+    assert store.at("TEST", "2025-01-02 12:00") == 1
+    assert store.at("TEST", "2024-12-31") is None
+    assert store.quotes("TEST", 2)["iv"].size == 36
+    with pytest.raises(ValueError):
+        store.append("TEST", flat_surface(0.2), 100.0, timestamp="2024-12-31", rates=0.04)
+
+
+def test_histories_keep_one_moneyness_convention(store):
+    forwards = (EXPIRIES, 100.0 * np.exp(0.03 * EXPIRIES))
+    otm = flat_surface(0.2, forwards=forwards)
+    assert moneyness_of(otm) == "forward"
+
+    store.append("SPOT", flat_surface(0.2), 100.0, timestamp="2025-01-01", rates=0.04)
+    with pytest.raises(ValueError, match="spot-moneyness"):
+        store.append("SPOT", otm, 100.0, timestamp="2025-01-02", rates=0.04)
+
+    store.append("FWD", otm, 100.0, timestamp="2025-01-01", rates=0.04)
+    with pytest.raises(ValueError, match="forward-moneyness"):
+        store.append("FWD", flat_surface(0.2), 100.0, timestamp="2025-01-02", rates=0.04)
+    h = store.history("FWD")
+    assert h.moneyness == "forward"
+    np.testing.assert_allclose(h.forwards[0], 100.0 * np.exp(0.03 * store.tenor_days / 365.0), rtol=1e-5)
+
+
+def test_default_histories_are_separate_per_side():
+    assert default_store("both").root != default_store("otm").root
+    with pytest.raises(ValueError):
+        default_store("itm")
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from Common import cache
+from Common.providers import SyntheticProvider, use_provider
+from IVSurface.BSMCompute import black_scholes_greeks
+from IVSurface.surface import VolSurface, fit_surface
+
+
+@pytest.fixture(autouse=True)
+def private_cache(tmp_path, monkeypatch):
+    """A process-wide cache of this test's own, put back afterwards."""
+    monkeypatch.setattr(cache, "_default_cache", cache.MarketDataCache(str(tmp_path)))
+
+
+def test_fit_keeps_its_spot():
+    with use_provider(SyntheticProvider(spot=100.0)):
+        surface = fit_surface("TEST")
+    assert surface.spot == 100.0
+
+    # The cached fit keeps the spot it was solved at
+    restored = VolSurface.from_dict(surface.to_dict())
+    assert restored.spot == 100.0
+    k, T = np.array([-0.1, 0.0, 0.1]), np.array([0.25, 0.5])
+    greeks = restored.greeks_grid(restored.spot, k, T, 0.04, True, ["delta"])
+    sigma = restored.grid(k, T)
+    expected = black_scholes_greeks(100.0, 100.0 * np.exp(k)[None, :], T[:, None], 0.04, sigma, True, ["delta"])
+    np.testing.assert_allclose(greeks["delta"], expected["delta"])
+
+
+def test_pipeline_greeks_use_the_fit_spot(monkeypatch):
+    import pipelines
+
+    with use_provider(SyntheticProvider(spot=100.0)):
+        fitted = fit_surface("TEST")
+    # A cached fit from when the spot was 80; the provider's spot has moved to 100 since
+    fitted.spot = 80.0
+    monkeypatch.setattr(pipelines, "fit_surface", lambda *args, **kwargs: fitted)
+    result = pipelines.run({"pipeline": "iv_surface", "ticker": "TEST", "grid": 5, "greeks": ["delta"],
+                            "source": "synthetic"})
+    with use_provider(SyntheticProvider()):
+        rates = pipelines.get_risk_free_rates(result["tte"])
+    expected = fitted.greeks_grid(80.0, result["log_moneyness"], result["tte"], rates, True, ["delta"])
+    np.testing.assert_allclose(result["greeks"]["delta"], expected["delta"])
@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Common.providers import SyntheticProvider
+from OrderFlowCanyon import analytics
+from OrderFlowCanyon.analytics import book_analytics, liquidity_changes, rolling
+from OrderFlowCanyon.utils import create_orderbook
+
+NAN = np.nan
+
+
+def flows(*books):
+    """liquidity_changes over snapshots given as (prices, sizes) pairs."""
+    px = np.array([p for p, _ in books], dtype=float)
+    sz = np.array([s for _, s in books], dtype=float)
+    added, removed = liquidity_changes(px, sz)
+    return added.tolist(), removed.tolist()
+
+
+def test_unchanged_book_has_no_flow():
+    book = ([10, 11, 12, 13], [1, 2, 3, 4])
+    assert flows(book, book, book) == ([0, 0, 0], [0, 0, 0])
+
+
+def test_size_changes_at_a_price():
+    assert flows(([10, 11, 12, 13], [1, 2, 3, 4]),
+                 ([10, 11, 12, 13], [6, 2, 1, 4])) == ([0, 5], [0, 2])
+
+
+def test_shifted_book_is_not_flow():
+    # One tick up: 10 leaves below the new range and 14 scrolls in beyond the
+    # old one; the prices still quoted keep their sizes
+    assert flows(([10, 11, 12, 13], [1, 2, 3, 4]),
+                 ([11, 12, 13, 14], [2, 3, 4, 7])) == ([0, 0], [0, 0])
+    # The same shift with 12 topped up by 5
+    assert flows(([10, 11, 12, 13], [1, 2, 3, 4]),
+                 ([11, 12, 13, 14], [2, 8, 4, 7])) == ([0, 5], [0, 0])
+
+
+def test_new_price_inside_the_old_range_is_added():
+    # 11 fills a gap inside [10, 14]; 14 scrolls out past the visible depth
+    assert flows(([10, 12, 13, 14], [1, 1, 1, 1]),
+                 ([10, 11, 12, 13], [1, 5, 1, 1])) == ([0, 5], [0, 0])
+
+
+def test_price_leaving_inside_the_new_range_is_withdrawn():
+    # 11 empties inside [10, 14]; 14 appears beyond the old range
+    assert flows(([10, 11, 12, 13], [1, 3, 1, 1]),
+                 ([10, 12, 13, 14], [1, 1, 1, 9])) == ([0, 0], [0, 3])
+
+
+def test_missing_levels():
+    # A thin book (NaN levels) filling in and emptying again
+    assert flows(([10, 11, NAN, NAN], [1, 2, NAN, NAN]),
+                 ([10, 11, 12, NAN], [1, 2, 4, NAN]),
+                 ([10, NAN, NAN, NAN], [1, NAN, NAN, NAN])) == ([0, 0, 0], [0, 0, 0])
+    assert flows(([10, 12, NAN, NAN], [1, 2, NAN, NAN]),
+                 ([10, 11, 12, NAN], [1, 4, 2, NAN])) == ([0, 4], [0, 0])
+
+
+def test_chunked_matching_is_seamless(monkeypatch):
+    apx, _, avc, _, _ = create_orderbook(SyntheticProvider().mbp_frame(500), stride=1)
+    asz = analytics.level_sizes(avc)
+    whole = liquidity_changes(apx, asz)
+    assert whole[0].sum() > 0 and whole[1].sum() > 0
+    monkeypatch.setattr(analytics, "MATCH_CHUNK", 7)
+    for expected, chunked in zip(whole, liquidity_changes(apx, asz)):
+        np.testing.assert_array_equal(chunked, expected)
+
+
+MS = 1_000_000
+TIMES = np.array([0, 100, 250, 1000, 1100]) * MS
+VALUES = np.array([1.0, 2.0, 3.0, 4.0, 5.0])
+
+
+def test_row_windows():
+    np.testing.assert_array_equal(rolling(VALUES, 2, how="sum"), [1, 3, 5, 7, 9])
+    np.testing.assert_array_equal(rolling(VALUES, 2), [1, 1.5, 2.5, 3.5, 4.5])
+    np.testing.assert_array_equal(rolling(np.c_[VALUES, -VALUES], 3, how="sum")[:, 1], [-1, -3, -6, -9, -12])
+
+
+def test_duration_windows():
+    # Each row sums the rows in (t - 500ms, t]
+    np.testing.assert_array_equal(rolling(VALUES, "500ms", TIMES, how="sum"), [1, 3, 6, 4, 9])
+    np.testing.assert_array_equal(rolling(VALUES, pd.Timedelta("500ms"), TIMES, how="rate"), [2, 6, 12, 8, 18])
+    np.testing.assert_array_equal(rolling(VALUES, "500ms", TIMES), [1, 1.5, 2, 4, 4.5])
+    # A row exactly one window back is outside it: 250ms for the row at 1000ms
+    np.testing.assert_array_equal(rolling(VALUES, "750ms", TIMES, how="sum"), [1, 3, 6, 4, 9])
+
+
+def test_windows_skip_nan():
+    values = np.array([1.0, NAN, 3.0, NAN])
+    np.testing.assert_array_equal(rolling(values, "1s", TIMES[:4]), [1, 1, 2, 3])
+    np.testing.assert_array_equal(rolling(values, 1), [1, NAN, 3, NAN])
+
+
+def test_window_errors():
+    with pytest.raises(ValueError, match="needs times"):
+        rolling(VALUES, "1s")
+    with pytest.raises(ValueError, match="duration window"):
+        rolling(VALUES, 2, how="rate")
+
+
+def test_book_analytics_flow_windows():
+    apx = np.array([[10, 11], [10, 11], [10, 11]], dtype=float)
+    bpx = apx - 2
+    avc = np.cumsum([[1, 1], [4, 1], [4, 3]], axis=1).astype(float)
+    bvc = np.cumsum([[1, 1], [1, 1], [1, 1]], axis=1).astype(float)
+    times = np.array([0, 400, 900]) * MS
+    names = ["ask_replenishment", "spread", "total_imbalance"]
+
+    out = book_analytics(apx, bpx, avc, bvc, metrics=names)
+    assert list(out) == names
+    np.testing.assert_array_equal(out["ask_replenishment"], [0, 3, 2])
+    np.testing.assert_array_equal(out["spread"], [2, 2, 2])
+    np.testing.assert_allclose(out["total_imbalance"], [0, -3 / 7, -5 / 9])
+    np.testing.assert_array_equal(book_analytics(apx, bpx, avc, bvc, window=2, metrics=names)["ask_replenishment"],
+                                  [0, 3, 5])
+    rates = book_analytics(apx, bpx, avc, bvc, times=np.repeat(times[:, None], 2, axis=1), window="500ms",
+                           metrics=names)
+    np.testing.assert_array_equal(rates["ask_replenishment"], [0, 6, 4])
+    with pytest.raises(ValueError, match="Unknown order-book metrics"):
+        book_analytics(apx, bpx, avc, bvc, metrics=["s", "p"])
+
+
+@pytest.mark.parametrize("requested, names", [("spread", ["spread"]), (["mid", "imbalance"], ["mid", "imbalance"])])
+def test_pipeline_takes_a_name_or_a_list(requested, names):
+    import pipelines
+
+    result = pipelines.run({"pipeline": "orderflow_canyon", "ticker": "TEST", "source": "synthetic", "limit": 500,
+                            "stride": 1, "analytics": requested})
+    assert sorted(result["layers"]) == sorted(names)
+    with pytest.raises(ValueError, match="Unknown order-book metrics"):
+        pipelines.run({"pipeline": "orderflow_canyon", "ticker": "TEST", "source": "synthetic", "limit": 500,
+                       "analytics": "sprd"})
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Common.providers import SyntheticProvider
+from OrderFlowCanyon.bars import aggregate_orderbook, bar_ns, concat_bars, iter_bars
+
+DEPTH = 3
+SIDES = ("ask", "bid")
+
+
+def reference_bars(frame, bar):
+    """The same bars computed the slow way, with pandas over a step-function book."""
+    bar = bar_ns(bar)
+    ts = frame["ts_event"].astype("int64").to_numpy()
+    bucket = ts // bar
+    buckets = np.arange(bucket[0], bucket[-1] + 1)
+    grouped = frame.assign(bucket=bucket).groupby("bucket")
+
+    out = {"times": buckets * bar, "counts": grouped.size().reindex(buckets, fill_value=0).to_numpy()}
+    for side in SIDES:
+        px = frame[[f"{side}_px_{i:02d}" for i in range(DEPTH)]].set_axis(range(DEPTH), axis=1)
+        sz = frame[[f"{side}_sz_{i:02d}" for i in range(DEPTH)]].set_axis(range(DEPTH), axis=1).astype(float)
+        last_px = px.groupby(bucket).last().reindex(buckets).ffill()
+        last_sz = sz.groupby(bucket).last().reindex(buckets).ffill()
+        vwap = (px * sz).groupby(bucket).sum() / sz.groupby(bucket).sum()
+        out[f"{side}_px"] = last_px.to_numpy()
+        out[f"{side}_sz"] = last_sz.to_numpy()
+        out[f"{side}_vwap"] = vwap.reindex(buckets).fillna(last_px).to_numpy()
+
+        # Each book state is live until the next update or the end of the last bar
+        grid = np.union1d(ts, buckets * bar)
+        grid = np.append(grid[grid >= ts[0]], (buckets[-1] + 1) * bar)
+        state = sz.set_index(ts).groupby(level=0).last().reindex(grid[:-1], method="ffill")
+        weighted = state.mul(np.diff(grid), axis=0).groupby(grid[:-1] // bar).sum()
+        covered = np.full(buckets.size, float(bar))
+        covered[0] -= ts[0] - buckets[0] * bar
+        out[f"{side}_twa"] = weighted.reindex(buckets).to_numpy() / covered[:, None]
+    return out
+
+
+@pytest.fixture(scope="module")
+def frame():
+    return SyntheticProvider().mbp_frame(2_000, depth=DEPTH, seed=3)
+
+
+@pytest.mark.parametrize("bar", ["500us", "10ms", "1s"])
+def test_bars_match_pandas(frame, bar):
+    bars = aggregate_orderbook(frame, bar, depth=DEPTH)
+    expected = reference_bars(frame, bar)
+    np.testing.assert_array_equal(bars.times, expected["times"])
+    np.testing.assert_array_equal(bars.counts, expected["counts"])
+    for field, values in expected.items():
+        np.testing.assert_allclose(getattr(bars, field), values, rtol=1e-12, err_msg=field)
+
+
+@pytest.mark.parametrize("chunk", [1, 37, 500])
+def test_streamed_batches_match_one_frame(frame, chunk):
+    whole = aggregate_orderbook(frame, "10ms", depth=DEPTH)
+    batches = list(iter_bars((frame.iloc[i:i + chunk] for i in range(0, len(frame), chunk)), "10ms", depth=DEPTH))
+    streamed = concat_bars(batches, depth=DEPTH)
+    assert np.all(np.diff(streamed.times) == bar_ns("10ms"))
+    for field in whole._fields:
+        np.testing.assert_allclose(getattr(streamed, field), getattr(whole, field), rtol=1e-12, err_msg=field)
+
+
+def test_canyon_layout(frame):
+    apx, bpx, avc, bvc, times = aggregate_orderbook(frame, "1s", depth=DEPTH).canyon()
+    assert apx.shape == bpx.shape == avc.shape == bvc.shape == times.shape
+    assert np.all(np.diff(avc, axis=1) >= 0) and np.all(np.diff(bvc, axis=1) >= 0)
+    assert np.all(times[:, 0] % bar_ns("1s") == 0)
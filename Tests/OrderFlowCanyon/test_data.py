@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from Common.providers import SyntheticProvider
+from OrderFlowCanyon.data import collect_chunks, get_data, stream_data
+from OrderFlowCanyon.utils import create_orderbook
+
+ROWS = 500
+
+
+def write_dbn(frame, path, depth=10):
+    """Writes an MBP frame as a DBN file, the way Databento ships one."""
+    import databento_dbn as dbn
+
+    ts = frame.index.as_unit("ns").asi8
+    metadata = dbn.Metadata("XNAS.ITCH", int(ts[0]), dbn.SType.RAW_SYMBOL, dbn.SType.INSTRUMENT_ID,
+                            dbn.Schema.MBP_10, symbols=["TEST"], end=int(ts[-1]) + 1)
+    columns = {c: frame[c].to_numpy() for c in frame.columns if c != "ts_event"}
+    price = lambda c, i: int(round(columns[c][i] * 1e9))
+    out = bytearray(bytes(metadata))
+    for i, t in enumerate(ts):
+        levels = [dbn.BidAskPair(bid_px=price(f"bid_px_{l:02d}", i), ask_px=price(f"ask_px_{l:02d}", i),
+                                 bid_sz=int(columns[f"bid_sz_{l:02d}"][i]), ask_sz=int(columns[f"ask_sz_{l:02d}"][i]))
+                  for l in range(depth)]
+        out += bytes(dbn.MBP10Msg(1, 1, int(t), levels[0].ask_px, 1, dbn.Action.ADD, dbn.Side.ASK, 0, int(t),
+                                  levels=levels))
+    path.write_bytes(bytes(out))
+    return path
+
+
+@pytest.fixture(scope="module")
+def dbn_file(tmp_path_factory):
+    pytest.importorskip("databento")
+    return write_dbn(SyntheticProvider().mbp_frame(ROWS), tmp_path_factory.mktemp("dbn") / "mbp10.dbn")
+
+
+@pytest.fixture(scope="module")
+def whole(dbn_file):
+    import databento as db
+
+    return db.DBNStore.from_file(dbn_file).to_df()
+
+
+@pytest.mark.parametrize("chunk_size, stride", [(64, 7), (100, 10), (ROWS, 1), (1, 3)])
+def test_streamed_file_matches_one_pass(dbn_file, whole, chunk_size, stride):
+    chunks = list(stream_data(path=str(dbn_file), chunk_size=chunk_size, stride=stride))
+    assert len(chunks) == min(-(-ROWS // chunk_size), -(-ROWS // stride))
+    for streamed, expected in zip(collect_chunks(chunks), create_orderbook(whole, stride=stride)):
+        np.testing.assert_array_equal(streamed, expected)
+
+
+def test_get_data_reads_the_file(dbn_file, whole):
+    for got, expected in zip(get_data(path=str(dbn_file)), create_orderbook(whole)):
+        np.testing.assert_array_equal(got, expected)
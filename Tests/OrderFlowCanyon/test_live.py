@@ -0,0 +1,152 @@
+import json
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from Common.providers import SyntheticProvider
+from OrderFlowCanyon.live import LiveCanyon, LiveFeed, paced
+
+
+class BlockedFeed:
+    """A feed that goes quiet after its first frame until closed, like Databento Live out of hours."""
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        yield self.frame
+        self.closed.wait()
+
+    def close(self):
+        self.closed.set()
+
+
+def test_stop_ends_a_quiet_feed():
+    feed = BlockedFeed(SyntheticProvider().mbp_frame(200))
+    canyon = LiveCanyon(feed, capacity=100, stride=10).start()
+    canyon.wait(-1, timeout=5)
+
+    started = time.monotonic()
+    canyon.stop(timeout=5)
+    assert time.monotonic() - started < 2
+    assert feed.closed.is_set()
+    assert not canyon._thread.is_alive()
+    assert canyon.done
+
+
+def test_stop_interrupts_a_paced_gap():
+    frame = SyntheticProvider().mbp_frame(20)
+    # An hour's gap before the last update
+    frame["ts_event"] = frame["ts_event"].where(frame.index != frame.index[-1],
+                                                frame["ts_event"].iloc[-2] + pd.Timedelta(hours=1))
+    canyon = LiveCanyon(paced([frame], speed=1.0), capacity=100, stride=1).start()
+    canyon.wait(-1, timeout=5)
+
+    started = time.monotonic()
+    canyon.stop(timeout=5)
+    assert time.monotonic() - started < 2
+    assert not canyon._thread.is_alive()
+
+
+class QuietLive:
+    """Stands in for databento.Live: a few records, then nothing until terminated."""
+
+    def __init__(self, key):
+        import databento_dbn as dbn
+
+        level = dbn.BidAskPair(bid_px=int(99.5e9), ask_px=int(100.5e9), bid_sz=3, ask_sz=4)
+        self.records = [dbn.MBP10Msg(1, 1, 1_700_000_000 * 10**9 + i, level.ask_px, 1, dbn.Action.ADD,
+                                     dbn.Side.ASK, 0, 1_700_000_000 * 10**9 + i, levels=[level] * 10)
+                        for i in range(3)]
+        self.terminated = threading.Event()
+
+    def subscribe(self, **kwargs):
+        pass
+
+    def __iter__(self):
+        yield from self.records
+        self.terminated.wait()
+
+    def terminate(self):
+        self.terminated.set()
+
+
+def test_quiet_live_feed_flushes_partial_batches(monkeypatch):
+    databento = pytest.importorskip("databento")
+    monkeypatch.setattr(databento, "Live", QuietLive)
+    feed = LiveFeed("SPY", key="test", batch=1000, batch_seconds=0.05)
+    frames = iter(feed)
+    got = []
+    # Pulled on a thread so a feed that holds the batch back fails instead of hanging
+    reader = threading.Thread(target=lambda: got.append(next(frames)), daemon=True)
+    reader.start()
+    reader.join(timeout=1)
+    feed.close()
+    assert got, "a partial batch waited for the next record"
+    assert len(got[0]) == 3
+    assert got[0]["bid_px_00"].iloc[0] == 99.5
+    assert list(frames) == []
+
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(message)
+
+
+def test_bad_source_gets_a_done_frame():
+    import streaming
+
+    ws = FakeSocket()
+    streaming.serve(ws, {"ticker": "SPY", "source": "no-such-provider"})
+    assert len(ws.sent) == 1
+    message = json.loads(ws.sent[0])
+    assert message["done"] and "no-such-provider" in message["error"]
+
+
+def test_missing_replay_file_gets_a_done_frame(tmp_path, monkeypatch):
+    import pipelines
+    import streaming
+
+    monkeypatch.setattr(pipelines, "DBN_DIR", str(tmp_path))
+    ws = FakeSocket()
+    streaming.serve(ws, {"ticker": "SPY", "path": "missing.dbn"})
+    assert json.loads(ws.sent[0])["done"]
+    assert json.loads(ws.sent[0])["error"]
+
+
+def test_replay_path_stays_in_the_dbn_directory(tmp_path, monkeypatch):
+    import pipelines
+    import streaming
+
+    secret = tmp_path / "secret.dbn"
+    secret.write_bytes(b"")
+    monkeypatch.setattr(pipelines, "DBN_DIR", None)
+    ws = FakeSocket()
+    streaming.serve(ws, {"ticker": "SPY", "path": str(secret)})
+    assert "COMPUTE_DBN_DIR" in json.loads(ws.sent[0])["error"]
+
+    (tmp_path / "dbn").mkdir()
+    monkeypatch.setattr(pipelines, "DBN_DIR", str(tmp_path / "dbn"))
+    for path in (str(secret), "../secret.dbn"):
+        ws = FakeSocket()
+        streaming.serve(ws, {"ticker": "SPY", "path": path})
+        assert "inside COMPUTE_DBN_DIR" in json.loads(ws.sent[0])["error"]
+
+
+def test_replay_streams_to_the_end():
+    import streaming
+
+    ws = FakeSocket()
+    streaming.serve(ws, {"ticker": "SPY", "source": "synthetic", "speed": 0, "format": "json", "fps": 60,
+                         "capacity": 50_000})
+    frames = [json.loads(m) for m in ws.sent]
+    assert frames[-1] == {"done": True, "error": None}
+    rows = [f for f in frames if "start" in f]
+    assert rows and rows[0]["start"] == 0
+    assert all(a["end"] == b["start"] for a, b in zip(rows, rows[1:]))
@@ -0,0 +1,108 @@
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from YieldCurve.curve import (COUPON_FREQUENCY, TermStructure, bootstrap_discount_factors, fit_nelson_siegel,
+                              fit_svensson, nelson_siegel_loadings, svensson_loadings)
+
+MONTHS = np.array([3, 60, 120, 360])
+DATES = pd.date_range("2025-01-02", periods=3, freq="B")
+
+
+def flat(pct, months=MONTHS):
+    return np.full((DATES.size, months.size), pct)
+
+
+@pytest.mark.parametrize("method", ["spline", "nelson_siegel"])
+def test_flat_par_curve(method):
+    curve = TermStructure(MONTHS, DATES, flat(5.0), method=method)
+    t = np.array([0.1, 0.5, 2.0, 7.3, 30.0])
+    # Semiannual 5% par bonds: D_n = 1.025^-n, so the zero rate is 2 ln(1.025)
+    np.testing.assert_allclose(curve.zero_rates(t), 2 * np.log(1.025), rtol=1e-9)
+    assert 2 * np.log(1.025) == pytest.approx(0.04939, abs=1e-5)
+    np.testing.assert_allclose(curve.forward_rates(t), 2 * np.log(1.025), rtol=1e-9)
+    np.testing.assert_allclose(curve.discount_factors(np.array([1.0, 10.0])), [[1.025**-2, 1.025**-20]] * 3)
+
+
+def test_bootstrap_reprices_par_bonds():
+    grid = np.arange(1, 61) / COUPON_FREQUENCY
+    par = 0.03 + 0.02 * (1 - np.exp(-grid / 4.0)) + np.array([[0.0], [0.005]])
+    discount = bootstrap_discount_factors(grid, par)
+    for n in (0, 9, 59):
+        coupon = par[:, n] / COUPON_FREQUENCY
+        np.testing.assert_allclose(coupon * discount[:, :n + 1].sum(axis=1) + discount[:, n], 1.0, rtol=1e-12)
+    assert np.all(np.diff(discount, axis=1) < 0)
+
+
+def test_spline_passes_through_the_tenors():
+    z = np.array([[4.3, 4.0, 4.2, 4.5], [4.4, 4.1, 4.3, 4.6], [np.nan, 4.1, 4.3, 4.6]])
+    curve = TermStructure(MONTHS, DATES, z)
+    np.testing.assert_allclose(curve.par_yields(MONTHS / 12.0)[:2], z[:2] / 100.0, rtol=1e-12)
+    # A date missing a tenor stays NaN rather than poisoning the fit
+    assert np.isnan(curve.zero_rates(np.array([1.0, 5.0]))[2]).all()
+    months, zeros = curve.dense(50)
+    assert months[0] == 3 and months[-1] == 360 and zeros.shape == (3, 50)
+
+
+def test_nelson_siegel_recovers_its_factors():
+    betas, tau = np.array([0.045, -0.01, 0.02]), 2.25
+    maturities = np.array([0.25, 1.0, 2.0, 5.0, 10.0, 30.0])
+    yields = nelson_siegel_loadings(maturities, tau) @ betas
+    fitted, taus = fit_nelson_siegel(maturities, np.vstack([yields, np.full(6, np.nan)]))
+    np.testing.assert_allclose(fitted[0], betas, atol=1e-10)
+    assert taus[0] == pytest.approx(tau)
+    assert np.isnan(fitted[1]).all()
+
+
+def test_svensson_needs_five_tenors():
+    with pytest.raises(ValueError, match="at least 5 tenors"):
+        TermStructure(MONTHS, DATES, flat(4.0), method="svensson")
+
+    betas = np.array([0.045, -0.01, 0.02, -0.01])
+    taus = np.linspace(0.25, 15.0, 20)[[2, 10]]
+    maturities = np.array([0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0])
+    yields = svensson_loadings(maturities, *taus) @ betas
+    fitted, fitted_taus = fit_svensson(maturities, yields[None, :])
+    np.testing.assert_allclose(svensson_loadings(maturities, *fitted_taus[0]) @ fitted[0], yields, atol=1e-10)
+
+
+def test_risk_free_rates_from_the_curve():
+    from Common.providers import SyntheticProvider, use_provider
+    from IVSurface.DataSourcing import get_risk_free_rates
+
+    with use_provider(SyntheticProvider()):
+        rates = get_risk_free_rates(np.array([[0.1, 0.5], [1.0, 2.0]]))
+    assert rates.shape == (2, 2)
+    assert np.all((rates > 0.03) & (rates < 0.06))
+
+
+def test_risk_free_rates_fall_back_with_a_warning(monkeypatch, caplog):
+    from IVSurface import DataSourcing
+
+    def no_data(start, end):
+        raise ValueError("No yield data available.")
+
+    monkeypatch.setattr(DataSourcing, "get_yield_data", no_data)
+    monkeypatch.setattr(DataSourcing, "get_risk_free_rate", lambda: 0.042)
+    with caplog.at_level(logging.WARNING, logger="IVSurface.DataSourcing"):
+        rates = DataSourcing.get_risk_free_rates(np.array([0.25, 1.0]))
+    np.testing.assert_array_equal(rates, 0.042)
+    assert "No yield data" in caplog.text
+
+    # No day with every tenor
+    monkeypatch.setattr(DataSourcing, "get_yield_data", lambda start, end: (MONTHS, DATES, flat(np.nan)))
+    np.testing.assert_array_equal(DataSourcing.get_risk_free_rates(np.array([0.25])), 0.042)
+
+
+def test_risk_free_rate_bugs_propagate(monkeypatch):
+    from IVSurface import DataSourcing
+
+    def broken(*args, **kwargs):
+        raise TypeError("bug")
+
+    monkeypatch.setattr(DataSourcing, "get_yield_data", lambda start, end: (MONTHS, DATES, flat(4.0)))
+    monkeypatch.setattr(DataSourcing, "TermStructure", broken)
+    with pytest.raises(TypeError):
+        DataSourcing.get_risk_free_rates(np.array([0.25]))
@@ -0,0 +1,15 @@
+"""
+Shared test setup: the repository root and flask-compute on sys.path, every
+on-disk cache in a throwaway directory, and synthetic data instead of the
+network (also inherited by the compute service's worker processes).
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "flask-compute")]
+
+os.environ["STREETVIEW_CACHE_DIR"] = tempfile.mkdtemp(prefix="streetview-tests-")
+os.environ.setdefault("COMPUTE_SOURCE", "synthetic")
+os.environ.setdefault("COMPUTE_WORKERS", "1")
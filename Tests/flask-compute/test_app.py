@@ -0,0 +1,169 @@
+import pytest
+
+import app as compute_app
+from serialization import MIMETYPE
+
+SURFACE = {"pipeline": "iv_surface", "ticker": "TEST", "grid": 5, "source": "synthetic"}
+
+
+@pytest.fixture
+def client():
+    return compute_app.app.test_client()
+
+
+def negotiated(accept):
+    headers = {} if accept is None else {"Accept": accept}
+    with compute_app.app.test_request_context("/compute", method="POST", headers=headers):
+        return compute_app.wants_binary()
+
+
+@pytest.mark.parametrize("accept", [
+    None,
+    "*/*",
+    "text/html,application/xhtml+xml,*/*;q=0.8",
+    "application/*",
+    "application/json",
+    f"application/json, {MIMETYPE};q=0.5",
+    f"{MIMETYPE};q=0",
+])
+def test_json_unless_binary_is_asked_for(accept):
+    assert not negotiated(accept)
+
+
+@pytest.mark.parametrize("accept", [
+    MIMETYPE,
+    "application/octet-stream",
+    f"{MIMETYPE}, application/json;q=0.5",
+    f"{MIMETYPE}, */*;q=0.1",
+])
+def test_binary_when_listed_explicitly(accept):
+    assert negotiated(accept)
+
+
+@pytest.mark.parametrize("quantize", ["abc", 12, [8]])
+def test_bad_quantize_is_a_400(client, quantize):
+    response = client.post("/compute", json={"parameters": {**SURFACE, "quantize": quantize}},
+                           headers={"Accept": MIMETYPE})
+    assert response.status_code == 400
+    assert "quantize" in response.get_json()["error"]
+
+
+def test_etag_revalidation(client, monkeypatch):
+    first = client.post("/compute", json={"parameters": SURFACE})
+    assert first.status_code == 200
+    etag = first.headers["ETag"].strip('"')
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    def recompute(*args, **kwargs):
+        raise AssertionError("a current ETag must not recompute")
+
+    monkeypatch.setattr(compute_app, "perform_computation", recompute)
+    again = client.post("/compute", json={"parameters": SURFACE}, headers={"If-None-Match": f'"{etag}"'})
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.headers["ETag"].strip('"') == etag
+
+    # Tags come from (parameters, data version, representation) alone, so they
+    # still match once the result itself has been evicted
+    monkeypatch.setattr(compute_app, "results", compute_app.ResultCache())
+    assert client.post("/compute", json={"parameters": SURFACE},
+                       headers={"If-None-Match": f'"{etag}"'}).status_code == 304
+
+
+def test_etag_changes_with_representation_and_data(client, monkeypatch):
+    plain = client.post("/compute", json={"parameters": SURFACE})
+    binary = client.post("/compute", json={"parameters": SURFACE}, headers={"Accept": MIMETYPE})
+    assert binary.status_code == 200 and binary.mimetype == MIMETYPE
+    assert binary.headers["ETag"] != plain.headers["ETag"]
+    # Held JSON tag, binary request: full body
+    response = client.post("/compute", json={"parameters": SURFACE},
+                           headers={"Accept": MIMETYPE, "If-None-Match": plain.headers["ETag"]})
+    assert response.status_code == 200 and response.data == binary.data
+
+    # New data behind the same parameters
+    version = compute_app.pipelines.data_version
+    monkeypatch.setattr(compute_app.pipelines, "data_version", lambda p: f"{version(p)}:next")
+    fresh = client.post("/compute", json={"parameters": SURFACE}, headers={"If-None-Match": plain.headers["ETag"]})
+    assert fresh.status_code == 200
+    assert fresh.headers["ETag"] != plain.headers["ETag"]
+
+
+def test_dbn_paths_resolve_inside_the_directory(tmp_path, monkeypatch):
+    import pipelines
+
+    root = tmp_path / "dbn"
+    (root / "day").mkdir(parents=True)
+    (tmp_path / "outside.dbn").write_bytes(b"")
+    (root / "link.dbn").symlink_to(tmp_path / "outside.dbn")
+    monkeypatch.setattr(pipelines, "DBN_DIR", str(root))
+
+    assert pipelines.dbn_path("day/session.dbn") == str((root / "day" / "session.dbn").resolve())
+    assert pipelines.dbn_path(str(root / "a.dbn")) == str((root / "a.dbn").resolve())
+    for path in ("../outside.dbn", "day/../../outside.dbn", str(tmp_path / "outside.dbn"), "/etc/passwd", "link.dbn"):
+        with pytest.raises(ValueError, match="inside COMPUTE_DBN_DIR"):
+            pipelines.dbn_path(path)
+
+    monkeypatch.setattr(pipelines, "DBN_DIR", None)
+    with pytest.raises(ValueError, match="COMPUTE_DBN_DIR"):
+        pipelines.dbn_path("day/session.dbn")
+
+
+@pytest.mark.parametrize("path", ["/etc/passwd", "../../etc/passwd"])
+def test_compute_rejects_paths_outside_the_dbn_directory(client, monkeypatch, tmp_path, path):
+    import pipelines
+
+    monkeypatch.setattr(pipelines, "DBN_DIR", str(tmp_path))
+    response = client.post("/compute", json={"parameters": {"pipeline": "orderflow_canyon", "path": path}})
+    assert response.status_code == 400
+    assert "COMPUTE_DBN_DIR" in response.get_json()["error"]
+
+
+@pytest.fixture
+def recording(monkeypatch):
+    """Metrics on, with empty totals and results, restored after the test."""
+    from Common import metrics
+
+    monkeypatch.setattr(metrics, "_enabled", True)
+    monkeypatch.setattr(metrics, "_memory", False)
+    monkeypatch.setattr(metrics, "_totals", metrics._empty())
+    monkeypatch.setattr(compute_app, "results", compute_app.ResultCache())
+    return metrics
+
+
+def test_server_timing_breaks_down_the_computation(client, recording):
+    parameters = {**SURFACE, "grid": 6}
+    computed = client.post("/compute", json={"parameters": parameters})
+    assert computed.status_code == 200
+    entries = [entry.strip() for entry in computed.headers["Server-Timing"].split(",")]
+    names = [entry.split(";")[0] for entry in entries]
+    assert "serialize" in names and len(names) > 1
+    assert all(";dur=" in entry for entry in entries)
+
+    # The body rendered for the first request is reused as is
+    cached = client.post("/compute", json={"parameters": parameters})
+    assert cached.headers["Server-Timing"] == 'cache;desc="hit"'
+    binary = client.post("/compute", json={"parameters": parameters}, headers={"Accept": MIMETYPE})
+    assert binary.headers["Server-Timing"].startswith('cache;desc="hit", serialize;dur=')
+
+    recording.disable()
+    assert "Server-Timing" not in client.post("/compute", json={"parameters": parameters}).headers
+
+
+def test_server_timing_value():
+    report = {"spans": {"iv.solve": {"seconds": 0.01234}, "fit": {"seconds": 2.0}}, "counters": {}}
+    assert compute_app.server_timing(report) == "iv.solve;dur=12.3, fit;dur=2000.0"
+
+
+def test_metrics_endpoint(client, recording):
+    recording.merge({"spans": {"iv.solve": {"calls": 2, "seconds": 1.5, "max_seconds": 1.0}},
+                     "counters": {"iv.contracts": 40}})
+
+    text = client.get("/metrics")
+    assert text.status_code == 200
+    assert text.mimetype == "text/plain"
+    assert 'streetview_span_calls_total{span="iv.solve"} 2' in text.get_data(as_text=True).splitlines()
+
+    snap = client.get("/metrics?format=json").get_json()
+    assert snap["enabled"]
+    assert snap["spans"]["iv.solve"]["calls"] == 2
+    assert snap["counters"] == {"iv.contracts": 40}
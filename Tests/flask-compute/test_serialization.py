@@ -0,0 +1,68 @@
+import json
+
+import numpy as np
+import pytest
+
+from serialization import decode, encode, to_json
+
+
+def sample():
+    rng = np.random.default_rng(0)
+    iv = rng.uniform(0.1, 0.9, (12, 30))
+    iv[3, 4] = np.nan
+    return {
+        "ticker": "TEST",
+        "asof": "2025-01-02",
+        "spot": np.float64(101.25),
+        "tte": np.linspace(0.02, 2.0, 12),
+        "iv": iv,
+        "counts": np.arange(12, dtype=np.int64),
+        "mask": iv > 0.5,
+        "points": {"k": rng.normal(size=7), "strike": np.arange(7, dtype=np.int32)},
+        "empty": np.empty((0, 3)),
+    }
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_round_trip(compress):
+    result = sample()
+    out = decode(encode(result, compress=compress))
+    assert out["ticker"] == "TEST" and out["asof"] == "2025-01-02" and out["spot"] == 101.25
+    np.testing.assert_array_equal(out["iv"], result["iv"].astype(np.float32))
+    np.testing.assert_array_equal(out["counts"], result["counts"])
+    np.testing.assert_array_equal(out["mask"], result["mask"])
+    np.testing.assert_array_equal(out["points.k"], result["points"]["k"].astype(np.float32))
+    np.testing.assert_array_equal(out["points.strike"], result["points"]["strike"])
+    assert out["empty"].shape == (0, 3)
+    assert out["iv"].dtype == np.float32 and out["counts"].dtype == np.int64
+
+
+@pytest.mark.parametrize("bits", [8, 16])
+def test_quantized_round_trip(bits):
+    result = sample()
+    out = decode(encode(result, quantize=bits))
+    iv = result["iv"]
+    step = (np.nanmax(iv) - np.nanmin(iv)) / (2 ** bits - 2)
+    assert np.isnan(out["iv"][3, 4])
+    np.testing.assert_allclose(out["iv"], iv, rtol=0, atol=step / 2 + 1e-12)
+    assert out["iv"].shape == iv.shape
+    # Integers are never quantized
+    np.testing.assert_array_equal(out["counts"], result["counts"])
+
+
+def test_quantized_degenerate_fields():
+    out = decode(encode({"flat": np.full(5, 0.3), "gone": np.full(4, np.nan)}, quantize=8))
+    np.testing.assert_allclose(out["flat"], 0.3)
+    assert np.isnan(out["gone"]).all()
+
+
+def test_binary_is_smaller_than_json():
+    result = sample()
+    assert len(encode(result, quantize=8)) < len(encode(result)) < len(json.dumps(to_json(result)))
+
+
+def test_rejects_bad_input():
+    with pytest.raises(ValueError):
+        encode(sample(), quantize=12)
+    with pytest.raises(ValueError):
+        decode(b"{}" + bytes(10))
@@ -0,0 +1 @@
+"""Treasury yield history and term structure fitting."""
@@ -0,0 +1,194 @@
+"""
+Full-tenor Treasury curves from the handful of index yields in data.py.
+
+Every fit works on the whole (dates x tenors) yield matrix at once:
+  - "spline": natural cubic spline, one banded solve with a column per date
+  - "nelson_siegel" / "svensson": linear least squares on a grid of decay
+    parameters; the design matrices only depend on the tenors, so each grid
+    point is a single pseudo-inverse applied to every date, and each date
+    keeps the grid point with the smallest residual
+
+The fitted curve is treated as a par curve (the Yahoo indices are bond-
+equivalent yields) and bootstrapped into discount factors on a semiannual
+coupon grid, from which zero and forward rates follow.
+
+Maturities are in years and yields in decimal unless noted otherwise.
+"""
+import numpy as np
+
+COUPON_FREQUENCY = 2
+NS_TAUS = np.linspace(0.25, 10.0, 40)
+NSS_TAUS = np.linspace(0.25, 15.0, 20)
+
+
+#Nelson–Siegel(–Svensson) factor loadings
+def _slope_curvature(t, tau):
+  x = t / tau
+  slope = np.where(x > 1e-8, (1.0 - np.exp(-x)) / np.where(x > 1e-8, x, 1.0), 1.0 - 0.5 * x)
+  return slope, slope - np.exp(-x)
+
+
+def nelson_siegel_loadings(t, tau):
+  """(len(t), 3) design matrix for level, slope and curvature; t and tau broadcast."""
+  slope, curvature = _slope_curvature(np.asarray(t, dtype=float), tau)
+  return np.stack([np.ones_like(slope), slope, curvature], axis=-1)
+
+
+def svensson_loadings(t, tau1, tau2):
+  """(len(t), 4) design matrix: Nelson-Siegel plus a second curvature hump."""
+  _, curvature2 = _slope_curvature(np.asarray(t, dtype=float), tau2)
+  base = nelson_siegel_loadings(t, tau1)
+  curvature2 = np.broadcast_to(curvature2, base.shape[:-1])
+  return np.concatenate([base, curvature2[..., None]], axis=-1)
+
+
+def _grid_least_squares(designs, yields):
+  """
+  designs: (n_grid, n_tenors, n_factors) loadings, one per decay grid point
+  yields: (n_dates, n_tenors)
+  Returns (betas (n_dates, n_factors), best grid index per date).
+  """
+  pinv = np.linalg.pinv(designs)                             # (n_grid, f, m)
+  betas = np.einsum("gfm,dm->gdf", pinv, yields)             # (n_grid, dates, f)
+  resid = np.einsum("gmf,gdf->gdm", designs, betas) - yields
+  best = np.argmin(np.einsum("gdm,gdm->gd", resid, resid), axis=0)
+  return betas[best, np.arange(yields.shape[0])], best
+
+
+def fit_nelson_siegel(maturities, yields, taus=NS_TAUS):
+  """
+  maturities: (n_tenors,) years
+  yields: (n_dates, n_tenors)
+  Returns (betas (n_dates, 3), tau (n_dates,)). Dates with missing tenors are NaN.
+  """
+  maturities = np.asarray(maturities, dtype=float)
+  yields = np.atleast_2d(np.asarray(yields, dtype=float))
+  complete = ~np.isnan(yields).any(axis=1)
+
+  designs = np.stack([nelson_siegel_loadings(maturities, tau) for tau in taus])
+  betas = np.full((yields.shape[0], 3), np.nan)
+  tau = np.full(yields.shape[0], np.nan)
+  if complete.any():
+    betas[complete], best = _grid_least_squares(designs, yields[complete])
+    tau[complete] = np.asarray(taus)[best]
+  return betas, tau
+
+
+def fit_svensson(maturities, yields, taus=NSS_TAUS):
+  """
+  Nelson-Siegel-Svensson fit; needs more tenors than its 4 linear factors.
+  Returns (betas (n_dates, 4), taus (n_dates, 2)).
+  """
+  maturities = np.asarray(maturities, dtype=float)
+  if maturities.size <= 4:
+    raise ValueError("Svensson fits need at least 5 tenors; use 'spline' or 'nelson_siegel'.")
+  yields = np.atleast_2d(np.asarray(yields, dtype=float))
+  complete = ~np.isnan(yields).any(axis=1)
+
+  pairs = [(t1, t2) for t1 in taus for t2 in taus if t2 > t1]
+  designs = np.stack([svensson_loadings(maturities, t1, t2) for t1, t2 in pairs])
+  betas = np.full((yields.shape[0], 4), np.nan)
+  tau = np.full((yields.shape[0], 2), np.nan)
+  if complete.any():
+    betas[complete], best = _grid_least_squares(designs, yields[complete])
+    tau[complete] = np.asarray(pairs)[best]
+  return betas, tau
+
+
+#Term structure built from the fitted par curve
+class TermStructure:
+  """
+  maturities_months: (n_tenors,) as returned by data.get_yield_data (x)
+  dates: (n_dates,) observation dates (y)
+  yields_pct: (n_dates, n_tenors) par yields in percent (z)
+  method: "spline", "nelson_siegel" or "svensson"
+  """
+
+  def __init__(self, maturities_months, dates, yields_pct, method="spline"):
+    self.maturities = np.asarray(maturities_months, dtype=float) / 12.0
+    self.dates = dates
+    self.par = np.atleast_2d(np.asarray(yields_pct, dtype=float)) / 100.0
+    self.method = method
+
+    # Dates missing a tenor stay NaN rather than poisoning the fit
+    self.complete = ~np.isnan(self.par).any(axis=1)
+
+    if method == "spline":
+      from scipy.interpolate import CubicSpline
+      self._spline = CubicSpline(self.maturities, self.par[self.complete], axis=1, bc_type="natural")
+    elif method == "nelson_siegel":
+      self.betas, self.taus = fit_nelson_siegel(self.maturities, self.par)
+    elif method == "svensson":
+      self.betas, self.taus = fit_svensson(self.maturities, self.par)
+    else:
+      raise ValueError("method must be one of 'spline', 'nelson_siegel' or 'svensson'.")
+
+    # Bootstrap once on the coupon grid; everything else interpolates it
+    self.grid = np.arange(1, int(np.ceil(self.maturities.max() * COUPON_FREQUENCY)) + 1) / COUPON_FREQUENCY
+    self.grid_discount = bootstrap_discount_factors(self.grid, self.par_yields(self.grid))
+
+  def par_yields(self, t):
+    """Fitted par yields, (n_dates, len(t)). Flat beyond the observed tenors."""
+    t = np.clip(np.atleast_1d(np.asarray(t, dtype=float)), self.maturities.min(), self.maturities.max())
+    if self.method == "spline":
+      out = np.full((self.par.shape[0], t.size), np.nan)
+      out[self.complete] = self._spline(t)
+      return out
+
+    # Per-date decay parameters broadcast as (n_dates, 1) against t
+    if self.method == "nelson_siegel":
+      loadings = nelson_siegel_loadings(t[None, :], self.taus[:, None])
+    else:
+      loadings = svensson_loadings(t[None, :], self.taus[:, :1], self.taus[:, 1:])
+    return np.einsum("dtf,df->dt", loadings, self.betas)
+
+  def discount_factors(self, t):
+    """
+    Discount factors, (n_dates, len(t)). Log-linear between coupon dates
+    (piecewise-flat forwards), with a flat forward out to the first one.
+    """
+    t = np.atleast_1d(np.asarray(t, dtype=float))
+    log_df = np.log(self.grid_discount)
+    first = self.grid[0]
+
+    idx = np.clip(np.searchsorted(self.grid, t) - 1, 0, self.grid.size - 2)
+    w = np.clip((t - self.grid[idx]) / (self.grid[idx + 1] - self.grid[idx]), 0.0, None)
+    interp = log_df[:, idx] + w * (log_df[:, idx + 1] - log_df[:, idx])
+
+    short = np.log(self.grid_discount[:, :1]) * (t / first)
+    return np.exp(np.where(t < first, short, interp))
+
+  def zero_rates(self, t):
+    """Continuously-compounded zero rates, (n_dates, len(t))."""
+    t = np.maximum(np.atleast_1d(np.asarray(t, dtype=float)), 1e-6)
+    return -np.log(self.discount_factors(t)) / t
+
+  def forward_rates(self, t, tenor=0.25):
+    """Continuously-compounded forward rates from t to t + tenor, (n_dates, len(t))."""
+    t = np.atleast_1d(np.asarray(t, dtype=float))
+    d1 = self.discount_factors(t)
+    d2 = self.discount_factors(t + tenor)
+    return np.log(d1 / d2) / tenor
+
+  def dense(self, n_points=120):
+    """Zero curve on an evenly spaced maturity grid: (maturities in months, zeros in percent)."""
+    t = np.linspace(self.maturities.min(), self.maturities.max(), n_points)
+    return t * 12.0, self.zero_rates(t) * 100.0
+
+
+def bootstrap_discount_factors(grid, par):
+  """
+  grid: (n_coupons,) coupon dates 1/f, 2/f, ... in years
+  par: (n_dates, n_coupons) par yields at those dates
+  A par bond prices at 1: 1 = c/f * sum(D_1..D_n) + D_n, solved forward over
+  the coupon dates with every date's curve handled in the same step.
+  """
+  par = np.atleast_2d(par)
+  f = COUPON_FREQUENCY
+  discount = np.empty_like(par)
+  annuity = np.zeros(par.shape[0])
+  for n in range(grid.size):
+    c = par[:, n] / f
+    discount[:, n] = (1.0 - c * annuity) / (1.0 + c)
+    annuity += discount[:, n]
+  return discount
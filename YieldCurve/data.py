@@ -1,57 +1,51 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
 
+from Common import metrics
+from Common.cache import get_cache
+import Common.providers  # backs the cache schemas with the configured data provider
+
+
+# Yahoo index -> (label, maturity in months)
+TENORS = {
+  "^IRX": ("3-Month", 3),    # 13 Week T-Bill (proxy for 3-month)
+  "^FVX": ("5-Year", 60),    # 5-Year T-Note
+  "^TNX": ("10-Year", 120),  # 10-Year T-Note
+  "^TYX": ("30-Year", 360),  # 30-Year T-Bond
+}
+
+
 def get_yield_data(start_date, end_date):
-  tickers = {
-  "^IRX": "3-Month",  # 13 Week T-Bill (proxy for 3-month)
-  "^FVX": "5-Year",   # 5-Year T-Note
-  "^TNX": "10-Year",  # 10-Year T-Note
-  "^TYX": "30-Year",  # 30-Year T-Bond
-  }
-
-  # Step 2: Fetch data for the past 6 months
-  data = {}
-  for ticker, label in tickers.items():
-      try:
-          # Download the data and extract adjusted close prices
-          df = yf.download(ticker, start="2024-07-01", end="2025-01-01")
-          if not df.empty:  # Ensure the data is valid
-              data[label] = df["Close"]
-          else:
-              print(f"No data available for {label} ({ticker})")
-      except Exception as e:
-          print(f"Failed to download data for {label} ({ticker}): {e}")
-
-
-  #create a new dataframe called yield data and set the index to the date column
-  mat = 30
-  yield_data = pd.DataFrame(columns=['Date','Maturity','Yield'])
-  for k,v in data.items():
-      if k == "3-Month":
-          mat = 3
-      elif k == "5-Year":
-          mat = 60
-      elif k == "10-Year":
-          mat = 120
-      elif k == "30-Year":
-          mat = 360
-      for _,row in v.iterrows():
-          df2 = pd.DataFrame([[row.name,mat,row[0]]], columns=['Date','Maturity','Yield'])
-          yield_data = pd.concat([yield_data, df2])
-
-  yield_data.set_index('Date', inplace=True)
-  yield_data.index = pd.to_datetime(yield_data.index)
-
-  # Pivot the yield_data DataFrame for easier plotting
-  pivot_yield_data = yield_data.reset_index().pivot(index='Date', columns='Maturity', values='Yield')
-
-  # Ensure maturities are in the correct order
-  pivot_yield_data = pivot_yield_data[[3, 60, 120, 360]]  # Align with maturities in months
-
-  # Extract the z-axis (yield values), x-axis (maturities), and y-axis (dates)
-  z = pivot_yield_data.to_numpy()  # Yield values
-  x = np.array([3, 60, 120, 360])  # Maturities in months
-  y = pivot_yield_data.index  # Dates
-
-  return x,y,z
\ No newline at end of file
+  """
+  Yield surface for the requested date range.
+
+  All tenors are fetched in one batched request (through the shared
+  market data cache) and aligned on their common date index.
+  Returns:
+    - x: maturities in months, shape (4,)
+    - y: DatetimeIndex of observation dates
+    - z: yields in percent, shape (len(y), 4); NaN where a tenor has no print
+  """
+  start = pd.to_datetime(start_date).strftime("%Y-%m-%d")
+  end = pd.to_datetime(end_date).strftime("%Y-%m-%d")
+
+  with metrics.span("yield.fetch"):
+    close = get_cache().get("yield_history", tickers=list(TENORS), start=start, end=end)
+  if close is None:
+    raise ValueError(f"No yield data available between {start} and {end}.")
+
+  for ticker, (label, _) in TENORS.items():
+    if ticker not in close.columns:
+      print(f"No data available for {label} ({ticker})")
+
+  # Columns in maturity order; dates with no tenor at all are dropped
+  with metrics.span("yield.align"):
+    close = close.reindex(columns=list(TENORS)).dropna(how="all")
+
+    x = np.array([months for _, months in TENORS.values()])  # Maturities in months
+    y = pd.DatetimeIndex(close.index)  # Dates
+    z = close.to_numpy(dtype=float)  # Yield values
+  if metrics.enabled():
+    metrics.count("yield.dates", len(y))
+    metrics.count("yield.missing", int(np.isnan(z).sum()))
+  return x, y, z
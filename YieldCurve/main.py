@@ -1,34 +1,75 @@
+"""
+3D Treasury term structure plot.
+
+    python -m YieldCurve.main --start 2024-07-01 --end 2025-01-01
+
+load_curve() is the compute half; curve_figure() builds the plotly figure
+(plotly is imported on first use).
+"""
+import argparse
+
 import numpy as np
 import pandas as pd
-import plotly.graph_objects as go
-from data import get_yield_data
-
-START_DATE = pd.to_datetime('2024-07-01')
-END_DATE = pd.to_datetime("2025-01-01")
-
-x,y,z = get_yield_data(START_DATE, END_DATE)
-
-# Create the 3D grid for plotting
-x_grid, y_grid = np.meshgrid(x, y)
-
-# Generate the 3D plot
-fig = go.Figure(data=[go.Surface(
-    z=z,  # Use the direct yield matrix
-    x=x_grid,  # Maturities
-    y=y_grid,  # Dates
-    colorscale="Viridis",
-    colorbar=dict(title="Yield (%)"),
-)])
-
-# Update layout
-fig.update_layout(
-    title="3D Interest Rate Term Structure",
-    scene=dict(
-        xaxis=dict(title="Maturity (Months)"),
-        yaxis=dict(title="Date"),
-        zaxis=dict(title="Yield (%)"),
-    ),
-    margin=dict(l=0, r=0, b=0, t=50),
-)
-# Display the plot
-fig.show()
\ No newline at end of file
+
+from Common import metrics
+from .data import get_yield_data
+from .curve import TermStructure
+
+START_DATE = '2024-07-01'
+END_DATE = '2025-01-01'
+
+
+def load_curve(start=START_DATE, end=END_DATE, method="spline"):
+  """Maturities (months), dates and the dense zero-yield matrix (%) for the range."""
+  x, y, z = get_yield_data(pd.to_datetime(start), pd.to_datetime(end))
+  # Fill in the full maturity range from the four observed tenors
+  x, z = TermStructure(x, y, z, method=method).dense()
+  return x, y, z
+
+
+def curve_figure(x, y, z):
+  import plotly.graph_objects as go
+
+  with metrics.span("yield.plot"):
+    # Create the 3D grid for plotting
+    x_grid, y_grid = np.meshgrid(x, y)
+
+    # Generate the 3D plot
+    fig = go.Figure(data=[go.Surface(
+        z=z,  # Use the direct yield matrix
+        x=x_grid,  # Maturities
+        y=y_grid,  # Dates
+        colorscale="Viridis",
+        colorbar=dict(title="Zero Yield (%)"),
+    )])
+
+    # Update layout
+    fig.update_layout(
+        title="3D Interest Rate Term Structure",
+        scene=dict(
+            xaxis=dict(title="Maturity (Months)"),
+            yaxis=dict(title="Date"),
+            zaxis=dict(title="Yield (%)"),
+        ),
+        margin=dict(l=0, r=0, b=0, t=50),
+    )
+  return fig
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Plot the Treasury term structure over a date range.")
+  parser.add_argument("--start", default=START_DATE)
+  parser.add_argument("--end", default=END_DATE)
+  # Svensson needs more than the four tenors Yahoo publishes (see curve.fit_svensson)
+  parser.add_argument("--method", default="spline", choices=["spline", "nelson_siegel"])
+  args = parser.parse_args(argv)
+
+  fig = curve_figure(*load_curve(args.start, args.end, args.method))
+  if metrics.enabled():
+    print(metrics.summary())
+  # Display the plot
+  fig.show()
+
+
+if __name__ == "__main__":
+  main()
@@ -1,21 +1,280 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import pipelines
+from Common import metrics
+from results import DEFAULT_MAX_BYTES, ResultCache, make_etag
+from serialization import MIMETYPE, encode, to_json
+
+try:
+    from flask_sock import Sock
+except ImportError:  # /live is only served when flask-sock is installed
+    Sock = None
 
 app = Flask(__name__)
 
+MAX_WORKERS = int(os.environ.get("COMPUTE_WORKERS", os.cpu_count() or 2))
+REQUEST_TIMEOUT = float(os.environ.get("COMPUTE_TIMEOUT", 300))
+MAX_JOBS = 1024
+
+# Request options that change how a result is delivered, not what it is
+TRANSPORT_OPTIONS = {"wait", "quantize", "compress", "stale"}
+
+
+class Coalescer:
+    """
+    Runs computations on a process pool, sharing one in-flight future between
+    all concurrent requests for the same canonical parameters.
+    """
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._executor = None
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        # Created on first use so importing the app never spawns workers
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def submit(self, key, fn, *args, on_done=None):
+        """The in-flight future for key, else fn(*args) on the pool; on_done(future) runs once when a new one finishes."""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+            try:
+                future = self._pool().submit(fn, *args)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM); start a fresh pool and retry once
+                self._executor = None
+                future = self._pool().submit(fn, *args)
+            self._inflight[key] = future
+        # Outside the lock: a future that is already done runs the callback here
+        future.add_done_callback(lambda f, key=key: self._forget(key, f))
+        if on_done is not None:
+            future.add_done_callback(on_done)
+        return future
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+
+coalescer = Coalescer(MAX_WORKERS)
+results = ResultCache(int(os.environ.get("COMPUTE_CACHE_BYTES", DEFAULT_MAX_BYTES)))
+jobs = OrderedDict()
+jobs_lock = threading.Lock()
+
+
+def canonical_key(parameters):
+    """Stable identity of a request: its parameters minus transport options."""
+    return json.dumps({k: v for k, v in parameters.items() if k not in TRANSPORT_OPTIONS},
+                      sort_keys=True, default=str)
+
+
+def wants_binary():
+    """
+    Content negotiation: binary grids only for clients that list MIMETYPE or
+    application/octet-stream explicitly (q > 0) and rank it at least as high
+    as application/json. Wildcards such as */* (curl, fetch(), browsers) get
+    JSON, so existing clients never switch format.
+    """
+    quality = {}
+    for value, q in request.accept_mimetypes:
+        quality[value.lower()] = max(quality.get(value.lower(), 0), q)
+    binary = max(quality.get(MIMETYPE, 0), quality.get("application/octet-stream", 0))
+    return binary > 0 and binary >= quality.get("application/json", 0)
+
+
+def _quantize(parameters):
+    """The "quantize" option as None, 8 or 16; ValueError for anything else."""
+    quantize = parameters.get("quantize")
+    if quantize in (None, "", 0):
+        return None
+    try:
+        quantize = int(quantize)
+    except (TypeError, ValueError):
+        quantize = None
+    if quantize not in (8, 16):
+        raise ValueError(f"quantize must be 8 or 16, got {parameters.get('quantize')!r}.")
+    return quantize
+
+
+def representation(parameters):
+    """
+    (name, mimetype, render) of the body this request gets for a result.
+    Raises ValueError for an unsupported quantize option.
+    """
+    quantize = _quantize(parameters)
+    if wants_binary():
+        compress = bool(parameters.get("compress", True))
+        return (f"binary:{quantize}:{compress}", MIMETYPE,
+                lambda result: encode(result, quantize=quantize, compress=compress))
+    return "json", "application/json", lambda result: json.dumps(to_json(result)).encode()
+
+
+def server_timing(report):
+    """Server-Timing header value for a metrics report: one entry per span, durations in ms."""
+    return ", ".join(f"{name};dur={stats['seconds'] * 1000:.1f}" for name, stats in report["spans"].items())
+
+
+def cached_response(key, version, parameters, entry=None, stale=False, report=None):
+    """
+    The result for (key, version) with its ETag: 304 and no body when the
+    client already holds it (If-None-Match), else the cached body, rendered
+    once per representation. report: the computation's metrics, sent back as
+    a Server-Timing breakdown (with any serialization done here).
+    """
+    name, mimetype, render = representation(parameters)
+    etag = make_etag(key, version, name)
+    rendered = []
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        def timed_render():
+            start = time.perf_counter()
+            with metrics.span("serialize"):
+                body = render(entry.result)
+            rendered.append(time.perf_counter() - start)
+            return body
+
+        response = Response(results.body(key, entry, name, timed_render), mimetype=mimetype)
+    if metrics.enabled():
+        timings = [server_timing(report) if report else 'cache;desc="hit"']
+        timings += [f"serialize;dur={seconds * 1000:.1f}" for seconds in rendered]
+        response.headers["Server-Timing"] = ", ".join(t for t in timings if t)
+    response.set_etag(etag)
+    # Revalidate on every use; the body also depends on Accept
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["Vary"] = "Accept"
+    if stale:
+        response.headers["X-Result-Stale"] = "1"
+    return response
+
+
+def respond(future, parameters, key, version, started):
+    try:
+        computed_data, report = future.result(timeout=0)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"{type(e).__name__}: {e}"}), 500
+    entry = results.put(key, version, computed_data, started)
+    return cached_response(key, version, parameters, entry, report=report)
+
+
 @app.route('/compute', methods=['POST'])
 def compute():
     data = request.json
     parameters = data.get('parameters', {})
+    key = canonical_key(parameters)
+    try:
+        version = pipelines.data_version(parameters)
+        name, _, _ = representation(parameters)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Unchanged since the client's copy, or already computed
+    if request.if_none_match.contains(make_etag(key, version, name)):
+        return cached_response(key, version, parameters)
+    entry = results.get(key)
+    if entry is not None and entry.version == version:
+        return cached_response(key, version, parameters, entry)
+    if entry is not None and parameters.get("stale"):
+        # Stale-while-revalidate: the last result now, the new one computed
+        # in the background for the next request
+        perform_computation(parameters, key, version)
+        return cached_response(key, entry.version, parameters, entry, stale=True)
 
     # Perform your computation here
-    computed_data = perform_computation(parameters)
+    started = time.monotonic()
+    future = perform_computation(parameters, key, version, started)
+
+    if not parameters.get("wait", True):
+        job_id = uuid.uuid4().hex
+        with jobs_lock:
+            jobs[job_id] = (future, parameters, key, version, started)
+            while len(jobs) > MAX_JOBS:
+                jobs.popitem(last=False)
+        return jsonify({"job": job_id}), 202
+
+    try:
+        future.result(timeout=REQUEST_TIMEOUT)
+    except TimeoutError:
+        return jsonify({"error": "computation timed out"}), 504
+    except Exception:
+        pass  # reported by respond()
+    return respond(future, parameters, key, version, started)
+
+
+@app.route('/compute/<job_id>', methods=['GET'])
+def compute_job(job_id):
+    with jobs_lock:
+        job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "unknown job"}), 404
+    future = job[0]
+    if not future.done():
+        return jsonify({"job": job_id, "status": "running"}), 202
+    return respond(*job)
+
+
+def perform_computation(parameters, key, version, started=None):
+    """
+    Dispatches to the IV surface, yield curve or order-flow canyon pipeline
+    (parameters["pipeline"]) on the process pool. Concurrent requests with
+    the same parameters and data version share a single computation, whose
+    result is stored in the result cache when it finishes.
+    """
+    started = time.monotonic() if started is None else started
+
+    def store(f):
+        if not f.cancelled() and f.exception() is None:
+            result, report = f.result()
+            results.put(key, version, result, started)
+            metrics.merge(report)
+
+    return coalescer.submit(f"{key}|{version}", pipelines.run_instrumented, parameters,
+                            metrics.enabled(), metrics.tracing_memory(), on_done=store)
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """
+    Stage timings, counters and peak memory summed over every computation
+    this service has run (STREETVIEW_METRICS=1 to record them), in the
+    Prometheus text format, or as JSON with ?format=json.
+    """
+    if request.args.get("format") == "json":
+        return jsonify(metrics.snapshot())
+    return Response(metrics.prometheus(), mimetype="text/plain; version=0.0.4")
+
 
-    return jsonify(computed_data)
+if Sock is not None:
+    sock = Sock(app)
 
-def perform_computation(parameters):
-    # Read params for which computation is to be done
+    @sock.route('/live')
+    def live(ws):
+        """
+        Live order-flow canyon. The client sends one JSON message of
+        parameters (see streaming.serve) and then receives frames of new rows.
+        """
+        import streaming
+        streaming.serve(ws, json.loads(ws.receive()))
 
-    return 
 
 if __name__ == '__main__':
-    app.run(port=5000)
\ No newline at end of file
+    app.run(port=5000, threaded=True)
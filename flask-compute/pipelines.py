@@ -0,0 +1,345 @@
+"""
+Compute pipelines behind POST /compute.
+
+Each pipeline takes the request's parameters dict and returns a dict of
+NumPy arrays and plain values. run() is the process-pool entry point and
+selects the data source, one of Common.providers: "live" (yfinance/Databento
+through the shared cache), "synthetic" (alias "stub"; deterministic local
+data) or "replay" (a recorded session in STREETVIEW_REPLAY_DIR).
+"""
+import json
+import os
+import sys
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from Common import metrics
+from Common.lod import DEFAULT_BUDGET, Pyramid, cached_pyramid
+from Common.providers import get_provider, provider_from_name, use_provider
+from IVSurface.BSMCompute import GREEKS
+from IVSurface.DataSourcing import get_risk_free_rates
+from IVSurface.store import SurfaceStore, default_store
+from IVSurface.surface import fit_surface
+from YieldCurve.data import get_yield_data
+from YieldCurve.curve import TermStructure
+from OrderFlowCanyon.analytics import METRICS as BOOK_METRICS, book_analytics
+from OrderFlowCanyon.data import canyon_layers, canyon_pyramid, canyon_window, get_data
+
+DEFAULT_SOURCE = os.environ.get("COMPUTE_SOURCE", "live")
+# Directory "path" parameters are read from; unset, requests cannot name DBN files
+DBN_DIR = os.environ.get("COMPUTE_DBN_DIR")
+
+
+def _pyramid_key(name, parameters, data_parameters):
+    """Identity of the full-resolution data behind a level-of-detail request."""
+    data = {k: parameters.get(k) for k in data_parameters}
+    data["source"] = parameters.get("source", DEFAULT_SOURCE)
+    return name, json.dumps(data, sort_keys=True, default=str)
+
+
+def _bounds(window):
+    """[lo, hi] (either may be null) -> (lo, hi)."""
+    return tuple(window) if window else (None, None)
+
+
+def dbn_path(path):
+    """
+    A request's DBN file, resolved inside DBN_DIR. Relative names are taken
+    from DBN_DIR; ".." and symlinks are resolved before the check, so a
+    client cannot reach any other file on the server. Raises ValueError.
+    """
+    if not DBN_DIR:
+        raise ValueError("path is disabled; set COMPUTE_DBN_DIR to serve DBN files.")
+    root = os.path.realpath(DBN_DIR)
+    resolved = os.path.realpath(os.path.join(root, str(path)))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"path must be inside COMPUTE_DBN_DIR: {path}.")
+    return resolved
+
+
+def _ns(value):
+    """Timestamp (ns since epoch, or anything pd.Timestamp parses as UTC) -> int ns."""
+    if value is None or isinstance(value, (int, np.integer)):
+        return value
+    ts = pd.Timestamp(value)
+    return (ts.tz_localize("UTC") if ts.tz is None else ts).value
+
+
+def iv_surface(parameters):
+    """
+    parameters: ticker, grid (points per axis, default 100), method ("svi", "spline"),
+                side ("both"; "otm" solves only the OTM side of each strike,
+                with log_moneyness ln(K/F) against each expiry's put-call
+                parity forward), greeks (true for every Greek on the grid,
+                or a list of names), window ({"log_moneyness": [lo, hi],
+                "tte": [lo, hi]}, default the quoted range)
+    Calls and puts from one chain download, fitted per expiry and evaluated
+    on a (log-moneyness, time-to-expiry) grid. Fits are cached, so a new grid
+    resolution or zoom window only re-evaluates the surface; the fit is
+    continuous, so a zoom needs no level-of-detail pyramid, just `grid` points
+    across the window.
+    """
+    ticker = parameters.get("ticker", "NVDA")
+    n = int(parameters.get("grid", 100))
+    greeks = parameters.get("greeks")
+
+    surface = fit_surface(ticker, method=parameters.get("method", "svi"), side=parameters.get("side", "both"))
+    quotes = surface.quotes
+    window = parameters.get("window") or {}
+    k_lo, k_hi = _bounds(window.get("log_moneyness"))
+    t_lo, t_hi = _bounds(window.get("tte"))
+    grid_k = np.linspace(quotes["k"].min() if k_lo is None else k_lo, quotes["k"].max() if k_hi is None else k_hi, n)
+    grid_tte = np.linspace(quotes["T"].min() if t_lo is None else t_lo, quotes["T"].max() if t_hi is None else t_hi, n)
+
+    with metrics.span("iv.evaluate"):
+        iv = surface.grid(grid_k, grid_tte)
+    result = {
+        "ticker": ticker,
+        "log_moneyness": grid_k,
+        "tte": grid_tte,
+        "iv": iv,
+        "points": {"iv": quotes["iv"], "log_moneyness": quotes["k"], "tte": quotes["T"]},
+    }
+    if greeks:
+        # Calls' Greeks; puts follow from put-call parity. Priced at the spot
+        # the surface was fitted at, which its log-moneyness is relative to
+        S = surface.spot
+        if S is None:
+            raise ValueError(f"The fitted surface for {ticker} has no spot price.")
+        names = GREEKS if greeks is True else greeks
+        rates = get_risk_free_rates(grid_tte)
+        with metrics.span("iv.greeks"):
+            result["greeks"] = surface.greeks_grid(S, grid_k, grid_tte, rates, True, names)
+    return result
+
+
+def _history_store(parameters):
+    """parameters["store"] (a directory), else the shared history for parameters["side"]."""
+    return SurfaceStore(parameters["store"]) if parameters.get("store") else default_store(parameters.get("side", "both"))
+
+
+def iv_history(parameters):
+    """
+    parameters: ticker, start, end, tenor (days, default 30), log_moneyness
+                (default 0, at the money), side ("both" or "otm": which
+                shared surface history, see iv_surface), store (directory,
+                instead of the shared history)
+    Stored surfaces (see IVSurface/store.py) over a date range: the implied
+    vol at one tenor and moneyness through time, plus the term structure at
+    that moneyness on each date. Read from memory maps; nothing is refitted.
+    "moneyness" says whether log_moneyness is ln(K/S) ("spot") or ln(K/F)
+    ("forward").
+    """
+    ticker = parameters.get("ticker", "NVDA")
+    store = _history_store(parameters)
+    k = float(parameters.get("log_moneyness", 0.0))
+    start, end = parameters.get("start"), parameters.get("end")
+    try:
+        times, vols = store.series(ticker, float(parameters.get("tenor", 30)), k, start, end)
+        _, tenors, term = store.term_structure(ticker, k, start, end)
+        moneyness = store.moneyness(ticker)
+    except KeyError as e:
+        raise ValueError(str(e.args[0])) from None
+    return {
+        "ticker": ticker,
+        "moneyness": moneyness,
+        "times": times,
+        "iv": vols,
+        "tenor_days": tenors,
+        "term_structure": term,
+    }
+
+
+def _zero_curves(parameters):
+    x, y, z = get_yield_data(parameters.get("start", "2024-07-01"), parameters.get("end", "2025-01-01"))
+    with metrics.span("yield.curve"):
+        curve = TermStructure(x, y, z, method=parameters.get("method", "spline"))
+        maturities, zeros = curve.dense(int(parameters.get("points", 120)))
+    return x, y, z, maturities, zeros
+
+
+def yield_curve(parameters):
+    """
+    parameters: start, end, method ("spline", "nelson_siegel"), points,
+                budget (most dates and maturities returned: an int or
+                [dates, maturities]), window ({"dates": [lo, hi],
+                "maturities": [lo, hi]}, in dates and months)
+    Dense zero curve for every date in the range. With a budget or window the
+    curve is served from a level-of-detail pyramid of block means, built once
+    per range, so zooming into a long history only slices it.
+    """
+    budget, window = parameters.get("budget"), parameters.get("window")
+    if budget is None and window is None:
+        x, y, z, maturities, zeros = _zero_curves(parameters)
+        return {
+            "dates": [d.strftime("%Y-%m-%d") for d in y],
+            "maturities": maturities,
+            "yields": zeros,
+            "observed": {"maturities": x, "yields": z},
+        }
+
+    def build():
+        x, y, z, maturities, zeros = _zero_curves(parameters)
+        dates = pd.DatetimeIndex(y).as_unit("ns").asi8
+        with metrics.span("lod.build"):
+            return x, Pyramid((dates, maturities), {"yields": zeros}), Pyramid((dates,), {"yields": z})
+
+    x, dense, observed = cached_pyramid(
+        _pyramid_key("yield_curve", parameters, ("start", "end", "method", "points")), build)
+    window = window or {}
+    d_lo, d_hi = _bounds(window.get("dates"))
+    m_lo, m_hi = _bounds(window.get("maturities"))
+    budget = DEFAULT_BUDGET if budget is None else budget
+    view = dense.window((_ns(d_lo), m_lo), (_ns(d_hi), m_hi), budget)
+    # Both pyramids halve the date axis level by level, so the same level
+    # lines the observed tenors up with the dense dates
+    seen = observed.window(_ns(d_lo), _ns(d_hi), level=view.level)
+    (dates, maturities), zeros = view.coords, view.values["yields"]
+    return {
+        "dates": [d.strftime("%Y-%m-%d") for d in pd.to_datetime(dates)],
+        "maturities": maturities,
+        "yields": zeros,
+        "observed": {"maturities": x, "yields": seen.values["yields"]},
+        "step": list(view.step),
+    }
+
+
+def orderflow_canyon(parameters):
+    """
+    parameters: ticker, days, bar (e.g. "1s") or stride, path (DBN file in DBN_DIR),
+                limit (MBP-10 records; "rows" is accepted as an alias),
+                budget (most rows returned), window ([start, end] event times,
+                ns since epoch or timestamps), analytics (true for every
+                order-book metric, a name or a list of names), analytics_window
+                (rows or a duration such as "1s" for the liquidity flow rates)
+    Order-book analytics come back under "layers", row-aligned with the canyon.
+    With a budget or window the rows come from a level-of-detail pyramid of
+    the canyon (block-mean prices, block-max depth) built once per data
+    request, so zooming into a long session only slices it.
+    """
+    ticker = parameters.get("ticker", "SPY")
+    path = dbn_path(parameters["path"]) if parameters.get("path") else None
+    limit = parameters.get("limit", parameters.get("rows", 10_000))
+    analytics = parameters.get("analytics")
+    if isinstance(analytics, str):
+        analytics = [analytics]
+    book_metrics = BOOK_METRICS if analytics is True else analytics or ()
+
+    def load():
+        canyon = get_data(
+            ticker, int(parameters.get("days", 3)), path=path,
+            limit=None if limit is None else int(limit), stride=int(parameters.get("stride", 10)),
+            bar=parameters.get("bar"))
+        # At full resolution, before any level-of-detail reduction
+        layers = {}
+        if book_metrics:
+            with metrics.span("canyon.analytics"):
+                layers = book_analytics(*canyon, window=parameters.get("analytics_window"), metrics=book_metrics)
+        return canyon, layers
+
+    budget, window = parameters.get("budget"), parameters.get("window")
+    if budget is None and window is None:
+        (apx, bpx, avc, bvc, times), layers = load()
+    else:
+        def build():
+            canyon, layers = load()
+            with metrics.span("lod.build"):
+                return canyon_pyramid(*canyon, layers=layers)
+
+        pyramid = cached_pyramid(
+            _pyramid_key("orderflow_canyon", parameters,
+                         ("ticker", "days", "path", "limit", "rows", "stride", "bar", "analytics", "analytics_window")),
+            build)
+        start, end = _ns(_bounds(window)[0]), _ns(_bounds(window)[1])
+        budget = DEFAULT_BUDGET if budget is None else int(budget)
+        apx, bpx, avc, bvc, times = canyon_window(pyramid, start, end, budget)
+        layers = canyon_layers(pyramid, start, end, budget)
+
+    result = {
+        "ticker": ticker,
+        "times": times[:, 0],
+        "ask_px": apx,
+        "bid_px": bpx,
+        "ask_depth": avc,
+        "bid_depth": bvc,
+    }
+    if layers:
+        result["layers"] = layers
+    return result
+
+
+PIPELINES = {
+    "iv_surface": iv_surface,
+    "iv_history": iv_history,
+    "yield_curve": yield_curve,
+    "orderflow_canyon": orderflow_canyon,
+}
+
+# Provider schemas each pipeline reads; orderflow_canyon reads MBP-10 only
+PIPELINE_SCHEMAS = {
+    "iv_surface": ("spot", "rates", "expirations", "option_chain"),
+    "iv_history": (),
+    "yield_curve": ("yield_history",),
+    "orderflow_canyon": (),
+}
+
+
+def data_version(parameters):
+    """
+    Token for the data a request would be computed from: equal tokens mean a
+    result computed earlier for the same parameters is still current. Cheap
+    enough to call on every request (no vendor calls).
+    """
+    name = parameters.get("pipeline")
+    if name not in PIPELINES:
+        raise ValueError(f"pipeline must be one of {sorted(PIPELINES)}.")
+    if name == "iv_history":
+        return f"store:{_history_store(parameters).version(parameters.get('ticker', 'NVDA'))}"
+    if name == "orderflow_canyon" and parameters.get("path"):
+        # A local DBN file is the only input
+        path = dbn_path(parameters["path"])
+        if not os.path.exists(path):
+            raise ValueError(f"No such DBN file: {parameters['path']}.")
+        return f"file:{os.stat(path).st_mtime_ns}"
+    source = parameters.get("source", DEFAULT_SOURCE)
+    provider = get_provider() if source == "live" else provider_from_name(source)
+    return provider.version(PIPELINE_SCHEMAS[name])
+
+
+@contextmanager
+def _source(source):
+    if source == "live":
+        # The process default, with the shared on-disk cache
+        yield
+        return
+    with use_provider(provider_from_name(source)):
+        yield
+
+
+def run(parameters):
+    """Runs the pipeline named by parameters["pipeline"] against the requested source."""
+    name = parameters.get("pipeline")
+    if name not in PIPELINES:
+        raise ValueError(f"pipeline must be one of {sorted(PIPELINES)}.")
+    source = parameters.get("source", DEFAULT_SOURCE)
+
+    with _source(source), metrics.span(f"pipeline.{name}"):
+        return PIPELINES[name](parameters)
+
+
+def run_instrumented(parameters, enabled=False, memory=False):
+    """
+    run() for the process pool, returning (result, report): report is the
+    request's metrics.collect() breakdown, or None unless enabled. enabled
+    and memory carry the service's metrics settings over to the worker.
+    """
+    if enabled:
+        metrics.enable(memory=memory)
+    else:
+        metrics.disable()
+    with metrics.collect() as report:
+        result = run(parameters)
+    return result, report
@@ -0,0 +1,116 @@
+"""
+Versioned cache of computed results behind POST /compute.
+
+A result is identified by its canonical parameters (the cache key) and the
+data version it was computed from (pipelines.data_version). Each entry keeps
+the latest version's result plus every body rendered from it so far (JSON,
+binary at a given quantization), so a repeated poll is a lookup with no
+recomputation or reserialization. Entries are evicted least recently used
+once results and bodies together exceed max_bytes.
+
+ETags are derived from (key, version, representation) alone, so a client
+holding the current tag gets a 304 even after its entry has been evicted.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_MAX_BYTES = 256 * 1024**2
+
+
+class Entry:
+    __slots__ = ("version", "result", "bodies", "nbytes", "started")
+
+    def __init__(self, version, result, started):
+        self.version = version
+        self.result = result
+        self.bodies = {}
+        self.nbytes = result_nbytes(result)
+        # When the computation behind it was submitted (time.monotonic())
+        self.started = started
+
+
+def result_nbytes(value):
+    """Approximate memory held by a pipeline result: its arrays plus a little per item."""
+    if isinstance(value, dict):
+        return sum(result_nbytes(v) for v in value.values()) + 64 * len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(result_nbytes(v) for v in value) + 8 * len(value)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    return 16
+
+
+def make_etag(key, version, representation):
+    return hashlib.sha1(f"{key}\0{version}\0{representation}".encode()).hexdigest()
+
+
+class ResultCache:
+    """LRU of Entry by canonical key, bounded by total bytes."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """The entry for key (whatever its version), or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, version, result, started=None):
+        """
+        Stores a computed result and returns its entry. An entry for the same
+        version is kept as is (with its rendered bodies), and a computation
+        submitted before the stored one never replaces it.
+        """
+        started = time.monotonic() if started is None else started
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry.version == version or entry.started > started):
+                self._entries.move_to_end(key)
+                return entry if entry.version == version else Entry(version, result, started)
+            if entry is not None:
+                self.nbytes -= entry.nbytes
+            entry = self._entries[key] = Entry(version, result, started)
+            self._entries.move_to_end(key)
+            self.nbytes += entry.nbytes
+            self._evict()
+            return entry
+
+    def body(self, key, entry, representation, render):
+        """entry's body for a representation, rendered by render() on first use."""
+        body = entry.bodies.get(representation)
+        if body is None:
+            body = render()
+            with self._lock:
+                if representation not in entry.bodies:
+                    entry.bodies[representation] = body
+                    entry.nbytes += len(body)
+                    if self._entries.get(key) is entry:
+                        self.nbytes += len(body)
+                        self._evict()
+        return body
+
+    def _evict(self):
+        # The newest entry stays even if it alone is over budget, until the next put
+        while self.nbytes > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self.nbytes -= entry.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
@@ -0,0 +1,129 @@
+"""
+JSON and compact binary encodings of pipeline results.
+
+Layout (little endian):
+    b"SVG1" | uint32 header length | UTF-8 JSON header | body
+
+The header lists every array field with its name, dtype, shape and byte
+offset into the (optionally zlib-compressed) body; everything that is not an
+array (tickers, date strings, ...) travels in header["meta"]. Nested dicts are
+flattened with dotted names, e.g. "points.iv".
+
+Floats are sent as float32, or quantized to uint8/uint16 over the field's
+[min, max] range: value = min + q * scale, with the top code reserved for NaN.
+"""
+import json
+import math
+import struct
+import zlib
+
+import numpy as np
+
+MAGIC = b"SVG1"
+MIMETYPE = "application/x-streetview-grid"
+ALIGN = 8
+
+
+def to_json(value):
+    """NumPy arrays -> nested lists, with NaN/inf as null so the JSON stays valid."""
+    if isinstance(value, dict):
+        return {k: to_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json(v) for v in value]
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind == "f":
+            value = np.where(np.isfinite(value), value, None).astype(object)
+        return value.tolist()
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _flatten(value, prefix, arrays, meta):
+    for name, item in value.items():
+        key = f"{prefix}{name}"
+        if isinstance(item, dict):
+            _flatten(item, f"{key}.", arrays, meta)
+        elif isinstance(item, np.ndarray) and item.dtype.kind in "biuf":
+            arrays[key] = item
+        else:
+            meta[key] = to_json(item)
+
+
+def _quantize(values, bits):
+    dtype = np.uint8 if bits == 8 else np.uint16
+    nan_code = np.iinfo(dtype).max
+    finite = np.isfinite(values)
+    lo = float(values[finite].min()) if finite.any() else 0.0
+    hi = float(values[finite].max()) if finite.any() else 0.0
+    scale = (hi - lo) / (nan_code - 1) if hi > lo else 1.0
+    q = np.full(values.shape, nan_code, dtype=dtype)
+    q[finite] = np.rint((values[finite] - lo) / scale).astype(dtype)
+    return q, {"min": lo, "scale": scale, "nan": int(nan_code)}
+
+
+def encode(result, quantize=None, compress=True):
+    """
+    result: dict of arrays / nested dicts / JSON-able values from a pipeline
+    quantize: None (float32), 16 or 8 bits per float value
+    compress: zlib-compress the body
+    """
+    if quantize not in (None, 8, 16):
+        raise ValueError("quantize must be None, 8 or 16.")
+    arrays, meta = {}, {}
+    _flatten(result, "", arrays, meta)
+
+    fields, chunks, offset = [], [], 0
+    for name, values in arrays.items():
+        field = {"name": name, "shape": list(values.shape)}
+        if values.dtype.kind == "f":
+            if quantize:
+                values, field["quantized"] = _quantize(values.astype(np.float64), quantize)
+            else:
+                values = values.astype(np.float32)
+        elif values.dtype.kind == "b":
+            values = values.astype(np.uint8)
+        values = values.astype(values.dtype.newbyteorder("<"), copy=False)
+        data = np.ascontiguousarray(values).tobytes()
+        field.update(dtype=values.dtype.str, offset=offset, nbytes=len(data))
+        chunks.append(data)
+        pad = -len(data) % ALIGN
+        chunks.append(b"\0" * pad)
+        offset += len(data) + pad
+        fields.append(field)
+
+    body = b"".join(chunks)
+    if compress:
+        body = zlib.compress(body, 6)
+    header = json.dumps({
+        "version": 1,
+        "compression": "zlib" if compress else None,
+        "fields": fields,
+        "meta": meta,
+    }, allow_nan=False, default=str).encode()
+    return MAGIC + struct.pack("<I", len(header)) + header + body
+
+
+def decode(payload):
+    """Inverse of encode(); returns a flat dict of arrays and meta values."""
+    if payload[:4] != MAGIC:
+        raise ValueError("Not a binary grid payload.")
+    (length,) = struct.unpack("<I", payload[4:8])
+    header = json.loads(payload[8:8 + length])
+    body = payload[8 + length:]
+    if header["compression"] == "zlib":
+        body = zlib.decompress(body)
+
+    out = dict(header["meta"])
+    for field in header["fields"]:
+        values = np.frombuffer(body, dtype=field["dtype"], count=int(np.prod(field["shape"], dtype=np.int64)),
+                               offset=field["offset"]).reshape(field["shape"])
+        q = field.get("quantized")
+        if q is not None:
+            decoded = q["min"] + values.astype(np.float64) * q["scale"]
+            decoded[values == q["nan"]] = np.nan
+            values = decoded
+        out[field["name"]] = values
+    return out
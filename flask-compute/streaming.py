@@ -0,0 +1,143 @@
+"""
+Live order-flow canyon sessions behind the /live WebSocket.
+
+Clients watching the same stream share one LiveCanyon. Each connection keeps
+its own cursor into the session's ring buffer and, at most `fps` times a
+second, is sent only the rows appended since its last frame; the first frame
+carries everything the ring currently holds.
+
+Frames are binary grid payloads (see serialization.py) unless the client asks
+for "format": "json". Fields: ticker, start and end (sequence numbers of the
+rows sent, end exclusive), dropped (rows overwritten before the client caught
+up), times, ask_px, bid_px, ask_depth, bid_depth. A final JSON text message
+{"done": true, "error": ...} is sent when a finite source (a replay) runs out.
+The first message from the client is a JSON object of serve() parameters.
+"""
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from Common.providers import provider_from_name
+from OrderFlowCanyon.live import CAPACITY, LIVE_CHUNK_SIZE, LiveCanyon, live_frames, paced, replay_frames
+from pipelines import dbn_path
+from serialization import encode, to_json
+
+DEFAULT_FPS = 10
+MAX_FPS = 60
+# A quiet stream sends {"heartbeat": <next sequence number>} this often (seconds)
+HEARTBEAT = 5.0
+
+
+def frames_for(parameters):
+    """
+    MBP-10 frames for a session.
+    parameters: ticker, source ("live" for Databento Live, or any data
+                provider name), path (a DBN file in COMPUTE_DBN_DIR, replayed
+                instead; see pipelines.dbn_path),
+                speed (replay rate vs real time; 0 for as fast as possible)
+    """
+    ticker = parameters.get("ticker", "SPY")
+    speed = float(parameters.get("speed", 1.0)) or None
+    if parameters.get("path"):
+        return replay_frames(dbn_path(parameters["path"]), speed=speed)
+    source = parameters.get("source", "live")
+    if source == "live":
+        return live_frames(ticker)
+    provider = provider_from_name(source)
+    return paced(provider.mbp10(ticker, chunk_size=LIVE_CHUNK_SIZE), speed)
+
+
+def session_key(parameters):
+    return json.dumps({k: parameters.get(k) for k in ("ticker", "source", "path", "speed", "stride", "capacity")},
+                      sort_keys=True, default=str)
+
+
+class Sessions:
+    """LiveCanyon per stream, started by its first client and stopped after its last leaves."""
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, parameters):
+        key = session_key(parameters)
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is None:
+                canyon = LiveCanyon(frames_for(parameters), capacity=int(parameters.get("capacity", CAPACITY)),
+                                    stride=int(parameters.get("stride", 10)))
+                entry = self._sessions[key] = [canyon.start(), 0]
+            entry[1] += 1
+            return key, entry[0]
+
+    def release(self, key):
+        with self._lock:
+            entry = self._sessions[key]
+            entry[1] -= 1
+            if entry[1]:
+                return
+            del self._sessions[key]
+        # Outside the lock: stop() waits for the session's thread to finish
+        entry[0].stop()
+
+
+sessions = Sessions()
+
+
+def frame(ticker, rows):
+    end = rows["start"] + len(rows["times"])
+    return {
+        "ticker": ticker,
+        "start": rows["start"],
+        "end": end,
+        "dropped": rows["dropped"],
+        "times": rows["times"],
+        "ask_px": rows["apx"],
+        "bid_px": rows["bpx"],
+        "ask_depth": rows["avc"],
+        "bid_depth": rows["bvc"],
+    }, end
+
+
+def done_message(error=None):
+    return json.dumps({"done": True, "error": None if error is None else f"{type(error).__name__}: {error}"})
+
+
+def serve(ws, parameters):
+    """
+    Streams a session to one client until the source ends or the client goes.
+    parameters: as for frames_for, plus fps, format ("binary", "json"),
+                quantize (8 or 16, binary only), capacity and stride of the
+                shared ring
+    """
+    binary = parameters.get("format", "binary") != "json"
+    ticker = parameters.get("ticker", "SPY")
+    try:
+        fps = min(max(float(parameters.get("fps", DEFAULT_FPS)), 0.1), MAX_FPS)
+        quantize = parameters.get("quantize")
+        quantize = int(quantize) if quantize else None
+        # Opens the source: a bad source, ticker or path fails here
+        key, canyon = sessions.acquire(parameters)
+    except Exception as e:
+        ws.send(done_message(e))
+        return
+    try:
+        seq = 0
+        while True:
+            started = time.monotonic()
+            rows = canyon.wait(seq, timeout=HEARTBEAT)
+            if len(rows["times"]):
+                payload, seq = frame(ticker, rows)
+                ws.send(encode(payload, quantize=quantize) if binary else json.dumps(to_json(payload)))
+            elif canyon.done:
+                ws.send(done_message(canyon.error))
+                return
+            else:
+                ws.send(json.dumps({"heartbeat": seq}))
+            # Throttle: whatever arrives meanwhile goes out in the next frame
+            time.sleep(max(0.0, 1.0 / fps - (time.monotonic() - started)))
+    finally:
+        sessions.release(key)